@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+"""
+mango benchmarks
+> synthetic mango trees and latency measurements for resolution and startup
+
+Usage:
+    python3 bench/mango_bench.py [--quick] [--mango path/to/mango] [--output results.json] [--compare baseline.json]
+
+Every scenario generates a synthetic tree in a temporary directory, then measures:
+- cold start of the mango executable (`mango --version`) against a bare interpreter;
+- mangoScanFind (lazy parse), mangoFind with an on-disk index, and mangoFind with an in-memory index;
+- mangoRecursiveFindFromRepo for host commands through a deep stack of repositories;
+- end-to-end overhead of `mango <cmd>` against running the script directly.
+
+Results are written as JSON so that runs of different versions can be compared with --compare.
+Point --mango at the executable of another version to benchmark it; metrics it has no API for are skipped.
+"""
+
+import argparse
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+DEFAULT_MANGO_SCRIPT = Path(__file__).resolve().parents[1] / "src" / "mango"
+SCRIPT_BODY = "#!/bin/sh\nexit 0\n"
+
+
+def loadMango(mango_script: Path):
+    """load the mango_cli package run by a launcher or a single-file build, or a single-file script from before the package"""
+    package_root = mango_script.resolve().parent
+    if zipfile.is_zipfile(mango_script):
+        package_root = mango_script
+    if package_root == mango_script or (package_root / "mango_cli" / "__init__.py").exists():
+        sys.path.insert(0, str(package_root))
+        return importlib.import_module("mango_cli")
+    loader = importlib.machinery.SourceFileLoader("mango_bench_target", str(mango_script))
+    spec = importlib.util.spec_from_loader("mango_bench_target", loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+# --- generators -------------------------------------------------------------
+#
+# Each generator builds a mango repository under `root` and returns
+# (repo path, user path to run from, command to resolve, script that command resolves to).
+
+
+def writeScript(mango_dir: Path, name: str) -> Path:
+    script = mango_dir / name
+    script.write_text(SCRIPT_BODY)
+    script.chmod(0o755)
+    return script
+
+
+def generateManyBindings(root: Path, bindings: int):
+    """one mango folder with thousands of bindings; the target is the last line"""
+    mango_dir = root / ".mango"
+    mango_dir.mkdir(parents=True)
+    lines = []
+    for i in range(bindings):
+        writeScript(mango_dir, f"script_{i}.sh")
+        lines.append(f"script_{i}.sh: cmd_{i} alias_{i}")
+    (mango_dir / ".instructions").write_text("\n".join(lines) + "\n")
+    return root, root, f"alias_{bindings - 1}", mango_dir / f"script_{bindings - 1}.sh"
+
+
+def generateDeepNesting(root: Path, depth: int, bindings: int):
+    """a chain of submodules, each exporting the next; the target lives in the innermost one"""
+    mango_dir = root / ".mango"
+    current = mango_dir
+    for level in range(depth):
+        current.mkdir(parents=True)
+        (current / ".instructions").write_text(f"# level {level}\n[level_{level + 1}] *\n")
+        current = current / ".submodules" / f"level_{level + 1}" / ".mango"
+    current.mkdir(parents=True)
+    lines = []
+    for i in range(bindings):
+        writeScript(current, f"leaf_{i}.sh")
+        lines.append(f"leaf_{i}.sh: leaf_{i}")
+    (current / ".instructions").write_text("\n".join(lines) + "\n")
+    return root, root, f"leaf_{bindings - 1}", current / f"leaf_{bindings - 1}.sh"
+
+
+def generateWideFanOut(root: Path, submodules: int, bindings: int):
+    """many exported submodules side by side; the target is in the last one"""
+    mango_dir = root / ".mango"
+    mango_dir.mkdir(parents=True)
+    exports = []
+    for s in range(submodules):
+        submodule = mango_dir / ".submodules" / f"module_{s}" / ".mango"
+        submodule.mkdir(parents=True)
+        lines = []
+        for i in range(bindings):
+            writeScript(submodule, f"script_{i}.sh")
+            lines.append(f"script_{i}.sh: m{s}_cmd_{i}")
+        (submodule / ".instructions").write_text("\n".join(lines) + "\n")
+        exports.append(f"[module_{s}] *")
+    (mango_dir / ".instructions").write_text("\n".join(exports) + "\n")
+    last = mango_dir / ".submodules" / f"module_{submodules - 1}" / ".mango"
+    return root, root, f"m{submodules - 1}_cmd_{bindings - 1}", last / f"script_{bindings - 1}.sh"
+
+
+def generateRebindChain(root: Path, depth: int):
+    """a chain of submodules, each rebinding the binding of the next under a new name"""
+    current = root / ".mango"
+    for level in range(depth):
+        current.mkdir(parents=True)
+        (current / ".instructions").write_text(f"[next] name_{level + 1}: name_{level}\n")
+        current = current / ".submodules" / "next" / ".mango"
+    current.mkdir(parents=True)
+    script = writeScript(current, "leaf.sh")
+    (current / ".instructions").write_text(f"leaf.sh: name_{depth}\n")
+    return root, root, "name_0", script
+
+
+def generateHostStack(root: Path, depth: int, bindings: int):
+    """a stack of nested repositories where only the outermost one defines the target, for host commands"""
+    top_mango = root / ".mango"
+    top_mango.mkdir(parents=True)
+    script = writeScript(top_mango, "host.sh")
+    (top_mango / ".instructions").write_text("host.sh: host_target\n")
+    current = root
+    for level in range(depth):
+        current = current / f"level_{level}"
+        mango_dir = current / ".mango"
+        mango_dir.mkdir(parents=True)
+        lines = []
+        for i in range(bindings):
+            lines.append(f"local_{i}.sh: level_{level}_cmd_{i}")
+        (mango_dir / ".instructions").write_text("\n".join(lines) + "\n")
+    return current, current, "@host_target", script
+
+
+SCENARIOS = {
+    "many_bindings": (generateManyBindings, {"bindings": 2000}, {"bindings": 200}),
+    "deep_nesting": (generateDeepNesting, {"depth": 30, "bindings": 50}, {"depth": 8, "bindings": 10}),
+    "wide_fan_out": (generateWideFanOut, {"submodules": 100, "bindings": 20}, {"submodules": 20, "bindings": 5}),
+    "rebind_chain": (generateRebindChain, {"depth": 40}, {"depth": 8}),
+    "host_stack": (generateHostStack, {"depth": 40, "bindings": 20}, {"depth": 8, "bindings": 5}),
+}
+
+
+# --- measurements -----------------------------------------------------------
+
+
+def measure(function, repeat: int) -> dict:
+    """time repeated calls of function, in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        function()
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "mean_ms": statistics.fmean(samples),
+        "runs": repeat,
+    }
+
+
+def runProcess(argv: list[str], cwd: Path) -> None:
+    result = subprocess.run(argv, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark command failed: {argv}")
+
+
+def benchResolution(mango, repo: Path, user_path: Path, command: str, expected: Path, repeat: int) -> dict:
+    """measure in-process resolution of one command"""
+    mango_path = str(repo / ".mango")
+    results = {}
+    if not hasattr(mango, "loaded_indexes"):
+        # versions without a binding index only have the lazy parser
+        if command.startswith("@"):
+            results["recursive_find_warm"] = measure(lambda: mango.mangoRecursiveFindFromRepo(str(repo), command[1:]), repeat)
+        else:
+            results["scan_find"] = measure(lambda: mango.mangoFind(mango_path, command), repeat)
+        return results
+    index_path = repo / ".mango" / mango.INDEX_FILE_NAME
+
+    if command.startswith("@"):
+        binding = command[1:]
+        found, _ = mango.mangoRecursiveFindFromRepo(str(repo), binding)
+        assert Path(found) == expected, f"{command} resolved to {found}, expected {expected}"
+        results["recursive_find_warm"] = measure(lambda: mango.mangoRecursiveFindFromRepo(str(repo), binding), repeat)
+
+        def coldRecursive():
+            mango.loaded_indexes.clear()
+            for path in user_path.parents:
+                (path / ".mango" / mango.INDEX_FILE_NAME).unlink(missing_ok=True)
+            (user_path / ".mango" / mango.INDEX_FILE_NAME).unlink(missing_ok=True)
+            mango.mangoRecursiveFindFromRepo(str(repo), binding)
+        results["recursive_find_cold"] = measure(coldRecursive, max(1, repeat // 10))
+        return results
+
+    found, _ = mango.mangoFind(mango_path, command)
+    assert Path(found) == expected, f"{command} resolved to {found}, expected {expected}"
+    results["scan_find"] = measure(lambda: mango.mangoScanFind(mango_path, command), repeat)
+
+    def coldIndex():
+        mango.loaded_indexes.clear()
+        index_path.unlink(missing_ok=True)
+        mango.mangoFind(mango_path, command)
+    results["find_index_build"] = measure(coldIndex, max(1, repeat // 10))
+
+    def diskIndex():
+        mango.loaded_indexes.clear()
+        mango.mangoFind(mango_path, command)
+    results["find_index_disk"] = measure(diskIndex, repeat)
+    results["find_index_memory"] = measure(lambda: mango.mangoFind(mango_path, command), repeat)
+    return results
+
+
+def benchEndToEnd(mango_script: Path, user_path: Path, command: str, script: Path, repeat: int) -> dict:
+    """measure `mango <cmd>` against running the resolved script directly"""
+    mango_run = measure(lambda: runProcess([sys.executable, str(mango_script), command], user_path), repeat)
+    direct_run = measure(lambda: runProcess([str(script)], user_path), repeat)
+    return {
+        "mango_exec": mango_run,
+        "direct_exec": direct_run,
+        "exec_overhead_ms": mango_run["median_ms"] - direct_run["median_ms"],
+    }
+
+
+def benchStartup(mango_script: Path, repeat: int) -> dict:
+    """measure interpreter startup against mango startup"""
+    cwd = Path.cwd()
+    interpreter = measure(lambda: runProcess([sys.executable, "-c", "pass"], cwd), repeat)
+    mango_version = measure(lambda: runProcess([sys.executable, str(mango_script), "--version"], cwd), repeat)
+    return {
+        "interpreter": interpreter,
+        "mango_version": mango_version,
+        "startup_overhead_ms": mango_version["median_ms"] - interpreter["median_ms"],
+    }
+
+
+def runBenchmarks(mango_script: Path, quick: bool) -> dict:
+    mango = loadMango(mango_script)
+    repeat = 20 if quick else 200
+    process_repeat = 5 if quick else 30
+    results = {"startup": benchStartup(mango_script, process_repeat)}
+    for name, (generator, full_params, quick_params) in SCENARIOS.items():
+        params = quick_params if quick else full_params
+        with tempfile.TemporaryDirectory(prefix=f"mango-bench-{name}-") as workdir:
+            repo, user_path, command, script = generator(Path(workdir), **params)
+            if hasattr(mango, "loaded_indexes"):
+                mango.loaded_indexes.clear()
+            scenario = {"params": params, "command": command}
+            scenario.update(benchResolution(mango, repo, user_path, command, script, repeat))
+            scenario.update(benchEndToEnd(mango_script, user_path, command, script, process_repeat))
+            results[name] = scenario
+            print(f"{name}: {scenario['exec_overhead_ms']:.2f} ms exec overhead", file=sys.stderr)
+    return {
+        "mango_version": mango.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "quick": quick,
+        "results": results,
+    }
+
+
+def flattenMedians(results: dict, prefix: str = "") -> dict[str, float]:
+    """collect every median (and overhead) in a result tree under dotted keys"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            if "median_ms" in value:
+                flat[prefix + key] = value["median_ms"]
+            else:
+                flat.update(flattenMedians(value, f"{prefix}{key}."))
+        elif key.endswith("_ms"):
+            flat[prefix + key] = value
+    return flat
+
+
+def compareResults(baseline: dict, current: dict) -> None:
+    """print the relative change of every median against a baseline run"""
+    old = flattenMedians(baseline["results"])
+    new = flattenMedians(current["results"])
+    print(f"{'metric':<48} {baseline['mango_version']:>12} {current['mango_version']:>12} {'change':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        print(f"{key:<48} {old[key]:>10.3f}ms {new[key]:>10.3f}ms {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mango resolution and startup on synthetic trees")
+    parser.add_argument("--quick", action="store_true", help="use small trees and few repetitions")
+    parser.add_argument("--mango", type=Path, default=DEFAULT_MANGO_SCRIPT, help="the mango executable to benchmark (default: src/mango)")
+    parser.add_argument("--output", "-o", help="write results as JSON to this file instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a previous JSON result")
+    args = parser.parse_args()
+
+    current = runBenchmarks(args.mango.resolve(), args.quick)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(current, output_file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compareResults(json.load(baseline_file), current)
+
+
+if __name__ == "__main__":
+    main()
@@ -101,19 +101,38 @@ run_with_spinner() {
 
 download_mango() {
 	local dest="$1"
-	local url
-	for url in "${MANGO_SOURCE_URLS[@]}"; do
-		if curl -sSfL "$url" -o "$dest"; then
-			MANGO_FETCHED_FROM="$url"
+	local base
+	local build_dir
+	build_dir=$(mktemp -d)
+	for base in "${MANGO_SOURCE_URLS[@]}"; do
+		# newer refs ship mango as a package, built here into a single file holding bytecode for this python
+		mkdir -p "$build_dir/src/mango_cli"
+		local module
+		local fetched=1
+		for module in "${MANGO_CLI_MODULES[@]}"; do
+			curl -sSfL "$base/src/mango_cli/$module.py" -o "$build_dir/src/mango_cli/$module.py" || { fetched=0; break; }
+		done
+		if [[ $fetched -eq 1 ]] \
+			&& curl -sSfL "$base/tools/build_zipapp.py" -o "$build_dir/build_zipapp.py" \
+			&& python3 "$build_dir/build_zipapp.py" --src "$build_dir/src" --output "$dest"; then
+			MANGO_FETCHED_FROM="$base"
+			rm -rf "$build_dir"
+			return 0
+		fi
+		# older refs ship mango as a single script
+		if curl -sSfL "$base/src/mango" -o "$dest" && head -n 1 "$dest" | grep -q python && ! grep -q "import mango_cli" "$dest"; then
+			MANGO_FETCHED_FROM="$base/src/mango"
+			rm -rf "$build_dir"
 			return 0
 		fi
 	done
+	rm -rf "$build_dir"
 	return 1
 
 }
 log_debug "Preparing Mango installer for version $VERSION"
 
-for cmd in curl git mktemp install sort; do
+for cmd in curl git mktemp install sort python3; do
 	require_command "$cmd"
 done
 
@@ -139,10 +158,12 @@ DEST_BIN="/usr/bin/mango"
 MANGO_REF="${MANGO_INSTALL_REF:-${VERSION}}"
 MANGO_FALLBACK_REF="${MANGO_FALLBACK_REF:-main}"
 MANGO_SOURCE_URLS=(
-	"https://raw.githubusercontent.com/RayZh-hs/Mango/${MANGO_REF}/src/mango"
-	"https://raw.githubusercontent.com/RayZh-hs/Mango/${MANGO_FALLBACK_REF}/src/mango"
+	"https://raw.githubusercontent.com/RayZh-hs/Mango/${MANGO_REF}"
+	"https://raw.githubusercontent.com/RayZh-hs/Mango/${MANGO_FALLBACK_REF}"
 )
 MANGO_FETCHED_FROM=""
+# every module of the mango_cli package
+MANGO_CLI_MODULES=(__init__ __main__ check coordination daemon history jobs picker resolve suggest sync tasks watch)
 
 if command -v mango >/dev/null 2>&1; then
 	EXISTING_MANGO_PATH=$(command -v mango)
@@ -0,0 +1,1593 @@
+"""
+mango
+> a simple script manager
+
+This is the main instance of the mango script. It is started by the `src/mango` launcher (or the `__main__.py` of the single-file build), which the Mango Bootstrap places in a path-included folder.
+
+This module holds what running a plain command needs; the code of other options lives in submodules imported by the branches of mango() that use them.
+
+A typical mango repository is formulated as follows:
+- folder (called a mango repository)
+    - .mango (called the mango entrypoint)
+        - .instructions (lists all instructions within this repository)
+        - all scripts of this repository
+"""
+
+import time
+# the launcher overrides this with the time it started
+trace_origin_ns = time.perf_counter_ns()
+
+# only builtin and frozen modules are imported eagerly, everything else is imported where it is used to keep startup fast
+# _thread gives spans the ident threading.get_ident() would, without the import time of threading landing in the first span to end
+import _thread
+import marshal
+import os
+import sys
+
+__version__ = "2.0.3"
+INDEX_FILE_NAME = ".bindings.index"
+INDEX_FORMAT_VERSION = 6
+# the version and the byte lengths of the header, lookup and listing sections, as little-endian 32 bit integers
+INDEX_PREFIX_SIZE = 16
+TASK_KEYS = ("needs", "inputs", "outputs", "cache", "limit", "share")
+# seconds the daemon client waits on the socket before resolving in-process
+DAEMON_TIMEOUT = 2.0
+# messages are marshalled and prefixed with their length as a little-endian 32 bit integer
+DAEMON_LENGTH_SIZE = 4
+
+loaded_indexes = {}
+trace_events = None
+epilog_message = '''\
+usage: mango [-h] command ...
+
+Mango: a simple script manager
+
+positional arguments:
+  command     The command to run. Host commands start with @
+  args        Arguments to pass to the command
+
+options:
+  -h, --help  show this help message and exit
+
+Mango comes with a default set of host commands, which you can call using @.
+
+Call `mango @help` to invoke the help command for the builtins library. To view help for a specific entry, call `mango @help <command>`.
+'''
+completion_scripts = {
+    "bash": '''\
+_mango_complete() {
+    local line=${COMP_LINE:0:$COMP_POINT}
+    line=${line#*[[:space:]]}
+    line=${line#"${line%%[![:space:]]*}"}
+    # only the command itself is completed, its arguments belong to the script
+    [[ $line == *[[:space:]]* || $line == -* ]] && return
+    local IFS=$'\\n'
+    COMPREPLY=($(command mango --complete "$line"))
+    # bash splits words on ':', so complete only what follows the last one
+    if [[ $line == *:* && $COMP_WORDBREAKS == *:* ]]; then
+        local colon_prefix=${line%"${line##*:}"}
+        COMPREPLY=("${COMPREPLY[@]#"$colon_prefix"}")
+    fi
+}
+complete -o default -F _mango_complete mango
+''',
+    "zsh": '''\
+_mango() {
+    if (( CURRENT == 2 )) && [[ $PREFIX != -* ]]; then
+        local -a commands
+        commands=(${(f)"$(command mango --complete "$PREFIX")"})
+        compadd -Q -- $commands
+    else
+        _files
+    fi
+}
+compdef _mango mango
+''',
+    "fish": '''\
+complete -c mango -n 'test (count (commandline -opc)) -eq 1' -f -a '(command mango --complete (commandline -ct))'
+''',
+}
+
+# the shell function asks mango for the commands to run, then runs them in the calling shell
+shell_init_function = '''\
+mango() {
+    local __mango_plan
+    __mango_plan="$(command mango --shell-resolve "$@")" || return
+    eval "$__mango_plan"
+}
+'''
+
+class TraceSpan:
+    """a timed section of a mango invocation, recorded into trace_events when it ends"""
+    
+    __slots__ = ("name", "args", "start_ns")
+    
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+    
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, *exc_info):
+        if trace_events is not None:
+            trace_events.append((self.name, self.start_ns, time.perf_counter_ns() - self.start_ns, _thread.get_ident(), self.args))
+        return False
+
+class NullSpan:
+    """the span handed out while tracing is disabled"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+null_span = NullSpan()
+
+def traceSpan(name: str, **args) -> TraceSpan | NullSpan:
+    """time a section of code when MANGO_TRACE is set
+    
+    Keyword arguments:
+    - name -- the name of the span
+    - args -- details to attach to the span
+    
+    Return: a context manager covering the section
+    """
+    
+    if trace_events is None:
+        return null_span
+    return TraceSpan(name, args)
+
+def traced(function):
+    """decorator recording a span for every call of a function when MANGO_TRACE is set
+    
+    Only scalar arguments (paths, commands, flags) are attached; environments and other containers are left out so that traces never capture secrets.
+    """
+    
+    def wrapper(*args, **kwargs):
+        if trace_events is None:
+            return function(*args, **kwargs)
+        details = {"args": [arg for arg in args if isinstance(arg, (str, int, bool))]}
+        details.update({key: value for key, value in kwargs.items() if isinstance(value, (str, int, bool))})
+        with TraceSpan(function.__name__, details):
+            return function(*args, **kwargs)
+    # what functools.wraps would do, without importing functools on every start
+    for attribute in ("__module__", "__name__", "__qualname__", "__doc__"):
+        setattr(wrapper, attribute, getattr(function, attribute))
+    wrapper.__wrapped__ = function
+    return wrapper
+
+def processAgeNs() -> int | None:
+    """find how long ago the current process was started, with clock tick resolution
+    
+    Return: the age in nanoseconds, None where /proc is unavailable
+    """
+    
+    try:
+        with open("/proc/self/stat", "r") as stat_file:
+            # the command name may contain spaces, so count fields from its closing parenthesis
+            start_ticks = int(stat_file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as uptime_file:
+            uptime_s = float(uptime_file.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return int((uptime_s - start_ticks / os.sysconf("SC_CLK_TCK")) * 1e9)
+
+def startTracing() -> None:
+    """enable tracing if MANGO_TRACE is set
+    
+    MANGO_TRACE=1 (or stderr) prints a per-phase summary to stderr when mango exits; any other value is a path to write a Chrome trace-event JSON file to, where {pid} is replaced with the process id.
+    """
+    
+    global trace_events
+    if not os.environ.get("MANGO_TRACE"):
+        return
+    import atexit
+    
+    now_ns = time.perf_counter_ns()
+    trace_events = []
+    process_age_ns = processAgeNs()
+    if process_age_ns is not None and process_age_ns > now_ns - trace_origin_ns:
+        # from the fork of the process (including any launcher it went through) to the first line of mango
+        trace_events.append(("process startup", now_ns - process_age_ns, process_age_ns - (now_ns - trace_origin_ns), 0, {"resolution": "clock tick"}))
+    trace_events.append(("load mango", trace_origin_ns, now_ns - trace_origin_ns, 0, {}))
+    atexit.register(finishTracing)
+
+def finishTracing() -> None:
+    """write out the recorded spans, as configured by MANGO_TRACE, and stop tracing"""
+    
+    global trace_events
+    if trace_events is None:
+        return
+    events, trace_events = trace_events, None
+    destination = os.environ.get("MANGO_TRACE", "")
+    if destination in ("1", "stderr"):
+        origin_ns = min(start_ns for _, start_ns, _, _, _ in events)
+        end_ns = max(start_ns + duration_ns for _, start_ns, duration_ns, _, _ in events)
+        totals = {}
+        for name, _, duration_ns, _, _ in events:
+            count, total_ns = totals.get(name, (0, 0))
+            totals[name] = count + 1, total_ns + duration_ns
+        print(f"mango trace: {(end_ns - origin_ns) / 1e6:.3f} ms traced", file=sys.stderr)
+        print(f"  {'total ms':>10} {'calls':>6}  span", file=sys.stderr)
+        for name, (count, total_ns) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print(f"  {total_ns / 1e6:>10.3f} {count:>6}  {name}", file=sys.stderr)
+        sys.stderr.flush()
+        return
+    
+    import json
+    pid = os.getpid()
+    origin_ns = min(start_ns for _, start_ns, _, _, _ in events)
+    trace = {
+        "traceEvents": [
+            {"name": name, "ph": "X", "ts": (start_ns - origin_ns) / 1e3, "dur": duration_ns / 1e3, "pid": pid, "tid": tid, "args": args}
+            for name, start_ns, duration_ns, tid, args in sorted(events, key=lambda event: event[1])
+        ],
+        "displayTimeUnit": "ms",
+    }
+    try:
+        with open(destination.replace("{pid}", str(pid)), "w") as trace_file:
+            json.dump(trace, trace_file)
+    except OSError as e:
+        print(f"mango trace: cannot write {destination}: {e}", file=sys.stderr)
+
+def existMangoRepo(scan_path_str: str) -> bool:
+    """check whether a directory is a mango repository
+
+    Keyword arguments:
+    - scan_path_str -- the string of the directory to check
+    
+    Return: bool for whether the directory is a mango repository
+    """
+    
+    return os.path.exists(os.path.join(scan_path_str, ".mango"))
+
+def homeMangoPath() -> str | None:
+    """find the .mango folder of the home mango, which per-user files such as kept indexes, the run history and cached results default to
+    
+    A ~/.mango without .instructions is not a home mango. Creating one would make the home folder a broken mango repository for every later lookup, so callers skip what they would store there instead.
+    
+    Return: the path to ~/.mango, None if there is no home mango
+    """
+    
+    mango_path = os.path.join(os.path.expanduser("~"), ".mango")
+    return mango_path if os.path.isfile(os.path.join(mango_path, ".instructions")) else None
+
+@traced
+def closestMangoRepo(start_path: str | None = None) -> str:
+    """find the first mango repository up the directory tree, raises a FileNotFoundError if none is found
+
+    Keyword arguments:
+    - start_path -- the directory to start searching from, defaults to the current working directory
+
+    Return: string for the path of the closest mango repository
+    """
+    
+    cur_exec_path_str = start_path if start_path is not None else os.getcwd()
+    while cur_exec_path_str != "/":
+        if existMangoRepo(cur_exec_path_str):
+            return cur_exec_path_str
+        cur_exec_path_str = os.path.dirname(cur_exec_path_str)
+    raise FileNotFoundError("mango repository not found")
+
+def splitCommand(command_str: str) -> tuple[str, str]:
+    """splits a command and returns (submodule_path, binding)
+    
+    Format: (sub1:sub2:)binding
+    
+    Keyword arguments:
+    - command_str -- the command string to split
+    
+    Return: a tuple corresponding to (submodule_path, binding)
+    """
+    
+    if ':' in command_str:
+        split_command = command_str.split(':')
+        binding = split_command[-1]
+        submodule_path = ':'.join(split_command[:-1])
+        return submodule_path, binding
+    else:
+        return "", command_str
+
+@traced
+def mapSubmodulePath(submodule_virtual_path: str, base_path: str = ".", absolute: bool = False) -> str:
+    """maps a submodule's mango folder path to its real os path
+    
+    Keyword arguments:
+    - submodule_virtual_path -- the submodule path to map
+    - base_path -- base directory used to resolve the submodule path
+    Return: the real os path of the submodule, relative to the base path
+    """
+    
+    relative_path = "."
+    if not submodule_virtual_path:
+        return base_path if absolute else relative_path
+    for submodule in submodule_virtual_path.split(':'):
+        relative_path = os.path.join(relative_path, ".submodules", submodule, ".mango")
+    absolute_os_path = os.path.join(base_path, relative_path)
+    if not os.path.exists(absolute_os_path):
+        raise FileNotFoundError("submodule path does not exist")
+    if absolute:
+        return absolute_os_path
+    else:
+        return relative_path
+
+def parseInstruction(line: str) -> tuple | None:
+    """parse a single line of an .instructions file
+    
+    Keyword arguments:
+    - line -- the raw line read from the .instructions file
+    
+    Return: None for blank lines and comments, otherwise one of
+    - ("bind", script, bindings, use_source) for `(*)script: binding1 binding2`
+    - ("export", submodule_name) for `[submodule] *`
+    - ("rebind", submodule_name, old_binding, new_bindings) for `[submodule] old_binding: new_binding1 new_binding2`
+    - ("task", command, key, values) for `(command) key: value1 value2`, where key is one of TASK_KEYS
+    """
+    
+    line = line.strip()
+    if (len(line) == 0 or line.startswith("#")):
+        return None
+    if line.startswith('['):
+        # New syntax for submodule handling
+        if ']' not in line:
+            raise SyntaxError("invalid submodule syntax: missing closing bracket")
+        
+        # Extract submodule name and content
+        content_start = line.find(']') + 1
+        if content_start >= len(line):
+            raise SyntaxError("invalid submodule syntax: no content after bracket")
+        
+        submodule_name = line[1:line.find(']')].strip()
+        content = line[content_start:].strip()
+        
+        if not content:
+            raise SyntaxError("invalid submodule syntax: empty content")
+        
+        # Handle export all syntax: [submodule] *
+        if content == '*':
+            return "export", submodule_name
+        
+        # Handle rebind syntax: [submodule] old_binding: new_binding1 new_binding2
+        if ':' in content:
+            parts = content.split(':', 1)
+            if len(parts) != 2:
+                raise SyntaxError("invalid submodule rebind syntax")
+            return "rebind", submodule_name, parts[0].strip(), parts[1].strip().split()
+        raise SyntaxError("invalid submodule syntax: unexpected content format")
+    
+    if line.startswith('('):
+        # Task declarations: (command) needs: dep1 dep2
+        if ')' not in line:
+            raise SyntaxError("invalid task syntax: missing closing parenthesis")
+        command = line[1:line.find(')')].strip()
+        content = line[line.find(')') + 1:].strip()
+        if not command or ':' not in content:
+            raise SyntaxError("invalid task syntax: expected (command) key: values")
+        key, values = content.split(':', 1)
+        key = key.strip()
+        if key not in TASK_KEYS:
+            raise SyntaxError(f"invalid task syntax: unknown key '{key}', expected one of {', '.join(TASK_KEYS)}")
+        values = values.split()
+        if key == "limit" and (len(values) != 1 or not values[0].isdigit() or int(values[0]) < 1):
+            raise SyntaxError("invalid task syntax: limit expects a single positive number")
+        if key == "share" and values:
+            raise SyntaxError("invalid task syntax: share takes no values")
+        return "task", command, key, values
+    
+    # Regular script binding
+    use_source = False
+    if line.startswith('*'):
+        use_source = True
+        line = line[1:]
+    colon_count = line.count(":")
+    if colon_count == 0:
+        raise SyntaxError("a non-derivative command must have a binding field")
+    elif colon_count == 1:
+        script, bindings = line.split(":")
+        return "bind", script, bindings.split(), use_source
+    else:
+        raise SyntaxError("invalid syntax: too many colons in line. Use [submodule] old_binding: new_binding1 new_binding2 for rebind syntax")
+
+@traced
+def mangoScanFind(mango_path: str, command: str) -> tuple[str | None, bool]:
+    """find the script that corresponds to a command in a mango module by parsing .instructions lazily
+    
+    Parsing stops at the first match, so lines after it are never validated.
+    
+    Keyword arguments:
+    - mango_path -- the path to the .mango folder
+    - command_name -- the command typed in by the user
+    
+    Return: the path to the script if it exists, None if not
+    """
+    
+    def handleSubmoduleExport(submodule_name: str, cmd: str) -> tuple[str | None, bool]:
+        """Handle syntax [submodule] * for exporting all bindings"""
+        try:
+            submodule_os_path = mapSubmodulePath(submodule_name, base_path=mango_path, absolute=True)
+        except FileNotFoundError:
+            return None, False
+        return mangoScanFind(submodule_os_path, cmd)
+    
+    def handleSubmoduleRebind(submodule_name: str, old_binding: str, new_bindings: list[str], cmd: str) -> tuple[str | None, bool]:
+        """Handle syntax [submodule] old_binding: new_binding1 new_binding2"""
+        if cmd not in new_bindings:
+            return None, False
+        try:
+            submodule_os_path = mapSubmodulePath(submodule_name, base_path=mango_path, absolute=True)
+        except FileNotFoundError:
+            return None, False
+        return mangoScanFind(submodule_os_path, old_binding)
+    
+    try:
+        submodule_path, binding = splitCommand(command)
+        try:
+            mapped_mango_path = mapSubmodulePath(submodule_path, base_path=mango_path, absolute=True)
+        except FileNotFoundError:
+            return None, False
+        with open(os.path.join(mapped_mango_path, ".instructions"), "r") as instructions_file:
+            for line in instructions_file:
+                instruction = parseInstruction(line)
+                if instruction is None:
+                    continue
+                if instruction[0] == "export":
+                    callback = handleSubmoduleExport(instruction[1], command)
+                elif instruction[0] == "rebind":
+                    callback = handleSubmoduleRebind(instruction[1], instruction[2], instruction[3], command)
+                elif instruction[0] == "task":
+                    continue
+                else:
+                    _, script, bindings, use_source = instruction
+                    callback = (os.path.join(mapped_mango_path, script), use_source) if binding in bindings else (None, False)
+                if callback[0] is not None:
+                    return callback
+        return None, False
+    except Exception as e:
+        print("Error occurred when parsing repo: " + mango_path, file=sys.stderr)
+        raise SyntaxError("invalid .instructions file") from e
+
+def fileStamp(path: str) -> tuple[int, int] | None:
+    """stat a file for cache invalidation
+    
+    Keyword arguments:
+    - path -- the path to stat
+    
+    Return: (mtime_ns, size) of the path, None if it does not exist
+    """
+    
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+@traced
+def mangoCompileIndex(mango_path: str) -> tuple[dict, dict[str, tuple[int, int] | None]]:
+    """eagerly resolve every unprefixed binding visible from a mango folder
+    
+    Resolution order matches mangoScanFind: the first line that yields a binding wins, and exports and rebinds are followed recursively.
+    Task declarations are only collected from the folder itself, since they describe commands of this repository.
+    Virtual paths (`sub:sub:binding`) are collected from the bindings every nested submodule declares itself, which is what a prefixed lookup resolves against.
+    
+    Keyword arguments:
+    - mango_path -- the path to the .mango folder
+    
+    Return: a tuple of (index, stamps), where index is {"bindings": binding -> (physical path, use_source), "virtual": virtual path -> (physical path, use_source), "tasks": command -> {key: values}, "commands": sorted list of every binding and virtual path, "postings": the ngramIndex of "commands"} and stamps maps every path the result depends on to its fileStamp
+    """
+    
+    stamps = {}
+    compiled = {}
+    tasks = {}
+    
+    def compileFolder(folder: str) -> dict[str, tuple[str, bool]]:
+        if folder in compiled:
+            return compiled[folder]
+        table = {}
+        instructions_path = os.path.join(folder, ".instructions")
+        stamps[instructions_path] = fileStamp(instructions_path)
+        with traceSpan("parse .instructions", path=instructions_path), open(instructions_path, "r") as instructions_file:
+            instructions = [instruction for instruction in map(parseInstruction, instructions_file) if instruction is not None]
+        for instruction in instructions:
+            if instruction[0] == "bind":
+                _, script, bindings, use_source = instruction
+                for binding in bindings:
+                    table.setdefault(binding, (os.path.join(folder, script), use_source))
+                continue
+            if instruction[0] == "task":
+                if folder == mango_path:
+                    _, command, key, values = instruction
+                    tasks.setdefault(command, {}).setdefault(key, []).extend(values)
+                continue
+            try:
+                submodule_folder = mapSubmodulePath(instruction[1], base_path=folder, absolute=True)
+            except FileNotFoundError:
+                # record the missing submodule so that installing it invalidates the index
+                missing_folder = os.path.join(folder, *[part for name in instruction[1].split(':') for part in (".submodules", name, ".mango")])
+                stamps[missing_folder] = None
+                continue
+            submodule_table = compileFolder(submodule_folder)
+            if instruction[0] == "export":
+                for binding, target in submodule_table.items():
+                    table.setdefault(binding, target)
+            elif instruction[2] in submodule_table:
+                for binding in instruction[3]:
+                    table.setdefault(binding, submodule_table[instruction[2]])
+        compiled[folder] = table
+        return table
+    
+    virtual = {}
+    
+    def collectSubmodules(folder: str, virtual_prefix: str) -> None:
+        submodules_path = os.path.join(folder, ".submodules")
+        # the folder's mtime changes whenever a submodule is installed or removed
+        stamps[submodules_path] = fileStamp(submodules_path)
+        try:
+            names = sorted(os.listdir(submodules_path))
+        except OSError:
+            return
+        for name in names:
+            virtual_path = virtual_prefix + name
+            try:
+                submodule_folder = mapSubmodulePath(virtual_path, base_path=mango_path, absolute=True)
+            except FileNotFoundError:
+                continue
+            instructions_path = os.path.join(submodule_folder, ".instructions")
+            stamps.setdefault(instructions_path, fileStamp(instructions_path))
+            try:
+                with traceSpan("parse .instructions", path=instructions_path), open(instructions_path, "r") as instructions_file:
+                    instructions = [instruction for instruction in map(parseInstruction, instructions_file) if instruction is not None]
+            except (OSError, SyntaxError):
+                # prefixed lookups into a broken submodule report the error themselves
+                instructions = []
+            for instruction in instructions:
+                if instruction[0] == "bind":
+                    _, script, bindings, use_source = instruction
+                    for binding in bindings:
+                        virtual.setdefault(f"{virtual_path}:{binding}", (os.path.join(submodule_folder, script), use_source))
+            collectSubmodules(submodule_folder, virtual_path + ":")
+    
+    bindings = compileFolder(mango_path)
+    collectSubmodules(mango_path, "")
+    commands = sorted({*bindings, *virtual})
+    return {"bindings": bindings, "virtual": virtual, "tasks": tasks, "commands": commands, "postings": ngramIndex(commands)}, stamps
+
+def indexCachePath(mango_path: str) -> str | None:
+    """find where the binding index of a mango folder is kept when the folder cannot hold it, e.g. a read-only or shared .mango
+    
+    Such indexes are kept per user in the .indexes folder of the home mango, named after a checksum of the folder's path. Indexes record the path they were built for, so two folders with the same checksum only rebuild each other's index.
+    
+    Keyword arguments:
+    - mango_path -- the path to the .mango folder
+    
+    Return: the path to the index file, None if there is no home mango to keep it in
+    """
+    
+    import zlib
+    
+    home_mango_path = homeMangoPath()
+    if home_mango_path is None:
+        return None
+    return os.path.join(home_mango_path, ".indexes", f"{zlib.crc32(os.fsencode(mango_path)):08x}{INDEX_FILE_NAME}")
+
+def readIndex(index_path: str, mango_path: str, listings: bool, postings: bool = False) -> tuple[dict, dict] | None:
+    """read a binding index file written by writeIndex, if it is up to date
+    
+    Keyword arguments:
+    - index_path -- the path to the index file
+    - mango_path -- the path to the .mango folder the index must have been built for
+    - listings -- whether to read the "virtual" and "commands" sections too
+    - postings -- whether to read the "postings" section too, which implies listings
+    
+    Return: a tuple of (index, stamps), None if the file is missing, of another format, built for another folder, or stale
+    """
+    
+    try:
+        with open(index_path, "rb") as index_file:
+            prefix = index_file.read(INDEX_PREFIX_SIZE)
+            if int.from_bytes(prefix[:4], "little") != INDEX_FORMAT_VERSION:
+                return None
+            header_size, lookup_size, listing_size = (int.from_bytes(prefix[offset:offset + 4], "little") for offset in (4, 8, 12))
+            listings = listings or postings
+            data = memoryview(index_file.read() if postings else index_file.read(header_size + lookup_size + (listing_size if listings else 0)))
+        indexed_path, stamps = marshal.loads(data[:header_size])
+        if indexed_path != mango_path or not all(fileStamp(path) == stamp for path, stamp in stamps.items()):
+            return None
+        offset = header_size + lookup_size
+        index = marshal.loads(data[header_size:offset])
+        if listings:
+            index.update(marshal.loads(data[offset:offset + listing_size]))
+        if postings:
+            # positions are stored as native unsigned ints, and are iterated straight from the bytes
+            index["postings"] = {gram: memoryview(positions).cast("I") for gram, positions in marshal.loads(data[offset + listing_size:]).items()}
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return index, stamps
+
+def writeIndex(index_path: str, mango_path: str, index: dict, stamps: dict) -> None:
+    """atomically write a binding index file, raising OSError if it cannot be written
+    
+    Keyword arguments:
+    - index_path -- the path to the index file
+    - mango_path -- the path to the .mango folder the index was built for
+    - index, stamps -- the index and stamps built by mangoCompileIndex
+    """
+    
+    import array
+    
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        header = marshal.dumps((mango_path, stamps))
+        lookup = marshal.dumps({"bindings": index["bindings"], "tasks": index["tasks"]})
+        listing = marshal.dumps({"virtual": index["virtual"], "commands": index["commands"]})
+        with open(temp_path, "wb") as temp_file:
+            temp_file.write(b"".join(value.to_bytes(4, "little") for value in (INDEX_FORMAT_VERSION, len(header), len(lookup), len(listing))))
+            temp_file.write(header)
+            temp_file.write(lookup)
+            temp_file.write(listing)
+            marshal.dump({gram: array.array("I", positions).tobytes() for gram, positions in index["postings"].items()}, temp_file)
+        os.replace(temp_path, index_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+@traced
+def mangoLoadIndex(mango_path: str, listings: bool = True, postings: bool = False) -> dict | None:
+    """load the compiled binding index of a mango folder, rebuilding it when stale
+    
+    The index is stored in .mango/.bindings.index, or in the per-user indexCachePath when the .mango folder cannot be written to (only in memory if there is no home mango), and is keyed on the mtime and size of every .instructions file it was built from.
+    The file starts with the format version and the lengths of the first three of its four marshalled sections: a header with the stamps, the bindings and tasks a lookup needs, the virtual paths and the command list that only listings need, then the trigram postings that only suggestions need.
+    The sections are read with a single read (lookups, and every nested mango call a script makes, stop before the listing section, and completion before the postings) and unmarshalled from memory.
+    
+    Keyword arguments:
+    - mango_path -- the path to the .mango folder
+    - listings -- whether the caller needs the "virtual" and "commands" sections
+    - postings -- whether the caller needs the "postings" section, which implies listings
+    
+    Return: the index as built by mangoCompileIndex (without "virtual" and "commands" unless listings is set, and without "postings" unless postings is set), None if the tree cannot be compiled (the caller should fall back to mangoScanFind)
+    """
+    
+    # long-lived processes (the daemon) keep indexes in memory and only re-stat their sources
+    if mango_path in loaded_indexes:
+        index, stamps = loaded_indexes[mango_path]
+        if not all(fileStamp(path) == stamp for path, stamp in stamps.items()):
+            loaded_indexes.pop(mango_path, None)
+        elif (not listings or "commands" in index) and (not postings or "postings" in index):
+            return index
+    
+    index_path = os.path.join(mango_path, INDEX_FILE_NAME)
+    loaded = readIndex(index_path, mango_path, listings, postings)
+    if loaded is None and not os.access(mango_path, os.W_OK):
+        index_path = indexCachePath(mango_path)
+        loaded = readIndex(index_path, mango_path, listings, postings) if index_path is not None else None
+    if loaded is not None:
+        loaded_indexes[mango_path] = loaded
+        return loaded[0]
+    
+    try:
+        index, stamps = mangoCompileIndex(mango_path)
+    except (OSError, SyntaxError, RecursionError):
+        # a broken tree is reported by the lazy path, which only fails if the lookup reaches the broken line
+        return None
+    # with nowhere to keep it, such as a read-only folder without a home mango, the index only lasts as long as this process
+    if index_path is not None:
+        try:
+            if index_path != os.path.join(mango_path, INDEX_FILE_NAME):
+                os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            writeIndex(index_path, mango_path, index, stamps)
+        except OSError:
+            pass
+    loaded_indexes[mango_path] = index, stamps
+    return index
+
+def mangoFind(mango_path: str, command: str) -> tuple[str | None, bool]:
+    """find the script that corresponds to a command in a mango module
+    
+    Unprefixed commands are answered from the compiled binding index; submodule paths (`sub:binding`) and broken trees go through mangoScanFind.
+    
+    Keyword arguments:
+    - mango_path -- the path to the .mango folder
+    - command_name -- the command typed in by the user
+    
+    Return: the path to the script if it exists, None if not
+    """
+    
+    submodule_path, binding = splitCommand(command)
+    if not submodule_path:
+        index = mangoLoadIndex(mango_path, listings=False)
+        if index is not None:
+            return index["bindings"].get(binding, (None, False))
+    return mangoScanFind(mango_path, command)
+
+@traced
+def mangoFindFromRepo(repo_path: str, command: str) -> tuple[str | None, bool]:
+    """find the script that corresponds to a command in a mango repository
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - command -- the command typed in by the user
+    
+    Return: the path to the script if it exists, None if not
+    """
+    
+    if not existMangoRepo(repo_path):
+        return None, False
+    return mangoFind(os.path.join(repo_path, ".mango"), command)
+
+@traced
+def mangoRecursiveFindFromRepo(repo_path: str, command: str) -> tuple[str | None, bool]:
+    """find the script that corresponds to a command in a mango repository, recursively, by going up the directory tree
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - command -- the command typed in by the user, with the host flag `@` removed
+    
+    Return: the string of the script if it exists, None if not
+    """
+    while repo_path != "/":
+        script_path, use_source = mangoFindFromRepo(repo_path, command)
+        if script_path is not None:
+            return script_path, use_source
+        repo_path = os.path.dirname(repo_path)
+    return None, False
+
+def mangoEnumerate(repo_path: str, host: bool = False) -> dict[str, tuple[str, bool]]:
+    """list every command visible from a mango repository
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - host -- whether to list host commands (prefixed with @) of every repository up the directory tree instead of normal commands
+    
+    Return: a dict mapping each command to (physical path, use_source), where repositories closer to repo_path shadow the ones above
+    """
+    
+    commands = {}
+    prefix = "@" if host else ""
+    while repo_path != "/":
+        index = mangoLoadIndex(os.path.join(repo_path, ".mango")) if existMangoRepo(repo_path) else None
+        if index is not None:
+            for table in (index["bindings"], index["virtual"]):
+                for command, target in table.items():
+                    commands.setdefault(prefix + command, target)
+        if not host:
+            break
+        repo_path = os.path.dirname(repo_path)
+    return commands
+
+@traced
+def mangoComplete(prefix: str, user_path: str) -> list[str]:
+    """list the commands starting with a prefix, for shell completion
+    
+    Normal commands are looked up in the presorted command list of the index; host commands are merged from every repository up the tree.
+    
+    Keyword arguments:
+    - prefix -- the partially typed command, host commands start with @
+    - user_path -- the directory mango was invoked from
+    
+    Return: the sorted list of matching commands
+    """
+    
+    import bisect
+    
+    try:
+        repo_path = closestMangoRepo(user_path)
+    except FileNotFoundError:
+        return []
+    if prefix.startswith("@"):
+        candidates = sorted(mangoEnumerate(repo_path, host=True))
+    else:
+        index = mangoLoadIndex(os.path.join(repo_path, ".mango"))
+        candidates = index["commands"] if index is not None else []
+    matches = []
+    for candidate in candidates[bisect.bisect_left(candidates, prefix):]:
+        if not candidate.startswith(prefix):
+            break
+        matches.append(candidate)
+    return matches
+
+def commandTrigrams(command: str) -> set[str]:
+    """split a command into the lowercase trigrams used for fuzzy lookups, with its start and end marked
+    
+    Keyword arguments:
+    - command -- the command
+    
+    Return: the set of trigrams
+    """
+    
+    padded = f"^{command.lower()}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def ngramIndex(commands: list[str]) -> dict[str, list[int]]:
+    """map every trigram to the positions of the commands containing it
+    
+    The postings of a repository's own commands are built when its binding index is compiled, and stored in it. Host commands are merged from several indexes, so their postings are built when they are needed.
+    
+    Keyword arguments:
+    - commands -- the commands to index
+    
+    Return: a dict mapping each trigram to the sorted positions of the commands containing it
+    """
+    
+    postings = {}
+    for position, command in enumerate(commands):
+        for gram in commandTrigrams(command):
+            postings.setdefault(gram, []).append(position)
+    return postings
+
+def visibleCommands(user_path: str) -> list[str]:
+    """list every normal and host command that can be run from a directory, for the fuzzy finder
+    
+    Keyword arguments:
+    - user_path -- the directory mango was invoked from
+    
+    Return: the sorted normal commands followed by the sorted host commands
+    """
+    
+    try:
+        repo_path = closestMangoRepo(user_path)
+    except FileNotFoundError:
+        return []
+    index = mangoLoadIndex(os.path.join(repo_path, ".mango"))
+    return (index["commands"] if index is not None else []) + sorted(mangoEnumerate(repo_path, host=True))
+
+@traced
+def mangoExecute(script_path: str, args: list[str], use_source: bool, env: dict[str, str], replace_process: bool = False) -> None:
+    """execute a script with arguments
+    
+    Keyword arguments:
+    - script_path -- the path to the script to execute
+    - args -- the list of arguments to pass to the script
+    - use_source -- whether to source the script instead of executing it in a separate shell
+    - env -- the environment to execute the script with
+    - replace_process -- whether to exec the script in place of the current process instead of supervising it, in which case this function does not return
+    """
+
+    if use_source:
+        import shlex
+        
+        # start a sub-shell with the exact same environment as the current shell
+        # join the script and the shell launch with && to prepare the environment
+        # this should mimic the effect of sourcing the script
+        pre_command = f"source {shlex.quote(script_path)} {shlex.join(args)} && exec $SHELL"
+        if replace_process:
+            # same argv as subprocess.run(shell=True, executable="/bin/bash") would use
+            execReplace("/bin/bash", ["/bin/sh", "-c", pre_command], env)
+        import subprocess
+        subprocess.run(
+            pre_command, shell=True, executable="/bin/bash", env=env, check=True
+        )
+    else:
+        if replace_process and env.get("MANGO_IN_PROCESS") and inProcessPython(script_path, env):
+            mangoRunPython(script_path, args, env)
+        if replace_process:
+            execReplace(script_path, [script_path] + args, env)
+        # os.system(f"{script_path} " + " ".join(args))
+        import subprocess
+        subprocess.run(
+            [script_path] + args, check=True, env=env
+        )
+
+def execReplace(executable: str, argv: list[str], env: dict[str, str]) -> None:
+    """replace the current process with an executable, so that no python parent stays resident
+    
+    Keyword arguments:
+    - executable -- the path to the executable
+    - argv -- the full argument vector, including argv[0]
+    - env -- the environment to execute with
+    """
+    
+    # anything still buffered would be lost once the process image is replaced, and atexit handlers never run
+    if trace_events is not None:
+        # spans enclosing the exec never end, so mark the launch itself
+        trace_events.append(("exec", time.perf_counter_ns(), 0, 0, {"executable": executable}))
+    finishTracing()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # python starts with SIGPIPE and SIGXFSZ ignored, and ignored signals survive exec, so restore them as subprocess does with restore_signals
+    # _signal avoids the enum import of signal on every command
+    import _signal
+    for name in ("SIGPIPE", "SIGXFSZ"):
+        if hasattr(_signal, name):
+            _signal.signal(getattr(_signal, name), _signal.SIG_DFL)
+    os.execve(executable, argv, env)
+
+def inProcessPython(script_path: str, env: dict[str, str]) -> bool:
+    """check whether a script can run inside the mango process instead of a new interpreter
+    
+    Only executable scripts whose shebang names the interpreter mango runs on, without options, qualify, so that they see the same python and site-packages either way.
+    
+    Keyword arguments:
+    - script_path -- the path to the script
+    - env -- the environment the script would be executed with, whose PATH `#!/usr/bin/env python3` is looked up on
+    
+    Return: True if mangoRunPython can run the script
+    """
+    
+    if not os.access(script_path, os.X_OK):
+        # let exec report the error
+        return False
+    try:
+        with open(script_path, "rb") as script_file:
+            words = script_file.readline(256).decode().split() if script_file.read(2) == b"#!" else []
+    except (OSError, UnicodeDecodeError):
+        return False
+    if len(words) == 2 and os.path.basename(words[0]) == "env":
+        directories = [directory for directory in env.get("PATH", os.defpath).split(os.pathsep) if directory]
+        interpreter = next((path for path in (os.path.join(directory, words[1]) for directory in directories) if os.path.isfile(path) and os.access(path, os.X_OK)), None)
+    elif len(words) == 1:
+        interpreter = words[0]
+    else:
+        return False
+    if interpreter is None or not os.path.basename(interpreter).startswith("python"):
+        return False
+    if os.path.abspath(interpreter) == os.path.abspath(sys.executable):
+        return True
+    # a virtual environment links to the base interpreter but has its own site-packages
+    return sys.prefix == sys.base_prefix and os.path.realpath(interpreter) == os.path.realpath(sys.executable)
+
+def mangoRunPython(script_path: str, args: list[str], env: dict[str, str]) -> None:
+    """run a python script inside the mango process, the way its own interpreter would, and exit with its exit code
+    
+    The script gets the argv, environment, working directory and sys.path[0] it would get as a new process. Uncaught exceptions print their traceback and exit with 1, and an uncaught KeyboardInterrupt ends the process with SIGINT, like the interpreter does.
+    
+    Keyword arguments:
+    - script_path -- the path to the script
+    - args -- the list of arguments to pass to the script
+    - env -- the environment to run the script with
+    """
+    
+    if trace_events is not None:
+        # like exec, the script is not part of mango's own time
+        trace_events.append(("run in process", time.perf_counter_ns(), 0, 0, {"script": script_path}))
+    finishTracing()
+    os.environ.clear()
+    os.environ.update(env)
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path[:] = [os.path.dirname(os.path.realpath(script_path))] + [path for path in sys.path if path and os.path.abspath(path) != package_parent]
+    sys.argv = [script_path] + args
+    # runpy would cost more to import than a new interpreter does to start, so set up __main__ the way the interpreter does
+    main_module = type(sys)("__main__")
+    main_module.__file__ = script_path
+    main_module.__cached__ = None
+    main_module.__builtins__ = sys.modules["builtins"]
+    main_module.__loader__ = sys.modules["_frozen_importlib_external"].SourceFileLoader("__main__", script_path)
+    sys.modules["__main__"] = main_module
+    try:
+        with open(script_path, "rb") as script_file:
+            code = compile(script_file.read(), script_path, "exec", dont_inherit=True)
+        exec(code, main_module.__dict__)
+    except SystemExit:
+        raise
+    except BaseException as error:
+        # hide the frames of mango, which a separate interpreter would not have
+        traceback = error.__traceback__
+        while traceback is not None and traceback.tb_frame.f_code.co_filename != script_path:
+            traceback = traceback.tb_next
+        if traceback is not None:
+            error.__traceback__ = traceback
+        sys.excepthook(type(error), error, error.__traceback__)
+        if not isinstance(error, KeyboardInterrupt):
+            exit(1)
+        import signal
+        
+        sys.stdout.flush()
+        sys.stderr.flush()
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGINT)
+        exit(130)
+    exit(0)
+
+def mangoTasks(repo_path: str) -> dict[str, dict[str, list[str]]]:
+    """get the task declarations of a mango repository
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    
+    Return: a dict mapping commands to their declared needs, inputs and outputs, empty if the repository cannot be indexed
+    """
+    
+    index = mangoLoadIndex(os.path.join(repo_path, ".mango"), listings=False)
+    return index["tasks"] if index is not None else {}
+
+def snapshotTask(task: dict[str, list[str]] | None) -> bool:
+    """check whether the task declarations of a sourced command ask for an environment snapshot
+    
+    Keyword arguments:
+    - task -- the declarations of the command, as returned by mangoTasks, or None
+    
+    Return: True if the command declares a cache, and neither dependencies nor outputs
+    """
+    
+    return task is not None and "cache" in task and "needs" not in task and "outputs" not in task
+
+def historyPath(recording: bool = True) -> str | None:
+    """find the run history database
+    
+    Recording is enabled by setting MANGO_HISTORY, either to 1 for the default .history.sqlite of the home mango, or to a database path.
+    Without a home mango, MANGO_HISTORY=1 reports that runs are not recorded rather than creating ~/.mango.
+    
+    Keyword arguments:
+    - recording -- whether the path is needed to record a run, rather than to read past ones
+    
+    Return: the path to the database, None if recording is disabled, or there is no home mango to record in, and recording is True
+    """
+    
+    value = os.environ.get("MANGO_HISTORY", "")
+    if value in ("", "0") and recording:
+        return None
+    if value in ("", "0", "1"):
+        home_mango_path = homeMangoPath()
+        if home_mango_path is not None:
+            return os.path.join(home_mango_path, ".history.sqlite")
+        if recording:
+            print("Runs are not recorded: MANGO_HISTORY=1 needs a home mango (~/.mango/.instructions). Set MANGO_HISTORY to a database path instead.", file=sys.stderr)
+            return None
+        # reading never creates anything, and finds no runs
+        return os.path.join(os.path.expanduser("~"), ".mango", ".history.sqlite")
+    return value
+
+@traced
+def mangoResolve(command: str, user_path: str) -> tuple[str | None, bool, str]:
+    """resolve a command typed in by the user to a script
+    
+    Keyword arguments:
+    - command -- the command typed in by the user, host commands start with @
+    - user_path -- the directory mango was invoked from
+    
+    Return: a tuple of (script path or None, whether the binding enforces sourcing, repo path of the active mango)
+    """
+    
+    repo_path = closestMangoRepo(user_path)
+    if command.startswith("@"):
+        script, enforce_source = mangoRecursiveFindFromRepo(repo_path, command[1:])
+    else:
+        script, enforce_source = mangoFindFromRepo(repo_path, command)
+    return script, enforce_source, repo_path
+
+def mangoEnviron(script: str, repo_path: str, user_path: str, base_env: dict[str, str]) -> dict[str, str]:
+    """build the environment a script is executed with
+    
+    Keyword arguments:
+    - script -- the path to the script being invoked
+    - repo_path -- the repo path of the active mango
+    - user_path -- the directory mango was invoked from
+    - base_env -- the environment of the invoking shell
+    
+    Return: a copy of base_env with the MANGO_* variables set
+    """
+    
+    env = dict(base_env)
+    env.update({
+        "MANGO": "",
+        "MANGO_REPO_PATH": repo_path,
+        "MANGO_USER_PATH": user_path,
+        "MANGO_SCRIPT_PATH": os.path.abspath(script),
+        "MANGO_SCRIPT_NAME": os.path.basename(script)
+    })
+    return env
+
+def mangoShellPlan(argv: list[str], user_path: str) -> str:
+    """resolve a command for the shell function installed by --shell-init, as a line for the shell to eval
+    
+    Sourced scripts are sourced by the calling shell itself with their arguments quoted, or have their environment snapshot replayed if they declare a cache, and plain scripts are run directly. Anything else (options, task graphs, recorded runs) is handed back to the mango executable unchanged.
+    
+    Keyword arguments:
+    - argv -- the arguments given to the shell function
+    - user_path -- the directory the shell function was called from
+    
+    Return: the shell code to eval
+    
+    Raises FileNotFoundError("command not found") after reporting it, if the command does not resolve
+    """
+    
+    import shlex
+    
+    fallback = shlex.join(["command", "mango"] + argv)
+    use_source = False
+    refresh = False
+    command_argv = argv
+    while command_argv[:1] in (["-s"], ["--source"], ["--refresh"]):
+        refresh = refresh or command_argv[0] == "--refresh"
+        use_source = use_source or command_argv[0] != "--refresh"
+        command_argv = command_argv[1:]
+    if not command_argv or command_argv[0].startswith("-"):
+        return fallback
+    command, command_args = command_argv[0], command_argv[1:]
+    script, enforce_source, repo_path = mangoResolve(command, user_path)
+    if script is None:
+        reportCommandNotFound(command, user_path)
+        raise FileNotFoundError("command not found")
+    use_source = use_source or enforce_source
+    tasks = mangoTasks(repo_path) if not command.startswith("@") else {}
+    if use_source and snapshotTask(tasks.get(command)):
+        # replay the snapshot in the calling shell; the script's output must not end up in the code it evals
+        env = mangoEnviron(script, repo_path, user_path, dict(os.environ))
+        task = {"script": script, "args": command_args, "env": env, "cache": tasks[command]["cache"], "inputs": tasks[command].get("inputs", [])}
+        from .tasks import mangoSourceSnapshot
+        environ, definitions, returncode = mangoSourceSnapshot(repo_path, task, refresh=refresh, stdout=sys.stderr)
+        if environ is None:
+            return f"return {returncode}"
+        lines = [f"unset {name}" for name in sorted(env) if name not in environ and name.isascii() and name.isidentifier()]
+        # exported functions show up as BASH_FUNC_name%% variables, and are defined by the definitions instead
+        lines += [f"export {name}={shlex.quote(value)}" for name, value in sorted(environ.items()) if env.get(name) != value and name.isascii() and name.isidentifier()]
+        return "\n".join(lines + [definitions])
+    if not use_source and (historyPath() is not None or command in tasks):
+        return fallback
+    env = mangoEnviron(script, repo_path, user_path, {})
+    # assignments in front of a command only last for that command, so the calling shell keeps its own environment
+    assignments = " ".join(f"{name}={shlex.quote(value)}" for name, value in env.items())
+    return f"{assignments} {'source ' if use_source else ''}{shlex.join([script] + command_args)}"
+
+def mangoArgumentParser() -> "argparse.ArgumentParser":
+    """build the command line parser shared by the mango entrypoint and the daemon
+    
+    Return: the argument parser
+    """
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description="Mango: a simple script manager",
+        epilog=epilog_message,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('-v', '--version', action='version', version=f'Mango {__version__}')
+    parser.add_argument('-s', '--source', action='store_true', help="source the script instead of executing it in a separate shell")
+    parser.add_argument('--no-exec', action='store_true', help="run the script as a supervised child process instead of replacing mango with it")
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help="run several commands concurrently on N workers: `mango -j N cmd1 cmd2` or `mango -j N cmd1 args :: cmd2 args`")
+    parser.add_argument('--fail-fast', action='store_true', help="with -j, stop all commands as soon as one fails")
+    parser.add_argument('--output', choices=['prefix', 'group'], default='prefix', help="with -j, prefix each output line with its command, or group output per command")
+    parser.add_argument('--resolve', action='store_true', help="read commands from stdin, one per line, and print the path of each script as it resolves, for editors and other tools")
+    parser.add_argument('--json', action='store_true', help="with --resolve, read JSON queries ({\"command\", \"cwd\", \"host\"}) and answer each with a JSON line giving the script, virtual path, use_source flag and defining .instructions line")
+    parser.add_argument('--complete', metavar='PREFIX', help="list the commands starting with PREFIX, for shell completion")
+    parser.add_argument('--shell-init', choices=['bash', 'zsh'], help="print a mango shell function and completions that source scripts in the current shell, e.g. eval \"$(mango --shell-init bash)\"")
+    parser.add_argument('--completion', choices=sorted(completion_scripts), help="print the completion script for a shell, e.g. eval \"$(mango --completion bash)\"")
+    parser.add_argument('--each', metavar='SPEC', help="run the command in every mango repository matching a directory glob, or listed in a file, on -j workers")
+    parser.add_argument('--pick', action='store_true', help="pick the command with a fuzzy finder, starting from the command given as the query; the pick is printed instead of run when the output is not a terminal")
+    parser.add_argument('--sync', action='store_true', help="pull every nested submodule of the active mango from its git upstream, on -j workers, then rebuild the binding index")
+    parser.add_argument('--check', action='store_true', help="validate every .instructions file of the active mango and its submodules, using -j workers")
+    parser.add_argument('--watch', action='store_true', help="run the command, then run it again whenever a file of the repository changes")
+    parser.add_argument('--include', action='append', default=[], metavar='GLOB', help="with --watch, only run again when a path matching GLOB changes (repeatable)")
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB', help="with --watch, ignore changes to paths matching GLOB (repeatable)")
+    parser.add_argument('--debounce', type=float, default=0.2, metavar='SECONDS', help="with --watch, wait for SECONDS without changes before running again")
+    parser.add_argument('--on-change', choices=['kill', 'queue'], default='kill', help="with --watch, stop a run that is still going, or start the next one once it finishes")
+    parser.add_argument('--poll', action='store_true', help="with --watch, poll for changes instead of using inotify")
+    parser.add_argument('--refresh', action='store_true', help="run a command declared with `(command) cache:` again instead of replaying its recorded result or environment snapshot, and record the new one")
+    parser.add_argument('--stats', action='store_true', help="show duration percentiles and failure rates of the runs recorded with MANGO_HISTORY, for all commands or the given one")
+    parser.add_argument('--daemon', action='store_true', help="serve command resolution over a unix socket for later mango invocations")
+    parser.add_argument("command", nargs='?', help="The command to run. Host commands start with @")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments to pass to the command", default=[])
+    return parser
+
+def daemonSocketPath() -> str:
+    """find the unix socket used by the mango daemon
+    
+    The socket lives in a mango-<uid> folder of $XDG_RUNTIME_DIR (or /tmp) that only the user can access. The path can be overridden with MANGO_DAEMON_SOCKET.
+    
+    Return: the path to the socket
+    """
+    
+    if "MANGO_DAEMON_SOCKET" in os.environ:
+        return os.environ["MANGO_DAEMON_SOCKET"]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(runtime_dir, f"mango-{os.getuid()}", "daemon.sock")
+
+def daemonPeerUid(connection: "_socket.socket") -> int | None:
+    """find the user on the other end of a unix socket connection
+    
+    Keyword arguments:
+    - connection -- the connected unix socket
+    
+    Return: the uid of the peer, None if the platform cannot tell (it has no SO_PEERCRED)
+    """
+    
+    import _socket
+    
+    if not hasattr(_socket, "SO_PEERCRED"):
+        return None
+    # struct ucred is the pid, uid and gid of the peer as native ints
+    credentials = connection.getsockopt(_socket.SOL_SOCKET, _socket.SO_PEERCRED, 12)
+    return int.from_bytes(credentials[4:8], sys.byteorder)
+
+def sendMessage(connection: "_socket.socket", message) -> None:
+    """write a request or reply to a daemon connection
+    
+    Keyword arguments:
+    - connection -- the connected unix socket
+    - message -- the message, made of values marshal can dump
+    """
+    
+    payload = marshal.dumps(message)
+    connection.sendall(len(payload).to_bytes(DAEMON_LENGTH_SIZE, "little") + payload)
+
+def receiveMessage(connection: "_socket.socket"):
+    """read a message written by sendMessage from a daemon connection
+    
+    Keyword arguments:
+    - connection -- the connected unix socket
+    
+    Return: the message
+    
+    Raises EOFError if the connection is closed before the whole message arrived, ValueError if it is not a marshalled value
+    """
+    
+    def receiveExactly(size: int) -> bytes:
+        chunks = []
+        while size > 0:
+            chunk = connection.recv(min(size, 1 << 20))
+            if not chunk:
+                raise EOFError("daemon connection closed mid-message")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+    
+    return marshal.loads(receiveExactly(int.from_bytes(receiveExactly(DAEMON_LENGTH_SIZE), "little")))
+
+@traced
+def mangoDaemonRequest(socket_path: str, argv: list[str], cwd: str, env: dict[str, str]) -> dict | None:
+    """ask a running mango daemon to resolve a command
+    
+    Keyword arguments:
+    - socket_path -- the path to the daemon's unix socket
+    - argv -- the command line arguments, without the program name
+    - cwd -- the directory mango was invoked from
+    - env -- the environment of the invoking shell
+    
+    Return: the daemon's reply, None if no daemon is reachable, it is not run by the same user, or it asks the client to fall back
+    """
+    
+    import stat
+    
+    try:
+        socket_stat = os.lstat(socket_path)
+    except OSError:
+        return None
+    if not stat.S_ISSOCK(socket_stat.st_mode) or socket_stat.st_uid != os.getuid():
+        return None
+    # the client runs on every command, so it uses the bare _socket module rather than socket, which loads selectors, enum and more
+    import _socket
+    
+    try:
+        client = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    except OSError:
+        return None
+    try:
+        client.settimeout(DAEMON_TIMEOUT)
+        client.connect(socket_path)
+        # the reply decides what gets executed, so it must come from a daemon of the same user
+        if daemonPeerUid(client) != os.getuid():
+            return None
+        sendMessage(client, {"argv": argv, "cwd": cwd, "env": env})
+        reply = receiveMessage(client)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    finally:
+        client.close()
+    if not isinstance(reply, dict) or reply.get("fallback"):
+        return None
+    return reply
+
+def plainArguments(argv: list[str]) -> "types.SimpleNamespace":
+    """parse a command line that starts with a command, without loading argparse
+    
+    Everything after the command belongs to the script, so no option can follow; the result matches what mangoArgumentParser would return.
+    
+    Keyword arguments:
+    - argv -- the command line arguments, whose first one is not an option
+    
+    Return: the parsed arguments, with every option at its default
+    """
+    
+    import types
+    
+    return types.SimpleNamespace(
+        source=False, no_exec=False, jobs=None, fail_fast=False, output="prefix", complete=None, shell_init=None,
+        completion=None, each=None, check=False, resolve=False, json=False, watch=False, include=[], exclude=[],
+        debounce=0.2, on_change="kill", poll=False, refresh=False, stats=False, pick=False, sync=False, daemon=False, command=argv[0], args=argv[1:]
+    )
+
+def calledProcessReturnCode(error: BaseException) -> int | None:
+    """find the exit code of a script that failed while mango supervised it
+    
+    Keyword arguments:
+    - error -- an exception raised while running a command
+    
+    Return: the exit code if error is a subprocess.CalledProcessError, None otherwise
+    """
+    
+    # only supervised runs raise these, and they import subprocess themselves
+    subprocess = sys.modules.get("subprocess")
+    if subprocess is not None and isinstance(error, subprocess.CalledProcessError):
+        return error.returncode
+    return None
+
+def reportCommandNotFound(command: str, user_path: str) -> None:
+    """tell the user that a command could not be resolved, and what they might have meant
+    
+    Keyword arguments:
+    - command -- the command typed in by the user, host commands start with @
+    - user_path -- the directory mango was invoked from
+    """
+    
+    if (command.startswith("@")):
+        # this is a host command
+        print(f"Command '{command[1:]}' not found in any repo. Should it exist?", file=sys.stderr)
+    else:
+        # this is a normal command
+        print(f"Command '{command}' not found in the current repo. Should it exist?", file=sys.stderr)
+    from .suggest import mangoSuggest
+    suggestions = mangoSuggest(command, user_path)
+    if suggestions:
+        print(f"Did you mean: {', '.join(suggestions)}?", file=sys.stderr)
+
+def mango():
+    """the main function for the mango script
+    """
+    
+    argv = sys.argv[1:]
+    if len(argv) == 2 and argv[0] == "--complete":
+        # completion runs on every keystroke, so it skips argument parsing altogether
+        for candidate in mangoComplete(argv[1], os.getcwd()):
+            print(candidate)
+        return
+    if argv[:1] == ["--shell-resolve"]:
+        # called by the shell function on every command, which evals whatever is printed
+        try:
+            print(mangoShellPlan(argv[1:], os.getcwd()))
+        except FileNotFoundError as e:
+            if str(e) == "mango repository not found":
+                print("No mango repository found in any directory. Where's your home mango I wonder :P", file=sys.stderr)
+            elif str(e) != "command not found":
+                raise
+            exit(1)
+        except SyntaxError as e:
+            print("Invalid .instructions file. Does it exist? Or is there something wrong with it :<", file=sys.stderr)
+            print(">>> Syntax Error:\n", str(e.__cause__), file=sys.stderr)
+            exit(1)
+        return
+    if argv and not argv[0].startswith("-") and os.environ.get("MANGO_DAEMON") == "1":
+        # a running daemon answers plain commands without parsing anything in this process
+        reply = mangoDaemonRequest(daemonSocketPath(), argv, os.getcwd(), dict(os.environ))
+        if reply is not None:
+            try:
+                history_path = historyPath()
+                if history_path is not None:
+                    from .history import mangoExecuteRecorded
+                    mangoExecuteRecorded(history_path, argv[0], reply["script"], reply["args"], use_source=reply["use_source"], env=reply["env"])
+                else:
+                    mangoExecute(reply["script"], reply["args"], use_source=reply["use_source"], env=reply["env"], replace_process=True)
+            except Exception as e:
+                returncode = calledProcessReturnCode(e)
+                if returncode is None:
+                    raise
+                exit(returncode)
+            return
+    
+    with traceSpan("parse arguments"):
+        if argv and not argv[0].startswith("-"):
+            # argparse is only needed for options, help and usage errors
+            args = plainArguments(argv)
+        else:
+            args = mangoArgumentParser().parse_args(argv)
+    if args.daemon:
+        from .daemon import mangoDaemon
+        try:
+            mangoDaemon(daemonSocketPath())
+        except PermissionError as e:
+            print(f"Refusing to start the daemon: {e}", file=sys.stderr)
+            exit(1)
+        return
+    if args.completion is not None:
+        print(completion_scripts[args.completion], end="")
+        return
+    if args.shell_init is not None:
+        print(shell_init_function + completion_scripts[args.shell_init], end="")
+        return
+    if args.complete is not None:
+        for candidate in mangoComplete(args.complete, os.getcwd()):
+            print(candidate)
+        return
+    if args.stats:
+        from .history import mangoStats
+        history_path = historyPath(recording=False)
+        summary = mangoStats(history_path, args.command)
+        if not summary:
+            print(f"No runs recorded in {history_path}. Set MANGO_HISTORY=1 to record runs.", file=sys.stderr)
+            return
+        rows = [("COMMAND", "RUNS", "FAIL%", "P50", "P95", "MAX", "PEAK RSS", "REPO")]
+        for entry in summary:
+            rows.append((
+                entry["binding"], str(entry["runs"]), f"{100 * entry['failures'] / entry['runs']:.1f}",
+                f"{entry['p50']:.3f}s", f"{entry['p95']:.3f}s", f"{entry['max']:.3f}s",
+                f"{entry['peak_rss'] / (1024 * 1024):.1f}M", entry["repo"]
+            ))
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]) - 1)]
+        for row in rows:
+            print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) + "  " + row[-1])
+        return
+    if args.sync:
+        try:
+            repo_path = closestMangoRepo()
+        except FileNotFoundError:
+            print("No mango repository found in any directory. Where's your home mango I wonder :P", file=sys.stderr)
+            exit(1)
+        from .sync import mangoSync
+        results = mangoSync(repo_path, args.jobs or 8)
+        if not results:
+            print(f"No submodules in {os.path.join(repo_path, '.mango')}.", file=sys.stderr)
+            return
+        rows = [("SUBMODULE", "STATUS", "DURATION", "DETAIL")] + [(virtual_path, status, f"{seconds:.2f}s", detail) for virtual_path, status, seconds, detail in results]
+        widths = [max(len(row[column]) for row in rows) for column in range(3)]
+        for row in rows:
+            print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) + "  " + row[3])
+        exit(1 if any(status == "failed" for _, status, _, _ in results) else 0)
+    if args.check:
+        try:
+            repo_path = closestMangoRepo()
+        except FileNotFoundError:
+            print("No mango repository found in any directory. Where's your home mango I wonder :P", file=sys.stderr)
+            exit(1)
+        from .check import mangoCheck
+        diagnostics = mangoCheck(repo_path, args.jobs or os.cpu_count() or 1)
+        for path, line_number, severity, message in diagnostics:
+            location = f"{path}:{line_number}" if line_number else path
+            print(f"{location}: {severity}: {message}")
+        errors = sum(1 for diagnostic in diagnostics if diagnostic[2] == "error")
+        print(f"{errors} error(s), {len(diagnostics) - errors} warning(s)", file=sys.stderr)
+        exit(1 if errors else 0)
+    if args.resolve:
+        from .resolve import mangoResolveStream
+        mangoResolveStream(sys.stdin, sys.stdout, json_lines=args.json)
+        return
+    if args.json:
+        mangoArgumentParser().error("argument --json: only valid with --resolve")
+    if args.command is None and not args.pick:
+        mangoArgumentParser().error("the following arguments are required: command")
+    script = None
+    use_source = args.source
+    
+    try:
+        user_path = os.getcwd()
+        command, command_args = args.command, args.args
+        if args.pick:
+            from .picker import mangoPick
+            try:
+                picked = mangoPick(user_path, command or "")
+            except OSError:
+                print("The fuzzy finder needs a terminal.", file=sys.stderr)
+                exit(1)
+            if picked is None:
+                exit(130)
+            if not sys.stdout.isatty():
+                print(picked)
+                return
+            command = picked
+        if args.jobs is not None and args.jobs < 1:
+            mangoArgumentParser().error("argument -j/--jobs: must be at least 1")
+        if args.each is not None:
+            if command.startswith("@"):
+                mangoArgumentParser().error("argument --each: host commands cannot be fanned out")
+            from .jobs import mangoEach
+            exit(mangoEach(args.each, command, command_args, args.jobs or os.cpu_count() or 1, fail_fast=args.fail_fast, grouped=args.output == "group", history_path=historyPath()))
+        if args.watch:
+            from .watch import mangoWatch
+            mangoWatch(command, command_args, user_path, args.include, args.exclude, args.debounce, args.on_change, poll=args.poll)
+            return
+        if args.jobs is not None:
+            from .jobs import mangoRunJobs, reportJobs, splitJobCommands
+            try:
+                job_commands = splitJobCommands([args.command] + args.args)
+            except ValueError as e:
+                mangoArgumentParser().error(str(e))
+            if len(job_commands) == 1:
+                # a single command only uses the workers for its task graph
+                command, command_args = job_commands[0]
+        if args.jobs is not None and len(job_commands) > 1:
+            # resolve every command before starting any of them
+            jobs = []
+            for command, command_args in job_commands:
+                script, enforce_source, repo_path = mangoResolve(command, user_path)
+                if script is None:
+                    reportCommandNotFound(command, user_path)
+                    raise FileNotFoundError("command not found")
+                if use_source or enforce_source:
+                    print(f"Command '{command}' sources its script and cannot run as a parallel job.", file=sys.stderr)
+                    exit(1)
+                jobs.append((command, script, command_args, mangoEnviron(script, repo_path, user_path, os.environ), None))
+            results = []
+            exit_code = mangoRunJobs(jobs, args.jobs, fail_fast=args.fail_fast, grouped=args.output == "group", results=results)
+            reportJobs(jobs, results)
+            history_path = historyPath()
+            if history_path is not None:
+                from .history import recordRuns
+                recordRuns(history_path, [
+                    (label, script, env["MANGO_REPO_PATH"], job_args, started, seconds, returncode, peak_rss)
+                    for (label, script, job_args, env, _), (returncode, seconds, started, peak_rss) in zip(jobs, results) if returncode is not None
+                ])
+            exit(exit_code)
+        script, enforce_source, repo_path = mangoResolve(command, user_path)
+        if script is None:
+            reportCommandNotFound(command, user_path)
+            raise FileNotFoundError("command not found")
+        tasks = mangoTasks(repo_path) if not command.startswith("@") else {}
+        if (use_source or enforce_source) and snapshotTask(tasks.get(command)):
+            # a cache declaration turns a sourced command into a replayed environment snapshot
+            task = {
+                "script": script, "args": command_args, "env": mangoEnviron(script, repo_path, user_path, os.environ),
+                "cache": tasks[command]["cache"], "inputs": tasks[command].get("inputs", [])
+            }
+            from .tasks import mangoEnterShell, mangoSourceSnapshot
+            history_path = historyPath()
+            recording = null_span
+            if history_path is not None:
+                from .history import RecordedRun
+                recording = RecordedRun(history_path, command, script, repo_path, command_args)
+            with recording:
+                environ, _, returncode = mangoSourceSnapshot(repo_path, task, refresh=args.refresh)
+                if environ is None:
+                    exit(returncode)
+                # like any sourced command, a recorded run stays around until the shell it hands over to exits
+                mangoEnterShell(environ, replace_process=not args.no_exec and history_path is None)
+            return
+        if command in tasks:
+            # declared dependencies or outputs turn the command into a task graph
+            from .tasks import mangoRunTaskGraph, mangoTaskGraph
+            try:
+                graph = mangoTaskGraph(repo_path, command, tasks)
+            except ValueError as e:
+                print(f"Invalid task graph for '{command}': {e}", file=sys.stderr)
+                exit(1)
+            for task_command, task in graph.items():
+                if use_source or task["use_source"]:
+                    print(f"Command '{task_command}' sources its script and cannot run as a task.", file=sys.stderr)
+                    exit(1)
+                task["args"] = command_args if task_command == command else []
+                task["env"] = mangoEnviron(task["script"], repo_path, user_path, os.environ)
+                task["refresh"] = args.refresh
+            history_path = historyPath()
+            recording = null_span
+            if history_path is not None:
+                from .history import RecordedRun
+                # the whole graph is recorded as one run of the command typed in
+                recording = RecordedRun(history_path, command, script, repo_path, command_args)
+            with recording:
+                exit(mangoRunTaskGraph(graph, repo_path, args.jobs or os.cpu_count() or 1))
+        # execute the script
+        # unless --no-exec is given, the script (or the bash sourcing it) takes over the current python process
+        env = mangoEnviron(script, repo_path, user_path, os.environ)
+        history_path = historyPath()
+        if history_path is not None:
+            # recording needs the exit code and resource usage, so mango stays around as the parent
+            from .history import mangoExecuteRecorded
+            mangoExecuteRecorded(history_path, command, script, command_args, use_source=use_source or enforce_source, env=env)
+        else:
+            mangoExecute(script, command_args, use_source=use_source or enforce_source, env=env, replace_process=not args.no_exec)
+    except FileNotFoundError as e:
+        if str(e) == "mango repository not found":
+            print("No mango repository found in any directory. Where's your home mango I wonder :P", file=sys.stderr)
+            exit(1)
+        elif str(e) == "command not found":
+            # the error message has already been printed, so directly exit
+            exit(1)
+        else:
+            raise
+    except SyntaxError as e:
+        if str(e) == "invalid .instructions file":
+            print("Invalid .instructions file. Does it exist? Or is there something wrong with it :<", file=sys.stderr)
+            print(">>> Syntax Error:\n", str(e.__cause__), file=sys.stderr)
+            exit(1)
+        else:
+            raise
+    except Exception as e:
+        returncode = calledProcessReturnCode(e)
+        if returncode is None:
+            raise
+        # print("An error occurred when executing the script :|", file=sys.stderr)
+        # print(">>> Captured stdout:\n", e.stdout, file=sys.stderr)
+        # print(">>> Captured stderr:\n", e.stderr, file=sys.stderr)
+        exit(returncode)
@@ -0,0 +1,10 @@
+"""entrypoint for `python -m mango_cli` and for the single-file build"""
+
+import time
+launch_ns = time.perf_counter_ns()
+
+import mango_cli
+
+mango_cli.trace_origin_ns = launch_ns
+mango_cli.startTracing()
+mango_cli.mango()
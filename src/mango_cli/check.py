@@ -0,0 +1,134 @@
+"""
+mango check
+> validation of a repository's .instructions files (mango --check)
+"""
+
+import os
+
+from . import mapSubmodulePath, parseInstruction, traced, traceSpan
+
+def checkInstructionsFile(folder: str) -> tuple[list[tuple[int, tuple]], list[tuple[str, int, str, str]]]:
+    """parse every line of a mango folder's .instructions file, collecting problems instead of stopping at the first one
+    
+    Keyword arguments:
+    - folder -- the path to the .mango folder
+    
+    Return: a tuple of (instructions, diagnostics), where instructions is a list of (line number, parsed instruction) and diagnostics a list of (path, line number, severity, message)
+    """
+    
+    instructions_path = os.path.join(folder, ".instructions")
+    instructions = []
+    diagnostics = []
+    try:
+        with traceSpan("parse .instructions", path=instructions_path), open(instructions_path, "r") as instructions_file:
+            lines = list(instructions_file)
+    except OSError as e:
+        return [], [(instructions_path, 0, "error", f"cannot read .instructions: {e.strerror}")]
+    for line_number, line in enumerate(lines, start=1):
+        try:
+            instruction = parseInstruction(line)
+        except SyntaxError as e:
+            diagnostics.append((instructions_path, line_number, "error", str(e)))
+            continue
+        if instruction is None:
+            continue
+        instructions.append((line_number, instruction))
+        if instruction[0] == "bind":
+            script_path = os.path.join(folder, instruction[1])
+            if not os.path.isfile(script_path):
+                diagnostics.append((instructions_path, line_number, "error", f"script '{instruction[1]}' does not exist"))
+            elif not instruction[3] and not os.access(script_path, os.X_OK):
+                diagnostics.append((instructions_path, line_number, "warning", f"script '{instruction[1]}' is not executable"))
+        elif instruction[0] in ("export", "rebind"):
+            try:
+                mapSubmodulePath(instruction[1], base_path=folder, absolute=True)
+            except FileNotFoundError:
+                diagnostics.append((instructions_path, line_number, "error", f"submodule '{instruction[1]}' does not exist"))
+    return instructions, diagnostics
+
+@traced
+def mangoCheck(repo_path: str, max_workers: int) -> list[tuple[str, int, str, str]]:
+    """validate the .instructions files of a repository and all of its nested submodules
+    
+    Every file is parsed in full, concurrently, then bindings are resolved the way lookups would resolve them to find shadowed and duplicate bindings, rebinds of missing bindings and tasks needing unknown commands.
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - max_workers -- the number of files parsed at once
+    
+    Return: a list of (path, line number, severity, message) diagnostics, sorted by path and line, where severity is "error" or "warning"
+    """
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    root = os.path.join(repo_path, ".mango")
+    folders = []
+    pending = [root]
+    while pending:
+        folder = pending.pop()
+        folders.append(folder)
+        submodules_path = os.path.join(folder, ".submodules")
+        if os.path.isdir(submodules_path):
+            for name in sorted(os.listdir(submodules_path)):
+                submodule_folder = os.path.join(submodules_path, name, ".mango")
+                if os.path.isdir(submodule_folder):
+                    pending.append(submodule_folder)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parsed = dict(zip(folders, executor.map(checkInstructionsFile, folders)))
+    diagnostics = [diagnostic for _, file_diagnostics in parsed.values() for diagnostic in file_diagnostics]
+    
+    # resolve what every folder exposes, remembering where each binding came from
+    visible = {}
+    
+    def visibleBindings(folder: str) -> dict[str, tuple[str, int]]:
+        folder = os.path.normpath(folder)
+        if folder in visible:
+            return visible[folder]
+        visible[folder] = {}
+        table = {}
+        instructions_path = os.path.join(folder, ".instructions")
+        instructions = parsed[folder][0] if folder in parsed else checkInstructionsFile(folder)[0]
+        
+        def provide(binding: str, line_number: int, origin: tuple[str, int]) -> None:
+            if binding not in table:
+                table[binding] = origin
+                return
+            first_path, first_line = table[binding]
+            kind = "duplicate" if first_path == instructions_path else "shadowed"
+            diagnostics.append((instructions_path, line_number, "warning", f"{kind} binding '{binding}', already provided by {first_path}:{first_line}"))
+        
+        for line_number, instruction in instructions:
+            if instruction[0] == "bind":
+                for binding in instruction[2]:
+                    provide(binding, line_number, (instructions_path, line_number))
+            elif instruction[0] in ("export", "rebind"):
+                try:
+                    submodule_table = visibleBindings(mapSubmodulePath(instruction[1], base_path=folder, absolute=True))
+                except FileNotFoundError:
+                    continue
+                if instruction[0] == "export":
+                    for binding, origin in submodule_table.items():
+                        provide(binding, line_number, origin)
+                elif instruction[2] not in submodule_table:
+                    diagnostics.append((instructions_path, line_number, "error", f"binding '{instruction[2]}' not found in submodule '{instruction[1]}'"))
+                else:
+                    for binding in instruction[3]:
+                        provide(binding, line_number, (instructions_path, line_number))
+        visible[folder] = table
+        return table
+    
+    for folder in folders:
+        visibleBindings(folder)
+    
+    root_instructions_path = os.path.join(root, ".instructions")
+    root_bindings = visible[os.path.normpath(root)]
+    for line_number, instruction in parsed[root][0]:
+        if instruction[0] != "task":
+            continue
+        names = [instruction[1]] + (instruction[3] if instruction[2] == "needs" else [])
+        for name in names:
+            if ':' not in name and name not in root_bindings:
+                diagnostics.append((root_instructions_path, line_number, "error", f"task refers to unknown command '{name}'"))
+    
+    return sorted(set(diagnostics))
@@ -0,0 +1,282 @@
+"""
+mango coordination
+> concurrency limits and shared runs of a binding across mango processes
+"""
+
+import os
+import sys
+import time
+
+# how often processes queued for a binding's slot, or attached to a shared run, look for progress
+COORDINATION_POLL_INTERVAL = 0.05
+
+def locksPath(repo_path: str) -> str:
+    """find the folder holding the lock files that coordinate concurrent runs of a repository's commands
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    
+    Return: the path to the .locks folder of the repository's .mango folder
+    """
+    
+    return os.path.join(repo_path, ".mango", ".locks")
+
+def liveTickets(locks_path: str, name: str) -> tuple[list[str], int]:
+    """list the tickets of processes waiting for a slot of a command, dropping the ones left behind by processes that died
+    
+    Every ticket file is locked by the process it belongs to for as long as it waits or runs, so a ticket that can be locked is stale.
+    
+    Keyword arguments:
+    - locks_path -- the path to the .locks folder
+    - name -- the command, as used in lock file names
+    
+    Return: a tuple of (paths of the waiting tickets, oldest first; number of running tickets)
+    """
+    
+    import fcntl
+    
+    waiting = []
+    running = 0
+    for entry in sorted(os.listdir(locks_path)):
+        if not entry.startswith(name + "."):
+            continue
+        kind, _, number = entry[len(name) + 1:].partition(".")
+        if kind not in ("wait", "run") or len(number) != 12 or not number.isdigit():
+            continue
+        path = os.path.join(locks_path, entry)
+        try:
+            ticket_fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            fcntl.flock(ticket_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if kind == "wait":
+                waiting.append(path)
+            else:
+                running += 1
+            continue
+        finally:
+            os.close(ticket_fd)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return waiting, running
+
+def acquireSlot(locks_path: str, command: str, limit: int) -> tuple[int, str]:
+    """wait until fewer than limit runs of a command are going on the host, first come first served
+    
+    Tickets are numbered under a short lock on the command's queue file. The oldest live waiting ticket is turned into a running one as soon as fewer than limit tickets are running; the others poll.
+    
+    Keyword arguments:
+    - locks_path -- the path to the .locks folder
+    - command -- the command to run
+    - limit -- the maximum number of runs going at once
+    
+    Return: the slot, as a tuple of (locked file descriptor, path) of the running ticket, to be given to releaseSlot
+    """
+    
+    import fcntl
+    
+    name = command.replace(os.sep, "%")
+    os.makedirs(locks_path, exist_ok=True)
+    queue_fd = os.open(os.path.join(locks_path, f"{name}.queue"), os.O_RDWR | os.O_CREAT, 0o644)
+    ticket_fd = None
+    try:
+        fcntl.flock(queue_fd, fcntl.LOCK_EX)
+        try:
+            number = int(os.pread(queue_fd, 32, 0) or b"0")
+        except ValueError:
+            number = 0
+        os.ftruncate(queue_fd, 0)
+        os.pwrite(queue_fd, str(number + 1).encode(), 0)
+        ticket_path = os.path.join(locks_path, f"{name}.wait.{number:012d}")
+        ticket_fd = os.open(ticket_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(ticket_fd, fcntl.LOCK_EX)
+        fcntl.flock(queue_fd, fcntl.LOCK_UN)
+        
+        announced = False
+        while True:
+            fcntl.flock(queue_fd, fcntl.LOCK_EX)
+            try:
+                waiting, running = liveTickets(locks_path, name)
+                if waiting[:1] == [ticket_path] and running < limit:
+                    run_path = os.path.join(locks_path, f"{name}.run.{number:012d}")
+                    os.rename(ticket_path, run_path)
+                    return ticket_fd, run_path
+            finally:
+                fcntl.flock(queue_fd, fcntl.LOCK_UN)
+            if not announced:
+                print(f"Waiting for one of the {limit} slot(s) of '{command}'...", file=sys.stderr)
+                announced = True
+            time.sleep(COORDINATION_POLL_INTERVAL)
+    except BaseException:
+        if ticket_fd is not None:
+            try:
+                os.remove(ticket_path)
+            except FileNotFoundError:
+                pass
+            os.close(ticket_fd)
+        raise
+    finally:
+        os.close(queue_fd)
+
+def releaseSlot(slot: tuple[int, str]) -> None:
+    """free a slot claimed with acquireSlot
+    
+    Keyword arguments:
+    - slot -- the slot returned by acquireSlot
+    """
+    
+    ticket_fd, run_path = slot
+    try:
+        os.remove(run_path)
+    except FileNotFoundError:
+        pass
+    os.close(ticket_fd)
+
+class FlightLog:
+    """the output of a shared run, appended to its flight file as (stream, length, bytes) records for attached processes to replay, then closed with an exit code record"""
+    
+    def __init__(self, flight_fd: int):
+        import threading
+        
+        self.flight_fd = flight_fd
+        self.lock = threading.Lock()
+        self.targets = (FlightStream(self, b"o", sys.stdout.buffer), FlightStream(self, b"e", sys.stderr.buffer))
+    
+    def record(self, kind: bytes, data: bytes) -> None:
+        with self.lock:
+            os.write(self.flight_fd, kind + len(data).to_bytes(4, "little") + bytes(data))
+    
+    def finish(self, returncode: int) -> None:
+        with self.lock:
+            os.write(self.flight_fd, b"x" + returncode.to_bytes(4, "little", signed=True))
+
+class FlightStream:
+    """one output stream of a shared run, relayed to mango's own stream and recorded in the flight log"""
+    
+    def __init__(self, log: FlightLog, kind: bytes, target):
+        self.log = log
+        self.kind = kind
+        self.target = target
+    
+    def write(self, data: bytes) -> None:
+        self.target.write(data)
+        self.log.record(self.kind, data)
+    
+    def flush(self) -> None:
+        self.target.flush()
+
+def followFlight(flight_fd: int, command: str) -> int | None:
+    """relay the output of a shared run started by another process, as it is produced, until the run ends
+    
+    Keyword arguments:
+    - flight_fd -- a descriptor of the flight file, which the process running the command holds locked
+    - command -- the command being run
+    
+    Return: the exit code of the run, None if the process running it died before recording one
+    """
+    
+    import fcntl
+    
+    print(f"Attaching to a run of '{command}' with the same arguments that is already going", file=sys.stderr)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    targets = {b"o": sys.stdout.buffer, b"e": sys.stderr.buffer}
+    pending = b""
+    offset = 0
+    while True:
+        chunk = os.pread(flight_fd, 65536, offset)
+        if chunk:
+            offset += len(chunk)
+            pending += chunk
+            while len(pending) >= 5:
+                if pending[:1] == b"x":
+                    return int.from_bytes(pending[1:5], "little", signed=True)
+                size = int.from_bytes(pending[1:5], "little")
+                if len(pending) < 5 + size:
+                    break
+                targets[pending[:1]].write(pending[5:5 + size])
+                targets[pending[:1]].flush()
+                pending = pending[5 + size:]
+            continue
+        try:
+            fcntl.flock(flight_fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            time.sleep(COORDINATION_POLL_INTERVAL)
+            continue
+        fcntl.flock(flight_fd, fcntl.LOCK_UN)
+        # the run may have ended between the read and the lock
+        if os.pread(flight_fd, 1, offset):
+            continue
+        print(f"The run of '{command}' ended without an exit code, running it again", file=sys.stderr)
+        return None
+
+def mangoRunCoordinated(repo_path: str, command: str, task: dict, run) -> int:
+    """run a task that declares a concurrency limit or shares its runs, coordinating with every other mango process on the host through lock files in .mango/.locks
+    
+    With a limit, at most that many runs of the command go at once, and the others queue in arrival order (see acquireSlot). With share, an invocation that finds a run of the same script with the same arguments going attaches to it instead of starting another: it relays that run's output as it is produced and returns its exit code. The process running it records its output in a flight file, which is removed when the run ends, so only concurrent invocations are deduplicated.
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - command -- the command the task runs
+    - task -- a node of the graph built by mangoTaskGraph
+    - run -- a function running the task, relaying its output to a (stdout, stderr) tuple of binary streams, or to mango's own if given None, and returning its exit code
+    
+    Return: the exit code of the run
+    """
+    
+    import fcntl
+    import hashlib
+    
+    locks_path = locksPath(repo_path)
+    
+    def runLimited(targets: tuple | None) -> int:
+        if task["limit"] is None:
+            return run(targets)
+        slot = acquireSlot(locks_path, command, task["limit"])
+        try:
+            return run(targets)
+        finally:
+            releaseSlot(slot)
+    
+    if not task["share"]:
+        return runLimited(None)
+    
+    os.makedirs(locks_path, exist_ok=True)
+    identity = hashlib.sha256("\0".join([task["script"]] + task["args"]).encode()).hexdigest()[:16]
+    flight_path = os.path.join(locks_path, f"{command.replace(os.sep, '%')}.{identity}.flight")
+    while True:
+        flight_fd = os.open(flight_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            fcntl.flock(flight_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            returncode = followFlight(flight_fd, command)
+            os.close(flight_fd)
+            if returncode is not None:
+                return returncode
+            continue
+        flight_stat = os.fstat(flight_fd)
+        try:
+            path_stat = os.stat(flight_path)
+        except FileNotFoundError:
+            path_stat = None
+        if path_stat is not None and (path_stat.st_dev, path_stat.st_ino) == (flight_stat.st_dev, flight_stat.st_ino):
+            if flight_stat.st_size == 0:
+                break
+            # the log of a run whose process died
+            os.remove(flight_path)
+        # otherwise the run ended and removed the file while this process was opening it
+        os.close(flight_fd)
+    
+    log = FlightLog(flight_fd)
+    try:
+        returncode = runLimited(log.targets)
+        log.finish(returncode)
+    finally:
+        # attached processes keep reading the log they opened, and later invocations start a new run
+        os.remove(flight_path)
+        os.close(flight_fd)
+    return returncode
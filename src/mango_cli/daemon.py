@@ -0,0 +1,93 @@
+"""
+mango daemon
+> the resolution daemon (mango --daemon), whose client is mangoDaemonRequest
+"""
+
+import os
+import sys
+
+from . import DAEMON_TIMEOUT, daemonPeerUid, mangoEnviron, mangoResolve, mangoTasks, plainArguments, receiveMessage, sendMessage
+
+def mangoDaemonHandle(request: dict) -> dict:
+    """answer a single resolution request sent to the daemon
+    
+    Only plain commands are resolved. Anything other than a successful resolution is answered with a fallback, so that the client reproduces the exact in-process behavior (options, error messages, task graphs).
+    
+    Keyword arguments:
+    - request -- the decoded request, with argv, cwd and env
+    
+    Return: the reply, either {"fallback": True} or the script, args, use_source flag and env to execute with
+    """
+    
+    argv = request["argv"]
+    if not argv or argv[0].startswith("-"):
+        return {"fallback": True}
+    args = plainArguments(argv)
+    try:
+        script, enforce_source, repo_path = mangoResolve(args.command, request["cwd"])
+    except (FileNotFoundError, SyntaxError):
+        return {"fallback": True}
+    if script is None or (not args.command.startswith("@") and args.command in mangoTasks(repo_path)):
+        return {"fallback": True}
+    return {
+        "script": script,
+        "args": args.args,
+        "use_source": args.source or enforce_source,
+        "env": mangoEnviron(script, repo_path, request["cwd"], request["env"])
+    }
+
+def mangoDaemon(socket_path: str) -> None:
+    """serve resolution requests over a unix socket until interrupted
+    
+    Bindings are kept in memory between requests and re-validated against the mtime and size of their .instructions files, so stale bindings are never served.
+    The socket is created in a folder only the user can access, and connections from other users are closed unanswered.
+    
+    Keyword arguments:
+    - socket_path -- the path to bind the unix socket to
+    
+    Raises PermissionError if the folder of the socket can be accessed by other users
+    """
+    
+    import socket
+    import stat
+    
+    # the folder keeps other users from replacing the socket between two requests
+    socket_folder = os.path.dirname(os.path.abspath(socket_path))
+    try:
+        os.mkdir(socket_folder, 0o700)
+    except FileExistsError:
+        pass
+    folder_stat = os.lstat(socket_folder)
+    if not stat.S_ISDIR(folder_stat.st_mode) or folder_stat.st_uid != os.getuid() or folder_stat.st_mode & 0o077:
+        raise PermissionError(f"{socket_folder} must be a folder only you can access")
+    if os.path.lexists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(64)
+    print(f"Mango daemon listening on {socket_path}", file=sys.stderr)
+    try:
+        while True:
+            connection, _ = server.accept()
+            # a request is answered in well under a millisecond, so requests are served one at a time rather than paying for a thread each
+            with connection:
+                connection.settimeout(DAEMON_TIMEOUT)
+                if daemonPeerUid(connection) != os.getuid():
+                    continue
+                try:
+                    reply = mangoDaemonHandle(receiveMessage(connection))
+                except Exception:
+                    reply = {"fallback": True}
+                try:
+                    sendMessage(connection, reply)
+                except OSError:
+                    pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(socket_path)
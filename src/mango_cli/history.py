@@ -0,0 +1,147 @@
+"""
+mango history
+> the run history recorded with MANGO_HISTORY and summarized by mango --stats
+"""
+
+import os
+import sys
+import time
+
+from . import calledProcessReturnCode, mangoExecute
+
+def historyConnect(path: str):
+    """open the run history database, creating it if needed
+    
+    Keyword arguments:
+    - path -- the path to the database
+    
+    Return: the sqlite3 connection
+    """
+    
+    import sqlite3
+    
+    # concurrent mango processes append to the same database, so wait for each other instead of failing
+    connection = sqlite3.connect(path, timeout=10)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS runs ("
+        "binding TEXT NOT NULL, script TEXT NOT NULL, repo TEXT NOT NULL, args_hash TEXT NOT NULL, "
+        "started REAL NOT NULL, duration REAL NOT NULL, exit_code INTEGER NOT NULL, peak_rss INTEGER NOT NULL)"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS runs_binding ON runs (repo, binding)")
+    return connection
+
+def recordRuns(history_path: str, runs: list[tuple[str, str, str, list[str], float, float, int, int]]) -> None:
+    """append finished runs to the history database, warning instead of failing if it cannot be written
+    
+    Keyword arguments:
+    - history_path -- the path to the history database
+    - runs -- a list of (command typed in by the user, script path, repository path, args, start time, duration in seconds, exit code, peak RSS in bytes) tuples
+    """
+    
+    import hashlib
+    import sqlite3
+    
+    rows = [
+        (command, os.path.abspath(script_path), repo_path, hashlib.sha256("\0".join(args).encode()).hexdigest()[:16], started, duration, exit_code, peak_rss)
+        for command, script_path, repo_path, args, started, duration, exit_code, peak_rss in runs
+    ]
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+        with historyConnect(history_path) as connection:
+            connection.executemany("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        connection.close()
+    except (OSError, sqlite3.Error) as e:
+        # a broken history never breaks the command itself
+        print(f"Could not record the run in {history_path}: {e}", file=sys.stderr)
+
+class RecordedRun:
+    """a run of a command supervised by mango, recorded in the history database when the with block ends, however it ends"""
+    
+    def __init__(self, history_path: str, command: str, script_path: str, repo_path: str, args: list[str]):
+        self.history_path = history_path
+        self.command = command
+        self.script_path = script_path
+        self.repo_path = repo_path
+        self.args = args
+    
+    def __enter__(self):
+        self.started = time.time()
+        self.start_ns = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        duration = (time.perf_counter_ns() - self.start_ns) / 1e9
+        if exc is None:
+            exit_code = 0
+        elif isinstance(exc, SystemExit):
+            exit_code = exc.code if isinstance(exc.code, int) else 0 if exc.code is None else 1
+        elif isinstance(exc, KeyboardInterrupt):
+            exit_code = 130
+        else:
+            exit_code = calledProcessReturnCode(exc)
+            if exit_code is None:
+                exit_code = 1
+            elif exit_code < 0:
+                exit_code = 128 - exit_code
+        import resource
+        # the run's processes are the only children this process waited for, ru_maxrss is in KiB
+        peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+        recordRuns(self.history_path, [(self.command, self.script_path, self.repo_path, self.args, self.started, duration, exit_code, peak_rss)])
+        return False
+
+def mangoExecuteRecorded(history_path: str, command: str, script_path: str, args: list[str], use_source: bool, env: dict[str, str]) -> None:
+    """execute a script as a supervised child, then record the run in the history database
+    
+    Keyword arguments:
+    - history_path -- the path to the history database
+    - command -- the command typed in by the user
+    - script_path, args, use_source, env -- see mangoExecute
+    """
+    
+    with RecordedRun(history_path, command, script_path, env.get("MANGO_REPO_PATH", ""), args):
+        mangoExecute(script_path, args, use_source=use_source, env=env)
+
+def mangoStats(history_path: str, command: str | None = None) -> list[dict]:
+    """summarize the recorded runs of every binding
+    
+    Keyword arguments:
+    - history_path -- the path to the history database
+    - command -- only summarize this binding, all bindings if None
+    
+    Return: one dict per (repo, binding) with the keys repo, binding, runs, failures, p50, p95, max (durations in seconds) and peak_rss (bytes), sorted by repo and binding
+    """
+    
+    import math
+    
+    if not os.path.exists(history_path):
+        return []
+    connection = historyConnect(history_path)
+    try:
+        query = "SELECT repo, binding, duration, exit_code, peak_rss FROM runs"
+        rows = connection.execute(query + (" WHERE binding = ?" if command is not None else ""), (command,) if command is not None else ()).fetchall()
+    finally:
+        connection.close()
+    
+    grouped = {}
+    for repo, binding, duration, exit_code, peak_rss in rows:
+        grouped.setdefault((repo, binding), []).append((duration, exit_code, peak_rss))
+    
+    def percentile(durations: list[float], fraction: float) -> float:
+        # nearest-rank percentile of sorted durations
+        return durations[max(0, math.ceil(len(durations) * fraction) - 1)]
+    
+    summary = []
+    for (repo, binding), runs in sorted(grouped.items()):
+        durations = sorted(duration for duration, _, _ in runs)
+        summary.append({
+            "repo": repo,
+            "binding": binding,
+            "runs": len(runs),
+            "failures": sum(1 for _, exit_code, _ in runs if exit_code != 0),
+            "p50": percentile(durations, 0.5),
+            "p95": percentile(durations, 0.95),
+            "max": durations[-1],
+            "peak_rss": max(peak_rss for _, _, peak_rss in runs),
+        })
+    return summary
@@ -0,0 +1,237 @@
+"""
+mango jobs
+> parallel jobs (mango -j) and fan-outs across repositories (mango --each)
+"""
+
+import os
+import sys
+import time
+
+from . import existMangoRepo, mangoEnviron, mangoFindFromRepo, traced
+
+def splitJobCommands(tokens: list[str]) -> list[tuple[str, list[str]]]:
+    """split the command line of a parallel run into (command, args) pairs
+    
+    Format: either `cmd1 cmd2 cmd3` (no arguments), or `cmd1 args :: cmd2 args :: cmd3` when commands take arguments
+    
+    Keyword arguments:
+    - tokens -- the positional tokens following the mango options
+    
+    Return: a list of (command, args) tuples, in the order given
+    """
+    
+    if "::" not in tokens:
+        return [(token, []) for token in tokens]
+    jobs = []
+    segment = []
+    for token in tokens + ["::"]:
+        if token != "::":
+            segment.append(token)
+            continue
+        if not segment:
+            raise ValueError("empty command between '::' separators")
+        jobs.append((segment[0], segment[1:]))
+        segment = []
+    return jobs
+
+@traced
+def mangoRunJobs(jobs: list[tuple[str, str, list[str], dict[str, str], str | None]], max_workers: int, fail_fast: bool = False, grouped: bool = False, results: list | None = None) -> int:
+    """run resolved scripts concurrently on a bounded worker pool
+    
+    Keyword arguments:
+    - jobs -- a list of (label, script path, args, env, working directory or None) tuples
+    - max_workers -- the maximum number of scripts running at once
+    - fail_fast -- whether to stop all jobs as soon as one fails, instead of letting the others finish
+    - grouped -- whether to print each job's output in one block when it finishes, instead of prefixing every line with the job label as it arrives
+    - results -- if given, filled with a (exit code or None if skipped, seconds, start time, peak RSS in bytes) tuple per job, in job order, and left to the caller to report with reportJobs
+    
+    Return: the aggregate exit code, which is the exit code of the first job to fail, 0 if all succeed
+    """
+    
+    import signal
+    import subprocess
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    
+    output_lock = threading.Lock()
+    stopping = threading.Event()
+    running = set()
+    failures = []
+    
+    def stop(process: subprocess.Popen, signum: int) -> None:
+        # jobs start their own session, which makes them the leader of their own process group, so that grandchildren holding the output pipes are stopped too
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
+    
+    def relay(label: str, stream, target, buffer: list | None) -> None:
+        for raw_line in iter(stream.readline, b""):
+            line = raw_line.decode(errors="replace")
+            if not line.endswith("\n"):
+                line += "\n"
+            if buffer is not None:
+                buffer.append((target, line))
+                continue
+            with output_lock:
+                target.write(f"[{label}] {line}")
+                target.flush()
+    
+    def runJob(job: tuple[str, str, list[str], dict[str, str], str | None]) -> tuple[int | None, float, float, int]:
+        label, script, job_args, env, cwd = job
+        if stopping.is_set():
+            return None, 0.0, 0.0, 0
+        started = time.time()
+        start_ns = time.perf_counter_ns()
+        peak_rss = 0
+        try:
+            process = subprocess.Popen(
+                [script] + job_args, env=env, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+            )
+        except OSError as e:
+            with output_lock:
+                print(f"[{label}] {e}", file=sys.stderr)
+            returncode = 126
+        else:
+            running.add(process)
+            if stopping.is_set():
+                # another job failed while this one was starting
+                stop(process, signal.SIGTERM)
+            buffer = [] if grouped else None
+            stderr_relay = threading.Thread(target=relay, args=(label, process.stderr, sys.stderr, buffer))
+            stderr_relay.start()
+            relay(label, process.stdout, sys.stdout, buffer)
+            stderr_relay.join()
+            # wait4 reports the resources of this job alone, while RUSAGE_CHILDREN would mix all jobs, ru_maxrss is in KiB
+            _, status, usage = os.wait4(process.pid, 0)
+            returncode = process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss = usage.ru_maxrss * 1024
+            running.discard(process)
+            if returncode < 0:
+                # killed by a signal, report it the way shells do
+                returncode = 128 - returncode
+            if buffer:
+                with output_lock:
+                    print(f"==> {label} <==", flush=True)
+                    for target, line in buffer:
+                        target.write(line)
+                        target.flush()
+        if returncode != 0:
+            with output_lock:
+                failures.append(returncode)
+            if fail_fast and not stopping.is_set():
+                stopping.set()
+                for other in list(running):
+                    stop(other, signal.SIGTERM)
+        return returncode, (time.perf_counter_ns() - start_ns) / 1e9, started, peak_rss
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            job_results = list(executor.map(runJob, jobs))
+        except KeyboardInterrupt:
+            # jobs are not in the terminal's foreground process group, so forward the interrupt
+            stopping.set()
+            for process in list(running):
+                stop(process, signal.SIGINT)
+            raise
+    
+    if results is not None:
+        results.extend(job_results)
+    else:
+        reportJobs(jobs, job_results)
+    return failures[0] if failures else 0
+
+def reportJobs(jobs: list[tuple[str, str, list[str], dict[str, str], str | None]], results: list[tuple[int | None, float, float, int]]) -> None:
+    """print which jobs run by mangoRunJobs were skipped or failed
+    
+    Keyword arguments:
+    - jobs -- the jobs given to mangoRunJobs
+    - results -- the results it filled in
+    """
+    
+    for (label, _, _, _, _), (returncode, _, _, _) in zip(jobs, results):
+        if returncode is None:
+            print(f"Job '{label}' skipped", file=sys.stderr)
+        elif returncode != 0:
+            print(f"Job '{label}' failed with exit code {returncode}", file=sys.stderr)
+
+def eachRepos(spec: str) -> list[str]:
+    """find the mango repositories a command is fanned out to
+    
+    Keyword arguments:
+    - spec -- either a glob of directories, or a file listing one directory per line (blank lines and lines starting with # are ignored, relative paths are relative to the file)
+    
+    Return: the absolute paths of the matching directories that are mango repositories, sorted and without duplicates
+    """
+    
+    import glob
+    
+    spec = os.path.expanduser(spec)
+    if os.path.isfile(spec):
+        base_path = os.path.dirname(os.path.abspath(spec))
+        with open(spec, "r") as list_file:
+            candidates = [
+                os.path.join(base_path, os.path.expanduser(line.strip()))
+                for line in list_file if line.strip() and not line.strip().startswith("#")
+            ]
+    else:
+        candidates = glob.glob(spec)
+    return sorted({os.path.abspath(path) for path in candidates if os.path.isdir(path) and existMangoRepo(path)})
+
+def mangoEach(spec: str, command: str, command_args: list[str], max_workers: int, fail_fast: bool = False, grouped: bool = False, history_path: str | None = None) -> int:
+    """run a command in every mango repository matched by a spec, and print a summary table
+    
+    The command is resolved in each repository on its own (without searching parent directories), and runs with the repository as its working directory.
+    
+    Keyword arguments:
+    - spec -- a glob of directories or a list file, see eachRepos
+    - command -- the command to run, which must not be a host command
+    - command_args -- the arguments to pass to the command
+    - max_workers, fail_fast, grouped -- see mangoRunJobs
+    - history_path -- if given, the history database to record the run in every repository in
+    
+    Return: the exit code of the first run to fail, 1 if no repository could run the command, 0 otherwise
+    """
+    
+    repos = eachRepos(spec)
+    statuses = {}
+    jobs = []
+    for repo_path in repos:
+        try:
+            script, use_source = mangoFindFromRepo(repo_path, command)
+        except (FileNotFoundError, SyntaxError):
+            statuses[repo_path] = "invalid .instructions"
+            continue
+        if script is None:
+            statuses[repo_path] = "not bound"
+        elif use_source:
+            statuses[repo_path] = "sourced, not run"
+        else:
+            label = os.path.relpath(repo_path)
+            jobs.append((label, script, command_args, mangoEnviron(script, repo_path, repo_path, os.environ), repo_path))
+    if not jobs:
+        print(f"No mango repository matching '{spec}' binds '{command}'.", file=sys.stderr)
+        return 1
+    
+    results = []
+    exit_code = mangoRunJobs(jobs, max_workers, fail_fast=fail_fast, grouped=grouped, results=results)
+    if history_path is not None:
+        from .history import recordRuns
+        recordRuns(history_path, [
+            (command, script, repo_path, command_args, started, seconds, returncode, peak_rss)
+            for (_, script, _, _, repo_path), (returncode, seconds, started, peak_rss) in zip(jobs, results) if returncode is not None
+        ])
+    durations = {}
+    for job, (returncode, seconds, _, _) in zip(jobs, results):
+        repo_path = job[4]
+        if returncode is None:
+            statuses[repo_path] = "skipped"
+        else:
+            statuses[repo_path] = "ok" if returncode == 0 else f"failed ({returncode})"
+            durations[repo_path] = f"{seconds:.2f}s"
+    
+    rows = [("REPO", "STATUS", "DURATION")] + [(os.path.relpath(repo_path), statuses[repo_path], durations.get(repo_path, "-")) for repo_path in repos]
+    widths = [max(len(row[column]) for row in rows) for column in range(2)]
+    for row in rows:
+        print(f"{row[0].ljust(widths[0])}  {row[1].ljust(widths[1])}  {row[2]}", file=sys.stderr)
+    return exit_code
@@ -0,0 +1,132 @@
+"""
+mango picker
+> the interactive fuzzy finder of mango --pick
+"""
+
+from . import visibleCommands
+
+def fuzzyScore(query: str, candidate: str) -> int | None:
+    """score how well a command matches what was typed in the fuzzy finder
+    
+    Every character of the query must appear in order; consecutive characters, characters starting a word, and shorter commands score higher.
+    
+    Keyword arguments:
+    - query -- the lowercase query
+    - candidate -- the lowercase command
+    
+    Return: the score, None if the command does not match
+    """
+    
+    score = 0
+    streak = 0
+    position = -1
+    for character in query:
+        found = candidate.find(character, position + 1)
+        if found < 0:
+            return None
+        if found == position + 1:
+            streak += 1
+            score += 4 * streak
+        else:
+            streak = 0
+            score -= min(found - position - 1, 4)
+        if found == 0 or candidate[found - 1] in ":-_.@/ ":
+            score += 6
+        position = found
+    return score - len(candidate) // 4
+
+def fuzzyFilter(query: str, candidates: list[str], limit: int | None = None) -> list[str]:
+    """rank the commands matching a fuzzy finder query
+    
+    Keyword arguments:
+    - query -- the text typed in
+    - candidates -- the commands to search
+    - limit -- the maximum number of results, all of them if None
+    
+    Return: the matching commands, best first
+    """
+    
+    query = query.lower()
+    if not query:
+        return candidates[:limit] if limit is not None else list(candidates)
+    scored = []
+    for candidate in candidates:
+        score = fuzzyScore(query, candidate.lower())
+        if score is not None:
+            scored.append((-score, len(candidate), candidate))
+    scored.sort()
+    return [candidate for _, _, candidate in scored[:limit]]
+
+def mangoPick(user_path: str, query: str = "") -> str | None:
+    """let the user pick a command with an interactive fuzzy finder drawn on the terminal
+    
+    The commands are listed once from the binding index. Every keystroke filters the matches of the longest query typed so far that the new one extends, and queries seen before (after a backspace) are not filtered again.
+    Fuzzy matches need not share any trigram with the query, so the n-gram postings cannot shortlist them.
+    
+    Keyword arguments:
+    - user_path -- the directory mango was invoked from
+    - query -- the text to start with
+    
+    Return: the picked command, None if the user cancelled
+    """
+    
+    import termios
+    import tty
+    
+    candidates = visibleCommands(user_path)
+    shown = 10
+    with open("/dev/tty", "r+b", buffering=0) as terminal:
+        saved = termios.tcgetattr(terminal)
+        # raw mode, so that ctrl-c arrives as a key instead of a signal
+        tty.setraw(terminal)
+        
+        def write(text: str) -> None:
+            terminal.write(text.encode())
+        
+        seen = {"": candidates}
+        selected = 0
+        drawn = 0
+        try:
+            while True:
+                matches = seen.get(query)
+                if matches is None:
+                    # a longer query can only match a subset of what the shorter one matched
+                    pool = seen[max((seen_query for seen_query in seen if query.startswith(seen_query)), key=len)]
+                    matches = seen[query] = fuzzyFilter(query, pool)
+                selected = min(selected, max(0, min(len(matches), shown) - 1))
+                
+                # redraw the prompt and the best matches below it
+                write("\r\x1b[J" if drawn == 0 else f"\x1b[{drawn}A\r\x1b[J")
+                lines = [f"{'>' if i == selected else ' '} {match}" for i, match in enumerate(matches[:shown])]
+                for i, line in enumerate(lines):
+                    write(("\x1b[7m" + line + "\x1b[0m" if i == selected else line) + "\r\n")
+                drawn = len(lines)
+                write(f"{len(matches)}/{len(candidates)} > {query}")
+                
+                key = terminal.read(1)
+                if key in (b"\r", b"\n"):
+                    return matches[selected] if matches else None
+                if key in (b"\x03", b"\x04", b"\x07"):
+                    return None
+                if key == b"\x1b":
+                    sequence = terminal.read(2)
+                    if sequence == b"[A":
+                        selected = max(0, selected - 1)
+                    elif sequence == b"[B":
+                        selected += 1
+                    else:
+                        return None
+                elif key == b"\x10":
+                    selected = max(0, selected - 1)
+                elif key == b"\x0e":
+                    selected += 1
+                elif key in (b"\x7f", b"\x08"):
+                    query = query[:-1]
+                elif key == b"\x15":
+                    query = ""
+                elif key.isascii() and key.decode().isprintable():
+                    query += key.decode()
+                    selected = 0
+        finally:
+            write(f"\r\x1b[{drawn}A\x1b[J" if drawn else "\r\x1b[J")
+            termios.tcsetattr(terminal, termios.TCSADRAIN, saved)
@@ -0,0 +1,165 @@
+"""
+mango resolve
+> answering resolve queries from editors and tools (mango --resolve)
+"""
+
+import os
+
+from . import closestMangoRepo, loaded_indexes, mangoFindFromRepo, mangoLoadIndex, mapSubmodulePath, parseInstruction, splitCommand
+
+# where the bindings of every folder below a .mango folder are defined, validated against the stamps of its loaded index
+binding_origins = {}
+
+def bindingOrigin(mango_path: str, command: str) -> tuple[str, int, str] | None:
+    """find the .instructions line that defines a command of a mango folder
+    
+    Lines are walked in the order mangoScanFind resolves them: an exported binding is defined where its submodule binds it, and a rebound one on the rebind line.
+    Parsed folders are kept in binding_origins for as long as the binding index of mango_path is up to date.
+    
+    Keyword arguments:
+    - mango_path -- the path to the .mango folder
+    - command -- the command to locate, unprefixed or as a virtual path
+    
+    Return: a tuple of (instructions path, line number, virtual path of the binding), None if no line defines the command
+    """
+    
+    # prefixed lookups never load the index, but its stamps cover every folder below mango_path
+    mangoLoadIndex(mango_path, listings=False)
+    stamps = loaded_indexes.get(mango_path, (None, None))[1]
+    cached_stamps, tables = binding_origins.get(mango_path, (None, {}))
+    if stamps is None or cached_stamps is not stamps:
+        tables = {}
+        if stamps is not None:
+            binding_origins[mango_path] = stamps, tables
+    
+    def originTable(folder: str, virtual_prefix: str) -> dict[str, tuple[str, int, str]]:
+        folder = os.path.normpath(folder)
+        if folder in tables:
+            return tables[folder]
+        table = {}
+        instructions_path = os.path.join(folder, ".instructions")
+        with open(instructions_path, "r") as instructions_file:
+            lines = list(instructions_file)
+        for line_number, line in enumerate(lines, start=1):
+            try:
+                instruction = parseInstruction(line)
+            except SyntaxError:
+                # a lookup that reached this line would have failed before asking where it is defined
+                continue
+            if instruction is None or instruction[0] == "task":
+                continue
+            if instruction[0] == "bind":
+                for binding in instruction[2]:
+                    table.setdefault(binding, (instructions_path, line_number, virtual_prefix + binding))
+                continue
+            try:
+                submodule_folder = mapSubmodulePath(instruction[1], base_path=folder, absolute=True)
+            except FileNotFoundError:
+                continue
+            submodule_table = originTable(submodule_folder, f"{virtual_prefix}{instruction[1]}:")
+            if instruction[0] == "export":
+                for binding, origin in submodule_table.items():
+                    table.setdefault(binding, origin)
+            elif instruction[2] in submodule_table:
+                for binding in instruction[3]:
+                    table.setdefault(binding, (instructions_path, line_number, virtual_prefix + binding))
+        tables[folder] = table
+        return table
+    
+    submodule_path, binding = splitCommand(command)
+    try:
+        folder = mapSubmodulePath(submodule_path, base_path=mango_path, absolute=True)
+    except FileNotFoundError:
+        return None
+    return originTable(folder, f"{submodule_path}:" if submodule_path else "").get(binding)
+
+def mangoResolveQuery(query: dict, user_path: str) -> dict:
+    """resolve a single query of mango --resolve, and find where its binding is defined
+    
+    Keyword arguments:
+    - query -- the decoded query, with the command, and optionally the cwd to resolve from, whether it is a host command and an id echoed in the reply
+    - user_path -- the directory a query without a cwd is resolved from
+    
+    Return: the reply, with the physical path of the script, the virtual path of the binding within the repository that defines it, the use_source flag and the defining .instructions file and line, all None if the command is not found
+    
+    Raises ValueError if the query has no command or a field of the wrong type, FileNotFoundError("mango repository not found") if there is no mango repository above cwd, and SyntaxError("invalid .instructions file") if the lookup reaches a broken line
+    """
+    
+    command = query.get("command")
+    if not isinstance(command, str) or not command.lstrip("@"):
+        raise ValueError("query has no command")
+    if not isinstance(query.get("cwd") or "", str):
+        raise ValueError("query cwd must be a string")
+    if not isinstance(query.get("host") or False, bool):
+        raise ValueError("query host must be true or false")
+    # ids are echoed back, so they are limited to what JSON-RPC allows
+    if type(query.get("id")) not in (str, int, float, type(None)):
+        raise ValueError("query id must be a string or a number")
+    cwd = os.path.abspath(os.path.join(user_path, query.get("cwd") or "."))
+    host = bool(query.get("host")) or command.startswith("@")
+    binding = command.removeprefix("@")
+    
+    # same walk as mangoRecursiveFindFromRepo, but remembering which repository answered
+    repo_path = closestMangoRepo(cwd)
+    script, use_source = None, False
+    while repo_path != "/":
+        script, use_source = mangoFindFromRepo(repo_path, binding)
+        if script is not None or not host:
+            break
+        repo_path = os.path.dirname(repo_path)
+    origin = bindingOrigin(os.path.join(repo_path, ".mango"), binding) if script is not None else None
+    reply = {} if "id" not in query else {"id": query["id"]}
+    reply.update({
+        "command": command,
+        "cwd": cwd,
+        "host": host,
+        "found": script is not None,
+        "path": os.path.abspath(script) if script is not None else None,
+        "virtual": origin[2] if origin is not None else None,
+        "use_source": use_source,
+        "instructions": origin[0] if origin is not None else None,
+        "line": origin[1] if origin is not None else None,
+        "repo": repo_path if script is not None else None
+    })
+    return reply
+
+def mangoResolveStream(queries, replies, json_lines: bool) -> None:
+    """answer resolution queries read line by line, until the input ends
+    
+    Every reply is flushed as soon as it is written, so tools can keep a single mango process around and ask it one query at a time; bindings and parsed .instructions files are reused across queries.
+    
+    Keyword arguments:
+    - queries -- the stream to read queries from
+    - replies -- the stream to write replies to
+    - json_lines -- read a JSON object per line and answer with one, instead of reading a command per line and answering with the path of its script (or an empty line)
+    """
+    
+    if json_lines:
+        import json
+    user_path = os.getcwd()
+    for line in queries:
+        if not line.strip():
+            continue
+        if not json_lines:
+            try:
+                reply = mangoResolveQuery({"command": line.strip()}, user_path)
+            except (ValueError, FileNotFoundError, SyntaxError):
+                reply = {"path": None}
+            replies.write((reply["path"] or "") + "\n")
+            replies.flush()
+            continue
+        try:
+            query = json.loads(line)
+            if not isinstance(query, dict):
+                raise ValueError("query is not an object")
+        except ValueError as e:
+            reply = {"error": f"invalid query: {e}"}
+        else:
+            try:
+                reply = mangoResolveQuery(query, user_path)
+            except (ValueError, OSError, SyntaxError) as e:
+                reply = {"error": str(e)}
+            if "error" in reply and "id" in query:
+                reply = {"id": query["id"], **reply}
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
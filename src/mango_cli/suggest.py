@@ -0,0 +1,71 @@
+"""
+mango suggest
+> suggestions for mistyped commands
+"""
+
+import os
+
+from . import closestMangoRepo, commandTrigrams, mangoEnumerate, mangoLoadIndex, ngramIndex, traced
+
+def editDistance(a: str, b: str) -> int:
+    """count the insertions, deletions, substitutions and transpositions turning one string into another
+    
+    Keyword arguments:
+    - a, b -- the strings to compare
+    
+    Return: the optimal string alignment distance
+    """
+    
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+@traced
+def mangoSuggest(command: str, user_path: str, limit: int = 3) -> list[str]:
+    """find the visible commands closest to one that could not be resolved
+    
+    Commands sharing trigrams with the typo are shortlisted through the n-gram postings stored in the binding index, then ranked by edit distance to the whole command or to its last virtual path segment.
+    
+    Keyword arguments:
+    - command -- the command typed in by the user, host commands start with @
+    - user_path -- the directory mango was invoked from
+    - limit -- the maximum number of suggestions
+    
+    Return: the suggestions, best first
+    """
+    
+    try:
+        repo_path = closestMangoRepo(user_path)
+    except FileNotFoundError:
+        return []
+    if command.startswith("@"):
+        candidates = sorted(mangoEnumerate(repo_path, host=True))
+        postings = ngramIndex(candidates)
+    else:
+        index = mangoLoadIndex(os.path.join(repo_path, ".mango"), postings=True)
+        candidates, postings = (index["commands"], index["postings"]) if index is not None else ([], {})
+    shared = {}
+    for gram in commandTrigrams(command):
+        for position in postings.get(gram, ()):
+            shared[position] = shared.get(position, 0) + 1
+    # ties are broken by position, so that suggestions do not depend on the order trigrams are hashed in
+    shortlist = sorted(shared, key=lambda position: (-shared[position], position))[:64]
+    
+    query = command.lower()
+    threshold = max(1, len(query.lstrip("@")) // 3)
+    ranked = []
+    for position in shortlist:
+        candidate = candidates[position].lower()
+        # `link` should find `tools:lib:link`, and `@link` should find `@tools:lib:link`
+        last_segment = ("@" if query.startswith("@") else "") + candidate.rsplit(":", 1)[-1]
+        distance = min(editDistance(query, candidate), editDistance(query, last_segment))
+        if distance <= threshold or query.lstrip("@") in candidate:
+            ranked.append((distance, len(candidate), candidates[position]))
+    return [candidate for _, _, candidate in sorted(ranked)[:limit]]
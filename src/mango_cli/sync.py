@@ -0,0 +1,99 @@
+"""
+mango sync
+> updating submodule checkouts (mango --sync)
+"""
+
+import os
+import time
+
+from . import INDEX_FILE_NAME, loaded_indexes, mangoLoadIndex, mapSubmodulePath, traced
+
+def childSubmodules(mango_path: str, virtual_path: str = "") -> list[str]:
+    """list the virtual paths of the submodules directly inside a mango folder
+    
+    Keyword arguments:
+    - mango_path -- the path to the .mango folder of the repository
+    - virtual_path -- the virtual path of the submodule whose children are listed, "" for the repository itself
+    
+    Return: the virtual paths of the children, sorted
+    """
+    
+    submodules_path = os.path.join(mapSubmodulePath(virtual_path, base_path=mango_path, absolute=True), ".submodules")
+    if not os.path.isdir(submodules_path):
+        return []
+    return [
+        f"{virtual_path}:{name}" if virtual_path else name
+        for name in sorted(os.listdir(submodules_path))
+        if os.path.isdir(os.path.join(submodules_path, name, ".mango"))
+    ]
+
+def syncSubmodule(checkout_path: str) -> tuple[str, str]:
+    """fetch a submodule checkout and fast-forward it to its upstream
+    
+    Keyword arguments:
+    - checkout_path -- the path to the submodule, which contains its .mango folder
+    
+    Return: a tuple of (status, detail), where status is "updated", "up to date", "skipped" or "failed"
+    """
+    
+    import subprocess
+    
+    if not os.path.exists(os.path.join(checkout_path, ".git")):
+        return "skipped", "not a git repository"
+    # several pulls run at once, so none of them may stop to ask for credentials
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    
+    def git(*git_args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(["git", "-C", checkout_path, *git_args], env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    
+    before = git("rev-parse", "HEAD").stdout.strip()
+    pull = git("pull", "--ff-only", "--quiet")
+    if pull.returncode != 0:
+        message = (pull.stderr.strip() or pull.stdout.strip() or f"git pull exited with code {pull.returncode}").splitlines()
+        return "failed", message[-1]
+    after = git("rev-parse", "HEAD").stdout.strip()
+    if before == after:
+        return "up to date", after[:12]
+    return "updated", f"{before[:12]}..{after[:12]}"
+
+@traced
+def mangoSync(repo_path: str, max_workers: int) -> list[tuple[str, str, float, str]]:
+    """update every nested submodule of a repository from its git upstream, then rebuild the binding index
+    
+    Submodules are pulled concurrently; the submodules nested in one are only looked for once it has been pulled, so that new ones are picked up.
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - max_workers -- the maximum number of submodules pulled at once
+    
+    Return: a list of (virtual path, status, seconds, detail) tuples sorted by virtual path, see syncSubmodule
+    """
+    
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    
+    mango_path = os.path.join(repo_path, ".mango")
+    
+    def sync(virtual_path: str) -> tuple[str, str, float, str]:
+        start_ns = time.perf_counter_ns()
+        checkout_path = os.path.dirname(mapSubmodulePath(virtual_path, base_path=mango_path, absolute=True))
+        status, detail = syncSubmodule(checkout_path)
+        return virtual_path, status, (time.perf_counter_ns() - start_ns) / 1e9, detail
+    
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(sync, virtual_path) for virtual_path in childSubmodules(mango_path)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                pending |= {executor.submit(sync, child) for child in childSubmodules(mango_path, result[0])}
+    
+    # submodules changed underneath any compiled bindings, so compile them again right away
+    loaded_indexes.pop(mango_path, None)
+    try:
+        os.remove(os.path.join(mango_path, INDEX_FILE_NAME))
+    except OSError:
+        pass
+    mangoLoadIndex(mango_path)
+    return sorted(results)
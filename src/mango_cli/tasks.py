@@ -0,0 +1,438 @@
+"""
+mango tasks
+> task graphs, cached results and environment snapshots of sourced commands
+"""
+
+import marshal
+import os
+import sys
+
+from . import execReplace, homeMangoPath, mangoFindFromRepo, reportCommandNotFound, traced
+
+RESULT_CACHE_FORMAT_VERSION = 2
+RESULT_CACHE_DEFAULT_SIZE = 128 * 1024 * 1024
+# variables bash maintains itself, which are never part of what a sourced script sets up
+SNAPSHOT_IGNORED = ("_", "SHLVL", "PWD", "OLDPWD")
+# sources the script in a bash started with the caller's environment, then dumps the functions and aliases it defined and the environment it left behind
+# the dump runs from an EXIT trap, so that it also happens when the script itself calls exit
+SNAPSHOT_SCRIPT = '''\
+__mango_script=$1 __mango_python=$2 __mango_environ=$3 __mango_definitions=$4
+shift 4
+__mango_dump() {
+    __mango_status=$?
+    trap - EXIT
+    unset -f __mango_dump
+    [ "$__mango_status" -eq 0 ] || exit "$__mango_status"
+    { declare -f; alias -p; } > "$__mango_definitions"
+    exec "$__mango_python" -c 'import marshal, os, sys; marshal.dump(dict(os.environ), open(sys.argv[1], "wb"))' "$__mango_environ"
+}
+trap __mango_dump EXIT
+source "$__mango_script" "$@"
+'''
+
+@traced
+def mangoTaskGraph(repo_path: str, target: str, tasks: dict[str, dict[str, list[str]]]) -> dict[str, dict]:
+    """resolve a command and everything it needs into a dependency graph
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - target -- the command to build the graph for
+    - tasks -- the task declarations of the repository, as returned by mangoTasks
+    
+    Return: a dict mapping each command to {"script", "use_source", "needs", "inputs", "outputs", "cache", "limit", "share"}, in topological order (dependencies first), where "cache" is None for commands that are not cacheable and "limit" None for commands without a concurrency limit
+    """
+    
+    graph = {}
+    visiting = []
+    
+    def visit(command: str) -> None:
+        if command in graph:
+            return
+        if command in visiting:
+            cycle = visiting[visiting.index(command):] + [command]
+            raise ValueError("dependency cycle: " + " -> ".join(cycle))
+        script, use_source = mangoFindFromRepo(repo_path, command)
+        if script is None:
+            reportCommandNotFound(command, repo_path)
+            raise FileNotFoundError("command not found")
+        task = tasks.get(command, {})
+        visiting.append(command)
+        for dependency in task.get("needs", []):
+            visit(dependency)
+        visiting.pop()
+        graph[command] = {
+            "script": script,
+            "use_source": use_source,
+            "needs": task.get("needs", []),
+            "inputs": task.get("inputs", []),
+            "outputs": task.get("outputs", []),
+            "cache": task.get("cache"),
+            "limit": int(task["limit"][-1]) if "limit" in task else None,
+            "share": "share" in task,
+        }
+    
+    visit(target)
+    return graph
+
+def taskUpToDate(repo_path: str, task: dict) -> bool:
+    """check whether every output of a task is newer than its inputs and its script
+    
+    Globs are relative to the repository and support `**`. A task without outputs is never up to date.
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - task -- a node of the graph built by mangoTaskGraph
+    
+    Return: bool for whether the task can be skipped
+    """
+    
+    import glob
+    
+    if not task["outputs"]:
+        return False
+    oldest_output = None
+    for pattern in task["outputs"]:
+        matches = glob.glob(os.path.join(repo_path, pattern), recursive=True)
+        if not matches:
+            return False
+        for match in matches:
+            mtime = os.stat(match).st_mtime_ns
+            oldest_output = mtime if oldest_output is None else min(oldest_output, mtime)
+    newest_input = os.stat(task["script"]).st_mtime_ns
+    for pattern in task["inputs"]:
+        for match in glob.glob(os.path.join(repo_path, pattern), recursive=True):
+            newest_input = max(newest_input, os.stat(match).st_mtime_ns)
+    return oldest_output >= newest_input
+
+def resultCachePath() -> str | None:
+    """find the folder storing recorded results of cacheable commands
+    
+    The folder is .results in the home mango, and can be overridden with MANGO_RESULT_CACHE. Without either, nothing is recorded rather than creating ~/.mango.
+    
+    Return: the path to the result cache folder, None if there is no home mango and MANGO_RESULT_CACHE is not set
+    """
+    
+    if "MANGO_RESULT_CACHE" in os.environ:
+        return os.environ["MANGO_RESULT_CACHE"]
+    home_mango_path = homeMangoPath()
+    return os.path.join(home_mango_path, ".results") if home_mango_path is not None else None
+
+def resultCacheKey(repo_path: str, task: dict) -> str:
+    """hash everything the result of a cacheable task is assumed to depend on
+    
+    That is the repository and the path and contents of its script, its arguments, the environment variables listed in its cache declaration, and the paths and contents of the files matched by its input globs.
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - task -- a node of the graph built by mangoTaskGraph, with its "args" and "env"
+    
+    Return: the hex digest identifying the result
+    """
+    
+    import glob
+    import hashlib
+    
+    digest = hashlib.sha256()
+    
+    def feed(*parts: bytes) -> None:
+        for part in parts:
+            # length-prefix every part so that different splits never collide
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+    
+    def feedFile(path: str) -> None:
+        with open(path, "rb") as file:
+            feed(file.read())
+    
+    feed(RESULT_CACHE_FORMAT_VERSION.to_bytes(1, "little"))
+    # identical scripts in two repositories (or bound twice in one) see different files and environments
+    feed(os.path.abspath(repo_path).encode(), os.path.abspath(task["script"]).encode())
+    feedFile(task["script"])
+    feed(*[arg.encode() for arg in task["args"]], b"")
+    for name in sorted(task["cache"]):
+        feed(name.encode(), task["env"][name].encode() if name in task["env"] else b"\0unset")
+    inputs = sorted({match for pattern in task["inputs"] for match in glob.glob(os.path.join(repo_path, pattern), recursive=True) if os.path.isfile(match)})
+    for input_path in inputs:
+        feed(os.path.relpath(input_path, repo_path).encode())
+        feedFile(input_path)
+    return digest.hexdigest()
+
+def runCaptured(argv: list[str], env: dict[str, str], targets: tuple | None = None) -> tuple[int, bytes, bytes]:
+    """run a process, streaming its output to ours while recording it
+    
+    Keyword arguments:
+    - argv -- the argument vector to run
+    - env -- the environment to run with
+    - targets -- the binary streams to relay stdout and stderr to, mango's own by default
+    
+    Return: a tuple of (exit code, recorded stdout, recorded stderr)
+    """
+    
+    import subprocess
+    import threading
+    
+    process = subprocess.Popen(argv, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    recorded = {}
+    
+    def relay(name: str, stream, target) -> None:
+        chunks = []
+        for chunk in iter(lambda: stream.read1(65536), b""):
+            chunks.append(chunk)
+            target.write(chunk)
+            target.flush()
+        recorded[name] = b"".join(chunks)
+    
+    sys.stdout.flush()
+    sys.stderr.flush()
+    stdout_target, stderr_target = targets or (sys.stdout.buffer, sys.stderr.buffer)
+    stderr_relay = threading.Thread(target=relay, args=("stderr", process.stderr, stderr_target))
+    stderr_relay.start()
+    relay("stdout", process.stdout, stdout_target)
+    stderr_relay.join()
+    return process.wait(), recorded["stdout"], recorded["stderr"]
+
+def evictResults(cache_path: str, max_size: int) -> None:
+    """remove the least recently used results and environment snapshots until the cache fits in max_size bytes
+    
+    Keyword arguments:
+    - cache_path -- the path to the result cache folder
+    - max_size -- the size budget of the cache, in bytes
+    """
+    
+    entries = []
+    for entry in os.scandir(cache_path):
+        if entry.name.endswith((".result", ".environ")):
+            try:
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat_result.st_mtime_ns, stat_result.st_size, entry.path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
+
+def mangoRunCached(repo_path: str, task: dict, targets: tuple | None = None) -> int:
+    """run a cacheable task, replaying its recorded output when its script, args, selected env and inputs are unchanged
+    
+    Only successful runs are recorded, so that transient failures are retried. Hits refresh the entry's mtime, which drives LRU eviction.
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - task -- a node of the graph built by mangoTaskGraph, with its "args" and "env", and "refresh" set to run it again even if a result is recorded
+    - targets -- the binary streams to write stdout and stderr to, mango's own by default
+    
+    Return: the exit code of the task
+    """
+    
+    cache_path = resultCachePath()
+    if cache_path is None:
+        print(f"The result of '{os.path.basename(task['script'])}' is not cached: caching needs a home mango (~/.mango/.instructions) or MANGO_RESULT_CACHE set to a folder.", file=sys.stderr)
+        return runCaptured([task["script"]] + task["args"], task["env"], targets)[0]
+    entry_path = os.path.join(cache_path, resultCacheKey(repo_path, task) + ".result")
+    try:
+        if task.get("refresh"):
+            raise FileNotFoundError(entry_path)
+        with open(entry_path, "rb") as entry_file:
+            version, returncode, stdout, stderr = marshal.load(entry_file)
+        if version == RESULT_CACHE_FORMAT_VERSION:
+            os.utime(entry_path)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            stdout_target, stderr_target = targets or (sys.stdout.buffer, sys.stderr.buffer)
+            stdout_target.write(stdout)
+            stdout_target.flush()
+            stderr_target.write(stderr)
+            stderr_target.flush()
+            return returncode
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    
+    returncode, stdout, stderr = runCaptured([task["script"]] + task["args"], task["env"], targets)
+    if returncode == 0:
+        temp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_path, exist_ok=True)
+            with open(temp_path, "wb") as temp_file:
+                marshal.dump((RESULT_CACHE_FORMAT_VERSION, returncode, stdout, stderr), temp_file)
+            os.replace(temp_path, entry_path)
+            evictResults(cache_path, int(os.environ.get("MANGO_RESULT_CACHE_SIZE", RESULT_CACHE_DEFAULT_SIZE)))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+    return returncode
+
+def mangoSourceSnapshot(repo_path: str, task: dict, refresh: bool = False, stdout=None) -> tuple[dict[str, str] | None, str, int]:
+    """source a script once in a non-interactive bash, and replay the environment it left behind on later calls
+    
+    The bash reads no profile or rc files, but starts with the caller's full environment (task["env"]), which the script may build on.
+    Snapshots are keyed like cached results (see resultCacheKey), so editing the script, or any file matched by its input globs, takes a new one. They record the changed variables along with the values they had before sourcing, and a caller whose values differ sources the script again. Only successful runs are recorded, and the script's output is not replayed.
+    A script that calls exit 0 is snapshotted as it was when it exited; one that replaces the EXIT trap the environment is dumped from fails with a message.
+    
+    Keyword arguments:
+    - repo_path -- the path to the mango repository
+    - task -- the "script", "args", "env", "cache" and "inputs" of the sourced command
+    - refresh -- whether to source the script again even if a snapshot is recorded, replacing it
+    - stdout -- where the output of the script goes while it is sourced, mango's own stdout by default
+    
+    Return: a tuple of (the environment after sourcing, None if the script failed; the shell code defining the functions and aliases it left behind; the exit code of the script)
+    """
+    
+    cache_path = resultCachePath()
+    if cache_path is None:
+        print(f"The environment of '{os.path.basename(task['script'])}' is not cached: caching needs a home mango (~/.mango/.instructions) or MANGO_RESULT_CACHE set to a folder.", file=sys.stderr)
+        entry_path = None
+    else:
+        entry_path = os.path.join(cache_path, resultCacheKey(repo_path, task) + ".environ")
+    delta = None
+    if not refresh and entry_path is not None:
+        try:
+            with open(entry_path, "rb") as entry_file:
+                version, before, delta, definitions = marshal.load(entry_file)
+            # the recorded values are only right for callers that start from the same ones
+            if version != RESULT_CACHE_FORMAT_VERSION or any(task["env"].get(name) != value for name, value in before.items()):
+                delta = None
+            else:
+                os.utime(entry_path)
+        except (OSError, EOFError, ValueError, TypeError):
+            delta = None
+    
+    if delta is None:
+        import subprocess
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as dump_path:
+            environ_path = os.path.join(dump_path, "environ")
+            definitions_path = os.path.join(dump_path, "definitions")
+            argv = ["/bin/bash", "--noprofile", "--norc", "-c", SNAPSHOT_SCRIPT, "mango", task["script"], sys.executable, environ_path, definitions_path] + task["args"]
+            sys.stdout.flush()
+            returncode = subprocess.run(argv, env=task["env"], stdout=stdout).returncode
+            if returncode != 0:
+                return None, "", 128 - returncode if returncode < 0 else returncode
+            try:
+                with open(environ_path, "rb") as environ_file:
+                    environ = marshal.load(environ_file)
+                with open(definitions_path, "r") as definitions_file:
+                    definitions = definitions_file.read()
+            except (OSError, EOFError, ValueError, TypeError):
+                # the script replaced the EXIT trap, or exec'd another program
+                print(f"'{task['script']}' exited without leaving an environment to snapshot. Does it set its own EXIT trap or exec another program?", file=sys.stderr)
+                return None, "", 1
+        # None marks a variable the script unset
+        delta = {name: value for name, value in environ.items() if task["env"].get(name) != value}
+        delta.update({name: None for name in task["env"] if name not in environ})
+        for name in SNAPSHOT_IGNORED:
+            delta.pop(name, None)
+        before = {name: task["env"].get(name) for name in delta}
+        if entry_path is not None:
+            temp_path = f"{entry_path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(cache_path, exist_ok=True)
+                with open(temp_path, "wb") as temp_file:
+                    marshal.dump((RESULT_CACHE_FORMAT_VERSION, before, delta, definitions), temp_file)
+                os.replace(temp_path, entry_path)
+                evictResults(cache_path, int(os.environ.get("MANGO_RESULT_CACHE_SIZE", RESULT_CACHE_DEFAULT_SIZE)))
+            except OSError:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+    
+    env = dict(task["env"])
+    for name, value in delta.items():
+        if value is None:
+            env.pop(name, None)
+        else:
+            env[name] = value
+    return env, definitions, 0
+
+def mangoEnterShell(env: dict[str, str], replace_process: bool = False) -> None:
+    """start the shell a sourced script hands over to, the same way mangoExecute does after sourcing it
+    
+    Keyword arguments:
+    - env -- the environment left behind by the script
+    - replace_process -- whether to exec the shell in place of the current process instead of supervising it, in which case this function does not return
+    """
+    
+    if replace_process:
+        execReplace("/bin/bash", ["/bin/sh", "-c", "exec $SHELL"], env)
+    import subprocess
+    subprocess.run("exec $SHELL", shell=True, executable="/bin/bash", env=env, check=True)
+
+@traced
+def mangoRunTaskGraph(graph: dict[str, dict], repo_path: str, max_workers: int) -> int:
+    """run a dependency graph, running independent tasks concurrently and skipping tasks that are up to date
+    
+    A task runs if any of its dependencies ran, or if it is not up to date. Cacheable tasks without outputs go through mangoRunCached, and tasks declaring a limit or sharing their runs through mangoRunCoordinated. After a failure no new task is started, and running ones are waited for.
+    
+    Keyword arguments:
+    - graph -- the graph built by mangoTaskGraph, where every node also carries the "args" and "env" to run with
+    - repo_path -- the path to the mango repository
+    - max_workers -- the maximum number of tasks running at once
+    
+    Return: the exit code of the first task to fail, 0 if all succeed
+    """
+    
+    import subprocess
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    
+    def runTask(command: str, task: dict) -> int:
+        def run(targets: tuple | None) -> int:
+            if task["cache"] is not None and not task["outputs"]:
+                return mangoRunCached(repo_path, task, targets)
+            if targets is not None:
+                return runCaptured([task["script"]] + task["args"], task["env"], targets)[0]
+            return subprocess.run([task["script"]] + task["args"], env=task["env"]).returncode
+        
+        try:
+            if task["limit"] is not None or task["share"]:
+                from .coordination import mangoRunCoordinated
+                returncode = mangoRunCoordinated(repo_path, command, task, run)
+            else:
+                returncode = run(None)
+        except OSError as e:
+            print(e, file=sys.stderr)
+            return 126
+        return 128 - returncode if returncode < 0 else returncode
+    
+    pending = list(graph)
+    done = set()
+    ran = set()
+    running = {}
+    failure = None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            # skipping a task can make others ready, so schedule until nothing changes
+            scheduled = failure is None
+            while scheduled:
+                scheduled = False
+                for command in [command for command in pending if all(dependency in done for dependency in graph[command]["needs"])]:
+                    pending.remove(command)
+                    scheduled = True
+                    task = graph[command]
+                    if not any(dependency in ran for dependency in task["needs"]) and taskUpToDate(repo_path, task):
+                        print(f"'{command}' is up to date", file=sys.stderr)
+                        done.add(command)
+                    else:
+                        running[executor.submit(runTask, command, task)] = command
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                command = running.pop(future)
+                returncode = future.result()
+                if returncode != 0:
+                    print(f"Task '{command}' failed with exit code {returncode}", file=sys.stderr)
+                    if failure is None:
+                        failure = returncode
+                else:
+                    done.add(command)
+                    ran.add(command)
+    return failure or 0
@@ -0,0 +1,308 @@
+"""
+mango watch
+> re-running a command when files change (mango --watch)
+"""
+
+import os
+import sys
+import time
+
+from . import fileStamp, mangoEnviron, mangoResolve, reportCommandNotFound
+
+# paths mango writes to itself, which must never trigger a watched command
+WATCH_IGNORED = (".git", ".git/**", "**/.bindings.index", "**/.bindings.index.*.tmp", ".mango/.indexes/**", ".mango/.results/**", ".mango/.locks/**")
+WATCH_POLL_INTERVAL = 0.5
+# seconds a stopped run gets to exit before its process group is killed
+WATCH_STOP_TIMEOUT = 3.0
+
+def watchGlobMatch(path: str, pattern: str) -> bool:
+    """check whether a path relative to the watched repository matches a watch glob
+    
+    `*` and `?` do not cross directory boundaries and `**` matches any number of directories. Patterns without a slash match the file name in any directory.
+    
+    Keyword arguments:
+    - path -- the relative path, with forward slashes
+    - pattern -- the glob
+    
+    Return: whether the path matches
+    """
+    
+    import re
+    
+    if "/" not in pattern:
+        path = path.rsplit("/", 1)[-1]
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.fullmatch(regex, path) is not None
+
+def watchExcluded(path: str, excludes: list[str]) -> bool:
+    """check whether a relative path, or a directory it lives in, is excluded from watching
+    
+    Keyword arguments:
+    - path -- the relative path, with forward slashes
+    - excludes -- the exclude globs, including WATCH_IGNORED
+    
+    Return: whether the path is excluded
+    """
+    
+    return any(watchGlobMatch(path, pattern) for pattern in excludes)
+
+class InotifyWatcher:
+    """watch a directory tree for changes with inotify
+    
+    Raises OSError if inotify is unavailable, e.g. on other platforms or once the watch limit is reached.
+    """
+    
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+    IN_ISDIR = 0x40000000
+    IN_Q_OVERFLOW = 0x4000
+    
+    def __init__(self, root: str, excludes: list[str]):
+        import ctypes
+        
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on linux")
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.root = root
+        self.excludes = excludes
+        self.directories = {}
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            self.watchTree(root)
+        except OSError:
+            os.close(self.fd)
+            raise
+    
+    def watchTree(self, directory: str) -> None:
+        import ctypes
+        
+        for folder, subfolders, _ in os.walk(directory):
+            relative = os.path.relpath(folder, self.root).replace(os.sep, "/")
+            if relative != "." and watchExcluded(relative, self.excludes):
+                subfolders[:] = []
+                continue
+            descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK)
+            if descriptor < 0:
+                raise OSError(ctypes.get_errno(), f"cannot watch {folder}")
+            self.directories[descriptor] = folder
+    
+    def changes(self, timeout: float | None) -> set[str]:
+        """wait for changes
+        
+        Keyword arguments:
+        - timeout -- the number of seconds to wait for the first change, None to wait forever
+        
+        Return: the absolute paths that changed, empty if the timeout expired
+        """
+        
+        import select
+        import struct
+        
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                # events were lost, so assume everything changed, including the bindings
+                changed.add(os.path.join(self.root, ".mango", ".instructions"))
+                continue
+            if descriptor not in self.directories:
+                continue
+            path = os.path.join(self.directories[descriptor], os.fsdecode(name))
+            changed.add(path)
+            if mask & self.IN_ISDIR and mask & (0x100 | 0x80) and os.path.isdir(path):
+                self.watchTree(path)
+        return changed
+    
+    def close(self) -> None:
+        os.close(self.fd)
+
+class PollWatcher:
+    """watch a directory tree for changes by comparing mtimes and sizes, for platforms without inotify
+    """
+    
+    def __init__(self, root: str, excludes: list[str]):
+        self.root = root
+        self.excludes = excludes
+        self.stamps = self.scan()
+    
+    def scan(self) -> dict[str, tuple[int, int]]:
+        stamps = {}
+        for folder, subfolders, files in os.walk(self.root):
+            relative = os.path.relpath(folder, self.root).replace(os.sep, "/")
+            if relative != "." and watchExcluded(relative, self.excludes):
+                subfolders[:] = []
+                continue
+            for name in files:
+                path = os.path.join(folder, name)
+                stamp = fileStamp(path)
+                if stamp is not None:
+                    stamps[path] = stamp
+        return stamps
+    
+    def changes(self, timeout: float | None) -> set[str]:
+        """wait for changes, see InotifyWatcher.changes
+        """
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(WATCH_POLL_INTERVAL if deadline is None else max(0, min(WATCH_POLL_INTERVAL, deadline - time.monotonic())))
+            stamps = self.scan()
+            changed = {path for path in stamps.keys() | self.stamps.keys() if stamps.get(path) != self.stamps.get(path)}
+            self.stamps = stamps
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+    
+    def close(self) -> None:
+        pass
+
+def mangoWatch(command: str, command_args: list[str], user_path: str, includes: list[str], excludes: list[str], debounce: float, policy: str, poll: bool = False) -> None:
+    """run a command, then run it again whenever a file of its repository changes, until interrupted
+    
+    The command is resolved once, and resolved again only when an .instructions file under .mango changes.
+    Runs start their own session, outside the terminal's foreground process group, so their stdin is /dev/null: a run reading the terminal would be stopped with SIGTTIN.
+    
+    Keyword arguments:
+    - command -- the command typed in by the user
+    - command_args -- the arguments to pass to the command
+    - user_path -- the directory mango was invoked from
+    - includes -- globs of the paths that trigger a run, relative to the repository, all paths if empty
+    - excludes -- globs of the paths that never trigger a run
+    - debounce -- the number of quiet seconds to wait for after a change before running
+    - policy -- "kill" to stop a run that is still going when a change comes in, "queue" to start the next run once it finishes
+    - poll -- whether to poll for changes instead of using inotify
+    """
+    
+    import signal
+    import subprocess
+    
+    def resolve() -> tuple[str | None, str]:
+        script, enforce_source, repo_path = mangoResolve(command, user_path)
+        if script is None:
+            reportCommandNotFound(command, user_path)
+        elif enforce_source:
+            print(f"Command '{command}' sources its script and cannot be watched.", file=sys.stderr)
+            script = None
+        return script, repo_path
+    
+    def start(script: str, repo_path: str) -> subprocess.Popen | None:
+        try:
+            return subprocess.Popen(
+                [script] + command_args, env=mangoEnviron(script, repo_path, user_path, os.environ), stdin=subprocess.DEVNULL, start_new_session=True
+            )
+        except OSError as e:
+            print(f"[watch] {e}", file=sys.stderr)
+            return None
+    
+    def stop(process: subprocess.Popen, signum: int) -> None:
+        # runs lead their own process group, so that everything they started is stopped with them
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
+        try:
+            process.wait(timeout=WATCH_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            # a run that traps or ignores the signal must not keep the watcher from handling further changes
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.wait()
+    
+    def report(process: subprocess.Popen) -> None:
+        returncode = process.returncode
+        if returncode < 0:
+            returncode = 128 - returncode
+        print(f"[watch] '{command}' exited with code {returncode}", file=sys.stderr)
+    
+    script, repo_path = resolve()
+    if script is None:
+        exit(1)
+    excludes = list(WATCH_IGNORED) + excludes
+    watcher = None
+    if not poll:
+        try:
+            watcher = InotifyWatcher(repo_path, excludes)
+        except OSError:
+            pass
+    if watcher is None:
+        watcher = PollWatcher(repo_path, excludes)
+    print(f"[watch] watching {repo_path}", file=sys.stderr)
+    
+    process = start(script, repo_path)
+    queued = False
+    try:
+        while True:
+            changed = watcher.changes(WATCH_POLL_INTERVAL if queued else None)
+            # wait for bursts of events (editors writing a file in several steps) to settle
+            while changed:
+                more = watcher.changes(debounce)
+                if not more:
+                    break
+                changed |= more
+            relevant = set()
+            reresolve = False
+            for path in changed:
+                relative = os.path.relpath(path, repo_path).replace(os.sep, "/")
+                if watchExcluded(relative, excludes):
+                    continue
+                if relative.startswith(".mango/") and relative.endswith("/.instructions"):
+                    # bindings may have moved, whatever the include globs say
+                    reresolve = True
+                elif includes and not any(watchGlobMatch(relative, pattern) for pattern in includes):
+                    continue
+                relevant.add(relative)
+            
+            running = process is not None and process.poll() is None
+            if not relevant:
+                if queued and not running:
+                    if process is not None:
+                        report(process)
+                    queued = False
+                    process = start(script, repo_path) if script is not None else None
+                continue
+            if reresolve:
+                script, _ = resolve()
+            if running:
+                if policy == "queue":
+                    queued = True
+                    continue
+                stop(process, signal.SIGTERM)
+            if process is not None:
+                report(process)
+            queued = False
+            process = start(script, repo_path) if script is not None else None
+    except KeyboardInterrupt:
+        # runs are not in the terminal's foreground process group, so forward the interrupt
+        if process is not None and process.poll() is None:
+            stop(process, signal.SIGINT)
+    finally:
+        watcher.close()
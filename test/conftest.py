@@ -1,38 +1,104 @@
+import os
 import sys
 import builtins
-import importlib.machinery
-import importlib.util
+import importlib
+import subprocess
 from pathlib import Path
 
 import pytest
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-SRC_MANGO_PATH = PROJECT_ROOT / "src" / "mango"
+SRC_PATH = PROJECT_ROOT / "src"
 BUILTINS_PATH = PROJECT_ROOT / "builtins.mango"
+MANGO_SCRIPT = SRC_PATH / "mango"
 
 # Ensure builtins.mango is importable as a module source
 builtins_path_str = str(BUILTINS_PATH)
 if builtins_path_str not in sys.path:
     sys.path.insert(0, builtins_path_str)
 
-
-def _load_module(module_name: str, module_path: Path):
-    """Load a module from an arbitrary file path."""
-    if not module_path.exists():
-        raise FileNotFoundError(f"Cannot import {module_name}; file not found at {module_path}")
-    loader = importlib.machinery.SourceFileLoader(module_name, str(module_path))
-    spec = importlib.util.spec_from_loader(module_name, loader)
-    if spec is None or spec.loader is None:
-        raise ImportError(f"Unable to load spec for module {module_name} from {module_path}")
-    module = importlib.util.module_from_spec(spec)
-    loader.exec_module(module)
-    return module
+# Ensure the mango package is importable
+src_path_str = str(SRC_PATH)
+if src_path_str not in sys.path:
+    sys.path.insert(0, src_path_str)
 
 
 @pytest.fixture(scope="session")
 def mango_module():
     """Provide the mango CLI module for importable access in tests."""
-    return _load_module("mango_main", SRC_MANGO_PATH)
+    return importlib.import_module("mango_cli")
+
+
+@pytest.fixture(scope="session")
+def mango_script():
+    """Provide the path of the mango launcher, for tests running mango as a process."""
+    return MANGO_SCRIPT
+
+
+@pytest.fixture
+def run_mango(mango_script):
+    """Provide a function running mango in a directory and returning the completed process.
+
+    Variables passed as env are set on top of the current environment, and the ones set to None are removed.
+    Other keyword arguments go to subprocess.run, and output is captured as text.
+    """
+    def run(cwd, *argv, env=None, **kwargs):
+        run_env = dict(os.environ)
+        for name, value in (env or {}).items():
+            if value is None:
+                run_env.pop(name, None)
+            else:
+                run_env[name] = str(value)
+        return subprocess.run([sys.executable, str(mango_script), *argv], cwd=cwd, env=run_env, capture_output=True, text=True, **kwargs)
+    return run
+
+
+@pytest.fixture
+def make_script():
+    """Provide a function writing an executable script into a folder."""
+    def make(folder, name, content="#!/bin/bash\necho ok\n"):
+        path = Path(folder) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        path.chmod(0o755)
+        return path
+    return make
+
+
+@pytest.fixture
+def make_mango_repo(make_script):
+    """Provide a function creating a mango repository from its .instructions and scripts.
+
+    Scripts map names to contents, or list the names of scripts echoing ok.
+    A submodule is created the same way, with .mango/.submodules/<name> as its path.
+    The function returns the .mango folder of the repository.
+    """
+    def make(path, instructions="", scripts=()):
+        mango_dir = Path(path) / ".mango"
+        mango_dir.mkdir(parents=True, exist_ok=True)
+        (mango_dir / ".instructions").write_text(instructions)
+        for name in scripts:
+            if isinstance(scripts, dict):
+                make_script(mango_dir, name, scripts[name])
+            else:
+                make_script(mango_dir, name)
+        return mango_dir
+    return make
+
+
+@pytest.fixture
+def mango_repo(tmp_path, make_mango_repo):
+    """Create a temporary mango repository with test scripts.
+
+    - repo binds hello, exports the tools submodule and rebinds its build as b
+    - the tools submodule binds build
+    - a nested repository in repo/project binds run and hello
+    """
+    repo = tmp_path / "repo"
+    tools_dir = make_mango_repo(repo / ".mango" / ".submodules" / "tools", "build.sh: build\n", {"build.sh": "#!/bin/sh\necho built\n"})
+    mango_dir = make_mango_repo(repo, "hello.sh: hello\n[tools] *\n[tools] build: b\n", {"hello.sh": "#!/bin/sh\necho \"hello $*\"\n"})
+    nested_dir = make_mango_repo(repo / "project", "run.sh: run hello\n", {"run.sh": "#!/bin/sh\necho \"run $*\"\n"})
+    return repo, mango_dir, tools_dir, nested_dir
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -0,0 +1,32 @@
+"""Tests that the benchmark tree generators build trees mango resolves as intended."""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+BENCH_PATH = Path(__file__).resolve().parents[1] / "bench" / "mango_bench.py"
+
+
+@pytest.fixture(scope="module")
+def bench_module():
+    spec = importlib.util.spec_from_file_location("mango_bench", BENCH_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestBenchGenerators:
+    """Tests for the synthetic trees of the benchmark scenarios."""
+
+    @pytest.mark.parametrize("scenario", ["many_bindings", "deep_nesting", "wide_fan_out", "rebind_chain", "host_stack"])
+    def test_generated_command_resolves_to_target(self, tmp_path, bench_module, mango_module, scenario):
+        generator, _, quick_params = bench_module.SCENARIOS[scenario]
+        repo, user_path, command, script = generator(tmp_path, **quick_params)
+
+        if command.startswith("@"):
+            found, _ = mango_module.mangoRecursiveFindFromRepo(mango_module.closestMangoRepo(str(user_path)), command[1:])
+        else:
+            found, _ = mango_module.mangoFindFromRepo(str(repo), command)
+
+        assert Path(found) == script
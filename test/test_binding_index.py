@@ -0,0 +1,134 @@
+"""Tests for the compiled binding index used by mangoFind."""
+
+import os
+from pathlib import Path
+
+
+class TestBindingIndex:
+    """Tests for writing, reusing and invalidating the binding index."""
+
+    def test_index_is_written_and_reused(self, mango_repo, mango_module):
+        _, mango_dir, tools_dir, _ = mango_repo
+
+        result_path, use_source = mango_module.mangoFind(str(mango_dir), "b")
+        assert Path(result_path) == tools_dir / "build.sh"
+        assert use_source is False
+        assert (mango_dir / ".bindings.index").exists()
+
+        # the warm lookup must not touch the parser
+        bindings = mango_module.mangoLoadIndex(str(mango_dir))["bindings"]
+        assert Path(bindings["build"][0]) == tools_dir / "build.sh"
+        assert Path(bindings["hello"][0]) == mango_dir / "hello.sh"
+
+    def test_index_matches_scan_for_every_binding(self, mango_repo, mango_module):
+        _, mango_dir, _, _ = mango_repo
+
+        for command in ["hello", "build", "b", "missing"]:
+            assert mango_module.mangoFind(str(mango_dir), command) == mango_module.mangoScanFind(str(mango_dir), command)
+
+    def test_index_invalidated_by_submodule_change(self, mango_repo, mango_module):
+        _, mango_dir, tools_dir, _ = mango_repo
+        assert mango_module.mangoFind(str(mango_dir), "tool_new") == (None, False)
+
+        instructions = tools_dir / ".instructions"
+        instructions.write_text("build.sh: build tool_new\n")
+        stat = instructions.stat()
+        os.utime(instructions, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        result_path, _ = mango_module.mangoFind(str(mango_dir), "tool_new")
+        assert Path(result_path) == tools_dir / "build.sh"
+
+    def test_index_invalidated_by_installed_submodule(self, mango_repo, mango_module):
+        _, mango_dir, _, _ = mango_repo
+        (mango_dir / ".instructions").write_text("[extra] *\n")
+        assert mango_module.mangoFind(str(mango_dir), "extra_cmd") == (None, False)
+
+        extra_dir = mango_dir / ".submodules" / "extra" / ".mango"
+        extra_dir.mkdir(parents=True)
+        (extra_dir / ".instructions").write_text("extra.sh: extra_cmd\n")
+
+        result_path, _ = mango_module.mangoFind(str(mango_dir), "extra_cmd")
+        assert Path(result_path) == extra_dir / "extra.sh"
+
+    def test_broken_tree_falls_back_to_lazy_scan(self, mango_repo, mango_module):
+        _, mango_dir, _, _ = mango_repo
+        # the error sits after the match, so the lazy scan still resolves the command
+        (mango_dir / ".instructions").write_text("hello.sh: hello\n[broken\n")
+
+        result_path, _ = mango_module.mangoFind(str(mango_dir), "hello")
+        assert Path(result_path) == mango_dir / "hello.sh"
+        assert not (mango_dir / ".bindings.index").exists()
+
+    def _pretend_read_only(self, mango_dir, monkeypatch):
+        # mode bits do not stop root, so pretend the folder is read-only
+        access = os.access
+        monkeypatch.setattr(os, "access", lambda path, mode: False if str(path) == str(mango_dir) and mode == os.W_OK else access(path, mode))
+
+    def test_read_only_folders_keep_their_index_per_user(self, tmp_path, mango_repo, mango_module, make_mango_repo, monkeypatch):
+        _, mango_dir, tools_dir, _ = mango_repo
+        home = tmp_path / "home"
+        make_mango_repo(home)
+        monkeypatch.setenv("HOME", str(home))
+        self._pretend_read_only(mango_dir, monkeypatch)
+        mango_module.loaded_indexes.clear()
+
+        result_path, _ = mango_module.mangoFind(str(mango_dir), "b")
+        assert Path(result_path) == tools_dir / "build.sh"
+        cached = list((home / ".mango" / ".indexes").iterdir())
+        assert [path.name.endswith(".bindings.index") for path in cached] == [True]
+
+        # later processes read the saved index instead of compiling the tree again
+        mango_module.loaded_indexes.clear()
+        monkeypatch.setattr(mango_module, "mangoCompileIndex", None)
+        assert mango_module.mangoLoadIndex(str(mango_dir))["commands"] == ["b", "build", "hello", "tools:build"]
+
+    def test_read_only_folders_without_a_home_mango_keep_their_index_in_memory(self, tmp_path, mango_repo, mango_module, monkeypatch):
+        _, mango_dir, tools_dir, _ = mango_repo
+        home = tmp_path / "home"
+        home.mkdir()
+        monkeypatch.setenv("HOME", str(home))
+        self._pretend_read_only(mango_dir, monkeypatch)
+        mango_module.loaded_indexes.clear()
+
+        result_path, _ = mango_module.mangoFind(str(mango_dir), "b")
+        assert Path(result_path) == tools_dir / "build.sh"
+        # a ~/.mango without .instructions would make the home folder a broken mango repository
+        assert not (home / ".mango").exists()
+        assert mango_module.mangoFind(str(mango_dir), "hello")[0] == str(mango_dir / "hello.sh")
+
+    def test_lookups_skip_listing_sections(self, mango_repo, mango_module):
+        _, mango_dir, tools_dir, _ = mango_repo
+        mango_module.mangoLoadIndex(str(mango_dir))
+        mango_module.loaded_indexes.clear()
+
+        # cut the file after the bindings and tasks: lookups must not notice, listings must rebuild it
+        index_path = mango_dir / ".bindings.index"
+        with open(index_path, "rb") as index_file:
+            prefix = index_file.read(mango_module.INDEX_PREFIX_SIZE)
+        lookup_size = mango_module.INDEX_PREFIX_SIZE + int.from_bytes(prefix[4:8], "little") + int.from_bytes(prefix[8:12], "little")
+        os.truncate(index_path, lookup_size)
+
+        result_path, _ = mango_module.mangoFind(str(mango_dir), "b")
+        assert Path(result_path) == tools_dir / "build.sh"
+        assert "commands" not in mango_module.loaded_indexes[str(mango_dir)][0]
+        assert index_path.stat().st_size == lookup_size
+
+        mango_module.loaded_indexes.clear()
+        assert mango_module.mangoLoadIndex(str(mango_dir))["commands"] == ["b", "build", "hello", "tools:build"]
+        assert index_path.stat().st_size > lookup_size
+
+    def test_nested_calls_find_a_repository_created_below_the_parents(self, mango_repo, mango_module, monkeypatch):
+        _, mango_dir, _, _ = mango_repo
+        repo_path, user_path = str(mango_dir.parent), mango_dir.parent / "proj"
+        script, _, _ = mango_module.mangoResolve("hello", repo_path)
+        # what a shell left behind by a sourced script still exports
+        for name, value in mango_module.mangoEnviron(script, repo_path, str(user_path), {}).items():
+            monkeypatch.setenv(name, value)
+
+        (user_path / ".mango").mkdir(parents=True)
+        (user_path / ".mango" / ".instructions").write_text("proj.sh: hello\n")
+        (user_path / ".mango" / "proj.sh").write_text("#!/bin/sh\n")
+
+        result_path, _, resolved_repo = mango_module.mangoResolve("hello", str(user_path))
+        assert Path(result_path) == user_path / ".mango" / "proj.sh"
+        assert resolved_repo == str(user_path)
@@ -0,0 +1,64 @@
+"""Tests for whole-tree validation with mango --check."""
+
+import pytest
+
+from mango_cli import check
+
+
+class TestCheck:
+    """Tests for the diagnostics of mango --check."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        """Create a repo with one problem of every kind."""
+        repo = tmp_path / "repo"
+        make_mango_repo(repo / ".mango" / ".submodules" / "tools", "build.sh: build\nlint.sh: lint build\n", ["build.sh", "lint.sh"])
+        mango_dir = make_mango_repo(repo, (
+            "hello.sh: greet\n"
+            "missing.sh: gone\n"
+            "[tools] *\n"
+            "[nothere] *\n"
+            "[tools] absent: renamed\n"
+            "hello.sh: build\n"
+            "plain.sh: plain\n"
+            "oops\n"
+            "(deploy) needs: build\n"
+        ), ["hello.sh"])
+        (mango_dir / "plain.sh").write_text("echo plain\n")
+        return repo
+
+    def test_check_reports_every_problem(self, repo):
+        root = str(repo / ".mango" / ".instructions")
+        tools = str(repo / ".mango" / ".submodules" / "tools" / ".mango" / ".instructions")
+
+        diagnostics = check.mangoCheck(str(repo), 4)
+
+        found = {(path, line, severity) for path, line, severity, _ in diagnostics}
+        assert found == {
+            (root, 2, "error"),  # dangling script
+            (root, 4, "error"),  # missing submodule
+            (root, 5, "error"),  # rebind of a missing binding
+            (root, 6, "warning"),  # shadowed by the export on line 3
+            (root, 7, "warning"),  # not executable
+            (root, 8, "error"),  # syntax error
+            (root, 9, "error"),  # task for an unknown command
+            (tools, 2, "warning"),  # duplicate within the submodule
+        }
+        messages = {line: message for path, line, _, message in diagnostics if path == root}
+        assert "missing.sh" in messages[2]
+        assert "nothere" in messages[4]
+        assert f"{tools}:1" in messages[6]
+
+    def test_check_clean_tree(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, "hello.sh: greet\n", ["hello.sh"])
+
+        assert check.mangoCheck(str(repo), 2) == []
+
+    def test_check_entrypoint_exit_code(self, tmp_path, repo, run_mango):
+        result = run_mango(repo, "--check", "-j", "2", env={"HOME": tmp_path})
+
+        assert result.returncode == 1
+        assert ".instructions:2: error: script 'missing.sh' does not exist" in result.stdout
+        assert "5 error(s), 3 warning(s)" in result.stderr
+        assert not (repo / ".mango" / ".bindings.index").exists()
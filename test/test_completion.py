@@ -0,0 +1,60 @@
+"""Tests for binding enumeration and shell completion."""
+
+from pathlib import Path
+
+import pytest
+
+
+class TestCompletion:
+    """Tests for enumerating and completing the commands of a tree."""
+
+    @pytest.fixture
+    def tree(self, tmp_path, make_mango_repo):
+        """Create an outer repo with a nested repo inside it."""
+        outer = tmp_path / "outer"
+        tools = make_mango_repo(outer / ".mango" / ".submodules" / "tools", "build.sh: build\n[lib] *\n")
+        make_mango_repo(tools / ".submodules" / "lib", "lib.sh: link\n")
+        make_mango_repo(outer, "hello.sh: greet\n[tools] *\n")
+        inner = outer / "project"
+        make_mango_repo(inner, "run.sh: run greet\n")
+        return outer, inner
+
+    def test_enumerate_normal_commands(self, tree, mango_module):
+        outer, _ = tree
+
+        commands = mango_module.mangoEnumerate(str(outer))
+
+        assert sorted(commands) == ["build", "greet", "link", "tools:build", "tools:lib:link"]
+        assert Path(commands["tools:lib:link"][0]) == outer / ".mango" / ".submodules" / "tools" / ".mango" / ".submodules" / "lib" / ".mango" / "lib.sh"
+
+    def test_enumerate_host_commands_with_shadowing(self, tree, mango_module):
+        _, inner = tree
+
+        commands = mango_module.mangoEnumerate(str(inner), host=True)
+
+        assert {"@run", "@greet", "@build", "@tools:lib:link"} <= set(commands)
+        assert Path(commands["@greet"][0]) == inner / ".mango" / "run.sh"
+
+    def test_enumerated_commands_resolve_to_the_same_script(self, tree, mango_module):
+        outer, _ = tree
+
+        for command, target in mango_module.mangoEnumerate(str(outer)).items():
+            assert mango_module.mangoFindFromRepo(str(outer), command) == target
+
+    def test_complete_prefix(self, tmp_path, tree, mango_module):
+        outer, inner = tree
+
+        assert mango_module.mangoComplete("tools:", str(outer)) == ["tools:build", "tools:lib:link"]
+        assert mango_module.mangoComplete("@gr", str(inner)) == ["@greet"]
+        assert mango_module.mangoComplete("zzz", str(outer)) == []
+        assert mango_module.mangoComplete("", str(tmp_path)) == []
+
+    def test_complete_entrypoint_and_scripts(self, tmp_path, tree, run_mango):
+        outer, _ = tree
+
+        result = run_mango(outer, "--complete", "b")
+        assert result.stdout == "build\n"
+
+        for shell in ["bash", "zsh", "fish"]:
+            result = run_mango(tmp_path, "--completion", shell)
+            assert "mango --complete" in result.stdout
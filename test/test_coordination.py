@@ -0,0 +1,133 @@
+"""Tests for shared runs and concurrency limits of commands declaring share or limit."""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+
+class TestCoordination:
+    """Tests for sharing runs between processes and queueing them under a limit."""
+
+    @pytest.fixture
+    def make_repo(self, tmp_path, make_mango_repo):
+        """Provide a function creating a repo binding warm, with the given task declarations."""
+        def make(declarations):
+            repo = tmp_path / "repo"
+            make_mango_repo(repo, "warm.sh: warm\n" + declarations, {"warm.sh": (
+                "#!/bin/bash\n"
+                "echo \"start $1 $TAG\" >> \"$MANGO_REPO_PATH/runs\"\n"
+                "echo \"warming $1\"\n"
+                "sleep ${DELAY:-0.6}\n"
+                "echo 'warm warning' >&2\n"
+                "echo \"end $1 $TAG\" >> \"$MANGO_REPO_PATH/runs\"\n"
+                "exit 3\n"
+            )})
+            return repo
+        return make
+
+    @pytest.fixture
+    def start(self, mango_script):
+        """Provide a function starting mango in a repo without waiting for it."""
+        def start(repo, *argv, **env):
+            run_env = dict(os.environ)
+            run_env.pop("MANGO_HISTORY", None)
+            run_env.update(env)
+            return subprocess.Popen([sys.executable, str(mango_script), *argv], cwd=repo, env=run_env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return start
+
+    def _wait_for_runs(self, repo, count):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if (repo / "runs").exists() and (repo / "runs").read_text().count("start") >= count:
+                return
+            time.sleep(0.01)
+        raise AssertionError("the command never started")
+
+    def _runs(self, repo):
+        return [line.rstrip() for line in (repo / "runs").read_text().splitlines()]
+
+    def test_concurrent_identical_runs_are_shared(self, make_repo, start):
+        repo = make_repo("(warm) share:\n")
+
+        leader = start(repo, "warm", "x")
+        self._wait_for_runs(repo, 1)
+        followers = [start(repo, "warm", "x") for _ in range(3)]
+        other = start(repo, "warm", "y")
+
+        for process in [leader] + followers:
+            stdout, stderr = process.communicate(timeout=20)
+            assert process.returncode == 3
+            assert stdout == "warming x\n"
+            assert "warm warning" in stderr
+        other.communicate(timeout=20)
+        assert sorted(self._runs(repo)) == ["end x", "end y", "start x", "start y"]
+        assert not list((repo / ".mango" / ".locks").glob("*.flight"))
+
+        # later invocations start a new run
+        again = start(repo, "warm", "x", DELAY="0")
+        again.communicate(timeout=20)
+        assert again.returncode == 3
+        assert self._runs(repo).count("start x") == 2
+
+    def test_followers_report_attaching(self, make_repo, start):
+        repo = make_repo("(warm) share:\n")
+
+        leader = start(repo, "warm")
+        self._wait_for_runs(repo, 1)
+        follower = start(repo, "warm")
+
+        _, follower_stderr = follower.communicate(timeout=20)
+        _, leader_stderr = leader.communicate(timeout=20)
+        assert "Attaching" in follower_stderr
+        assert "Attaching" not in leader_stderr
+        assert follower_stderr.count("warm warning") == 1
+
+    def test_limit_queues_runs_in_arrival_order(self, make_repo, start):
+        repo = make_repo("(warm) limit: 1\n")
+
+        processes = [start(repo, "warm", DELAY="0.3", TAG=str(0))]
+        self._wait_for_runs(repo, 1)
+        for tag in range(1, 4):
+            processes.append(start(repo, "warm", DELAY="0.3", TAG=str(tag)))
+            time.sleep(0.1)
+        for process in processes:
+            process.communicate(timeout=30)
+            assert process.returncode == 3
+
+        # one run at a time, first come first served
+        assert self._runs(repo) == [f"{event}  {tag}" for tag in range(4) for event in ("start", "end")]
+        assert not list((repo / ".mango" / ".locks").glob("warm.*.0*"))
+
+    def test_limit_allows_concurrent_runs(self, make_repo, start):
+        repo = make_repo("(warm) limit: 2\n")
+
+        processes = [start(repo, "warm", TAG=str(tag)) for tag in range(2)]
+        self._wait_for_runs(repo, 2)
+        assert all(line.startswith("start") for line in self._runs(repo))
+        for process in processes:
+            process.communicate(timeout=20)
+
+    def test_stale_tickets_are_dropped(self, make_repo, start):
+        repo = make_repo("(warm) limit: 1\n")
+        locks = repo / ".mango" / ".locks"
+        locks.mkdir()
+        (locks / "warm.queue").write_text("2")
+        (locks / "warm.run.000000000000").write_text("")
+        (locks / "warm.wait.000000000001").write_text("")
+
+        process = start(repo, "warm", DELAY="0")
+        _, stderr = process.communicate(timeout=5)
+
+        assert process.returncode == 3
+        assert "Waiting" not in stderr
+        assert sorted(path.name for path in locks.iterdir()) == ["warm.queue"]
+
+    def test_invalid_declarations(self, mango_module):
+        assert mango_module.parseInstruction("(warm) limit: 2") == ("task", "warm", "limit", ["2"])
+        assert mango_module.parseInstruction("(warm) share:") == ("task", "warm", "share", [])
+        for line in ["(warm) limit: 0", "(warm) limit: two", "(warm) limit: 1 2", "(warm) share: yes"]:
+            with pytest.raises(SyntaxError):
+                mango_module.parseInstruction(line)
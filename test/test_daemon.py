@@ -0,0 +1,120 @@
+"""Tests for the mango daemon and its unix socket client."""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+
+class TestDaemon:
+    """Tests for resolving commands through the daemon and falling back without it."""
+
+    @pytest.fixture
+    def daemon_socket(self, tmp_path, mango_script):
+        """Run a mango daemon on a temporary socket for the duration of a test."""
+        socket_path = tmp_path / "mango.sock"
+        env = dict(os.environ, MANGO_DAEMON_SOCKET=str(socket_path))
+        process = subprocess.Popen([sys.executable, str(mango_script), "--daemon"], env=env, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            if socket_path.exists():
+                break
+            time.sleep(0.05)
+        yield socket_path
+        process.terminate()
+        process.wait()
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, "hello.sh: greet\n", {"hello.sh": "#!/bin/sh\necho \"hello $1\"\n"})
+        return repo
+
+    def test_daemon_resolves_command(self, repo, daemon_socket, mango_module):
+        reply = mango_module.mangoDaemonRequest(str(daemon_socket), ["greet", "world"], str(repo), {"PATH": "/usr/bin"})
+
+        assert Path(reply["script"]) == repo / ".mango" / "hello.sh"
+        assert reply["args"] == ["world"]
+        assert reply["use_source"] is False
+        assert reply["env"]["MANGO_REPO_PATH"] == str(repo)
+        assert reply["env"]["PATH"] == "/usr/bin"
+
+    def test_daemon_never_serves_stale_bindings(self, repo, daemon_socket, mango_module):
+        assert mango_module.mangoDaemonRequest(str(daemon_socket), ["wave"], str(repo), {}) is None
+
+        instructions = repo / ".mango" / ".instructions"
+        instructions.write_text("hello.sh: greet wave\n")
+        stat = instructions.stat()
+        os.utime(instructions, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        reply = mango_module.mangoDaemonRequest(str(daemon_socket), ["wave"], str(repo), {})
+        assert Path(reply["script"]) == repo / ".mango" / "hello.sh"
+
+    def test_client_runs_through_daemon(self, repo, daemon_socket, run_mango):
+        result = run_mango(repo, "greet", "world", env={"MANGO_DAEMON": "1", "MANGO_DAEMON_SOCKET": daemon_socket, "MANGO_TRACE": "1"})
+
+        assert result.returncode == 0
+        assert "hello world" in result.stdout
+        assert "mangoResolve" not in result.stderr
+
+    def test_client_skips_heavy_imports(self, repo, daemon_socket, mango_script):
+        env = dict(os.environ, MANGO_DAEMON="1", MANGO_DAEMON_SOCKET=str(daemon_socket))
+        env.pop("MANGO_TRACE", None)
+
+        result = subprocess.run([sys.executable, "-X", "importtime", str(mango_script), "greet", "world"], cwd=repo, env=env, capture_output=True, text=True)
+
+        assert result.stdout == "hello world\n"
+        imported = {line.split("|")[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+        assert "_socket" in imported
+        assert not imported & {"socket", "json", "re", "argparse", "subprocess", "mango_cli.daemon"}
+
+    def test_client_falls_back_on_a_broken_reply(self, tmp_path, repo, mango_module):
+        socket_path = tmp_path / "broken.sock"
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(socket_path))
+        server.listen(1)
+
+        def reply():
+            connection, _ = server.accept()
+            # announce a longer message than is ever sent
+            connection.sendall((1000).to_bytes(4, "little") + b"\x00")
+            connection.close()
+        replier = threading.Thread(target=reply)
+        replier.start()
+
+        assert mango_module.mangoDaemonRequest(str(socket_path), ["greet"], str(repo), {}) is None
+        replier.join()
+        server.close()
+
+    def test_client_is_opt_in(self, repo, daemon_socket, run_mango):
+        result = run_mango(repo, "greet", "world", env={"MANGO_DAEMON": None, "MANGO_DAEMON_SOCKET": daemon_socket, "MANGO_TRACE": "1"})
+
+        assert "hello world" in result.stdout
+        assert "mangoDaemonRequest" not in result.stderr
+
+    def test_client_only_trusts_sockets(self, tmp_path, repo, mango_module):
+        impostor = tmp_path / "impostor.sock"
+        impostor.write_text("")
+
+        assert mango_module.mangoDaemonRequest(str(impostor), ["greet"], str(repo), {}) is None
+
+    def test_daemon_refuses_shared_folder(self, tmp_path, run_mango):
+        shared = tmp_path / "shared"
+        shared.mkdir(mode=0o777)
+        shared.chmod(0o777)
+
+        result = run_mango(tmp_path, "--daemon", env={"MANGO_DAEMON_SOCKET": shared / "mango.sock"}, timeout=10)
+
+        assert result.returncode == 1
+        assert "Refusing to start the daemon" in result.stderr
+        assert not (shared / "mango.sock").exists()
+
+    def test_client_falls_back_without_daemon(self, tmp_path, repo, mango_module, run_mango):
+        assert mango_module.mangoDaemonRequest(str(tmp_path / "missing.sock"), ["greet"], str(repo), {}) is None
+
+        result = run_mango(repo, "greet", "world", env={"MANGO_DAEMON": "1", "MANGO_DAEMON_SOCKET": tmp_path / "missing.sock"})
+        assert "hello world" in result.stdout
@@ -0,0 +1,45 @@
+"""Tests for fanning a command out over repositories with mango --each."""
+
+import pytest
+
+from mango_cli import jobs
+
+
+class TestEach:
+    """Tests for selecting repositories and running a command in each."""
+
+    @pytest.fixture
+    def services(self, tmp_path, make_mango_repo):
+        """Create service checkouts binding `lint` in different ways."""
+        services = tmp_path / "services"
+        make_mango_repo(services / "alpha", "lint.sh: lint\n", {"lint.sh": '#!/bin/bash\necho "$PWD $MANGO_REPO_PATH $MANGO_USER_PATH $1"\n'})
+        make_mango_repo(services / "beta", "lint.sh: lint\n", {"lint.sh": "#!/bin/bash\necho beta failing; exit 4\n"})
+        make_mango_repo(services / "gamma")
+        (services / "docs").mkdir()
+        return services
+
+    def test_each_repos_from_glob_and_list_file(self, tmp_path, services):
+        listing = tmp_path / "repos.txt"
+        listing.write_text("# checkouts\nservices/beta\n\nservices/docs\nservices/alpha\n")
+
+        assert jobs.eachRepos(str(services / "*")) == [str(services / name) for name in ("alpha", "beta", "gamma")]
+        assert jobs.eachRepos(str(listing)) == [str(services / "alpha"), str(services / "beta")]
+
+    def test_each_runs_in_every_repo(self, tmp_path, services, run_mango):
+        result = run_mango(tmp_path, "--each", "services/*", "-j", "2", "lint", "arg", env={"HOME": tmp_path})
+
+        alpha = services / "alpha"
+        assert f"[services/alpha] {alpha} {alpha} {alpha} arg" in result.stdout
+        assert "[services/beta] beta failing" in result.stdout
+        assert result.returncode == 4
+        table = [line.split() for line in result.stderr.splitlines()]
+        assert table[0] == ["REPO", "STATUS", "DURATION"]
+        assert table[1][:2] == ["services/alpha", "ok"]
+        assert table[2][:3] == ["services/beta", "failed", "(4)"]
+        assert table[3] == ["services/gamma", "not", "bound", "-"]
+
+    def test_each_without_matching_repos(self, tmp_path, services, run_mango):
+        result = run_mango(tmp_path, "--each", "services/*", "deploy", env={"HOME": tmp_path})
+
+        assert result.returncode == 1
+        assert "binds 'deploy'" in result.stderr
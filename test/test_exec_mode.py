@@ -0,0 +1,51 @@
+"""Tests for replacing the mango process with the script (exec mode)."""
+
+import os
+import subprocess
+
+import pytest
+
+
+class TestExecMode:
+    """Tests for the process a script runs in."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, "pid.sh: pid\npipe.sh: pipe\n", {
+            "pid.sh": "#!/bin/bash\necho $$\nexit ${1:-0}\n",
+            "pipe.sh": "#!/bin/bash\ngrep SigIgn /proc/self/status\nyes | head -1\n",
+        })
+        return repo
+
+    def _run(self, mango_script, repo, *argv):
+        """Run mango and return the process with its output, the pid being the one of mango."""
+        process = subprocess.Popen(["python3", str(mango_script), *argv], cwd=repo, stdout=subprocess.PIPE, text=True)
+        stdout, _ = process.communicate()
+        return process, stdout
+
+    def test_script_replaces_mango_process_by_default(self, repo, mango_script):
+        process, stdout = self._run(mango_script, repo, "pid")
+
+        assert process.returncode == 0
+        assert int(stdout.strip()) == process.pid
+
+    def test_no_exec_keeps_mango_as_parent(self, repo, mango_script):
+        process, stdout = self._run(mango_script, repo, "--no-exec", "pid")
+
+        assert process.returncode == 0
+        assert int(stdout.strip()) != process.pid
+
+    def test_exit_code_is_forwarded_in_both_modes(self, repo, mango_script):
+        assert self._run(mango_script, repo, "pid", "3")[0].returncode == 3
+        assert self._run(mango_script, repo, "--no-exec", "pid", "3")[0].returncode == 3
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc to read ignored signals")
+    def test_script_gets_default_signal_dispositions(self, repo, run_mango):
+        # python ignores SIGPIPE (13) and SIGXFSZ (25) for itself, which must not leak into the script
+        for argv in (["pipe"], ["--no-exec", "pipe"]):
+            result = run_mango(repo, *argv)
+            ignored = int(result.stdout.split()[1], 16)
+            assert ignored & (1 << 12 | 1 << 24) == 0
+            assert result.stdout.splitlines()[1:] == ["y"]
+            assert result.stderr == ""
@@ -0,0 +1,99 @@
+"""Tests for the run history recorded with MANGO_HISTORY and mango --stats."""
+
+import sqlite3
+
+import pytest
+
+from mango_cli.history import mangoStats
+
+
+class TestHistory:
+    """Tests for recording runs and summarizing them."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, "ok.sh: ok\nflaky.sh: flaky\n", {"ok.sh": "#!/bin/bash\necho ok\n", "flaky.sh": '#!/bin/bash\nexit "${1:-0}"\n'})
+        return repo
+
+    @pytest.fixture
+    def mango(self, run_mango):
+        """Provide a function running mango in a repo with a history file, or with none."""
+        def mango(repo, history, *args):
+            return run_mango(repo, *args, env={"HOME": repo.parent, "MANGO_HISTORY": history})
+        return mango
+
+    def test_runs_are_recorded(self, tmp_path, repo, mango):
+        history = tmp_path / "history.sqlite"
+
+        assert mango(repo, history, "ok", "a", "b").stdout == "ok\n"
+        assert mango(repo, history, "flaky", "3").returncode == 3
+
+        rows = sqlite3.connect(history).execute("SELECT binding, script, repo, args_hash, duration, exit_code, peak_rss FROM runs").fetchall()
+        assert [(row[0], row[5]) for row in rows] == [("ok", 0), ("flaky", 3)]
+        assert rows[0][1] == str(repo / ".mango" / "ok.sh")
+        assert rows[0][2] == str(repo)
+        assert rows[0][3] != rows[1][3]
+        assert all(row[4] >= 0 and row[6] > 0 for row in rows)
+
+    def test_history_is_off_by_default(self, tmp_path, repo, mango):
+        mango(repo, None, "ok")
+
+        assert not (tmp_path / ".mango" / ".history.sqlite").exists()
+
+    def test_default_history_path(self, tmp_path, repo, mango, make_mango_repo):
+        make_mango_repo(tmp_path)
+
+        mango(repo, "1", "ok")
+
+        assert (tmp_path / ".mango" / ".history.sqlite").exists()
+
+    def test_default_history_needs_a_home_mango(self, tmp_path, repo, mango, run_mango):
+        result = mango(repo, "1", "ok")
+
+        assert result.stdout == "ok\n"
+        assert "needs a home mango" in result.stderr
+        # a ~/.mango without .instructions would make the home folder a broken mango repository
+        assert not (tmp_path / ".mango").exists()
+        (tmp_path / "other").mkdir()
+        assert "No mango repository found" in run_mango(tmp_path / "other", "ok", env={"HOME": tmp_path}).stderr
+
+    def test_stats_summary(self, tmp_path, repo, mango):
+        history = tmp_path / "history.sqlite"
+        for code in ("0", "0", "1", "0"):
+            mango(repo, history, "flaky", code)
+        mango(repo, history, "ok")
+
+        summary = mangoStats(str(history))
+
+        assert [(entry["binding"], entry["runs"], entry["failures"]) for entry in summary] == [("flaky", 4, 1), ("ok", 1, 0)]
+        assert summary[0]["p50"] <= summary[0]["p95"] <= summary[0]["max"]
+        assert mangoStats(str(history), "ok")[0]["runs"] == 1
+
+        table = mango(repo, history, "--stats").stdout.splitlines()
+        assert table[0].split()[:6] == ["COMMAND", "RUNS", "FAIL%", "P50", "P95", "MAX"]
+        assert table[1].split()[:3] == ["flaky", "4", "25.0"]
+
+    def test_stats_without_history(self, tmp_path, repo, mango):
+        result = mango(repo, None, "--stats")
+
+        assert result.returncode == 0
+        assert "No runs recorded" in result.stderr
+
+    def test_parallel_fanned_out_graph_and_snapshot_runs_are_recorded(self, tmp_path, repo, mango, run_mango):
+        mango_dir = repo / ".mango"
+        (mango_dir / "env.sh").write_text("export GREETING=hi\n")
+        (mango_dir / ".instructions").write_text("ok.sh: ok\nflaky.sh: flaky\n*env.sh: env\n(ok) needs: flaky\n(env) cache: HOME\n")
+        history = tmp_path / "history.sqlite"
+
+        assert mango(repo, history, "-j", "2", "flaky", "4", "::", "flaky").returncode == 4
+        assert mango(repo, history, "--each", str(repo), "flaky", "5").returncode == 5
+        assert mango(repo, history, "ok").returncode == 0
+        assert run_mango(repo, "env", env={"SHELL": "/bin/true", "HOME": tmp_path, "MANGO_HISTORY": history}).returncode == 0
+
+        rows = sqlite3.connect(history).execute("SELECT binding, script, repo, exit_code, peak_rss FROM runs ORDER BY rowid").fetchall()
+        # parallel jobs are recorded in the order they were given, one row each
+        assert [(row[0], row[3]) for row in rows] == [("flaky", 4), ("flaky", 0), ("flaky", 5), ("ok", 0), ("env", 0)]
+        assert [row[1] for row in rows] == [str(mango_dir / name) for name in ("flaky.sh", "flaky.sh", "flaky.sh", "ok.sh", "env.sh")]
+        assert all(row[2] == str(repo) for row in rows)
+        assert all(row[4] > 0 for row in rows)
@@ -0,0 +1,75 @@
+"""Tests for running python scripts inside the mango process with MANGO_IN_PROCESS."""
+
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+
+class TestInProcess:
+    """Tests for python scripts run by the mango interpreter instead of a new one."""
+
+    PROBE = f"""#!{sys.executable}
+import os, sys
+print(os.getpid(), "mango_cli" in sys.modules)
+print(" ".join(sys.argv[1:]))
+print(os.environ["MANGO_SCRIPT_NAME"], os.getcwd())
+print(sys.path[0] == os.path.dirname(os.path.realpath(__file__)))
+if len(sys.argv) > 1 and sys.argv[1] == "raise":
+    raise ValueError("broken probe")
+if len(sys.argv) > 1 and sys.argv[1] == "interrupt":
+    raise KeyboardInterrupt
+sys.exit(int(sys.argv[1]) if sys.argv[1:2] and sys.argv[1].isdigit() else 0)
+"""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, "probe.py: probe\n", {"probe.py": self.PROBE})
+        (repo / "work").mkdir()
+        return repo
+
+    def _run(self, mango_script, cwd, *argv, in_process=True):
+        """Run mango and return the process with its output lines and error output, the pid being the one of mango."""
+        env = {key: value for key, value in os.environ.items() if key != "MANGO_IN_PROCESS"}
+        if in_process:
+            env["MANGO_IN_PROCESS"] = "1"
+        process = subprocess.Popen([sys.executable, str(mango_script), *argv], cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        stdout, stderr = process.communicate()
+        return process, stdout.splitlines(), stderr
+
+    def test_python_script_runs_in_mango_process(self, repo, mango_script):
+        process, lines, _ = self._run(mango_script, repo / "work", "probe", "a b", "c")
+
+        assert process.returncode == 0
+        assert lines[0] == f"{process.pid} True"
+        assert lines[1:] == ["a b c", f"probe.py {repo / 'work'}", "True"]
+
+    def test_same_output_as_a_new_interpreter(self, repo, mango_script):
+        for in_process in (True, False):
+            process, lines, _ = self._run(mango_script, repo / "work", "probe", "x", in_process=in_process)
+            assert process.returncode == 0
+            assert lines[0].split()[1] == str(in_process)
+            assert lines[1:] == ["x", f"probe.py {repo / 'work'}", "True"]
+
+    def test_exit_codes_match_a_new_interpreter(self, repo, mango_script):
+        for in_process in (True, False):
+            assert self._run(mango_script, repo, "probe", "4", in_process=in_process)[0].returncode == 4
+            process, _, stderr = self._run(mango_script, repo, "probe", "raise", in_process=in_process)
+            assert process.returncode == 1
+            assert stderr.startswith("Traceback") and "mango_cli" not in stderr and "runpy" not in stderr
+            assert stderr.strip().endswith("ValueError: broken probe")
+            assert self._run(mango_script, repo, "probe", "interrupt", in_process=in_process)[0].returncode == -signal.SIGINT
+
+    def test_other_interpreters_get_their_own_process(self, repo, mango_script):
+        probe = repo / ".mango" / "probe.py"
+        probe.write_text(self.PROBE.replace(f"#!{sys.executable}", f"#!{sys.executable} -u", 1))
+
+        process, lines, _ = self._run(mango_script, repo, "probe")
+        assert process.returncode == 0
+        assert lines[0].split()[1] == "False"
+
+        process, lines, _ = self._run(mango_script, repo, "--no-exec", "probe", in_process=True)
+        assert lines[0].split()[1] == "False"
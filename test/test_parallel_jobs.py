@@ -0,0 +1,58 @@
+"""Tests for running several commands concurrently with -j."""
+
+import time
+
+import pytest
+
+
+class TestParallelJobs:
+    """Tests for the scheduling and the output of mango -j."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, "slow.sh: a b c\nfail.sh: fail\nlong.sh: long\n", {
+            "slow.sh": "#!/bin/bash\nsleep 0.5\necho \"slow $*\"\n",
+            "fail.sh": "#!/bin/bash\necho 'failing' >&2\nexit 4\n",
+            "long.sh": "#!/bin/bash\nsleep 5\necho 'finished'\n",
+        })
+        return repo
+
+    def test_commands_run_concurrently_with_prefixed_output(self, repo, run_mango):
+        start = time.time()
+        result = run_mango(repo, "-j", "3", "a", "b", "c")
+        elapsed = time.time() - start
+
+        assert result.returncode == 0
+        for label in "abc":
+            assert f"[{label}] slow" in result.stdout
+        assert elapsed < 1.4
+
+    def test_separator_passes_arguments_per_command(self, repo, run_mango):
+        result = run_mango(repo, "-j", "2", "--output", "group", "a", "one", "::", "b", "two")
+
+        assert result.returncode == 0
+        assert "==> a <==\nslow one" in result.stdout
+        assert "==> b <==\nslow two" in result.stdout
+
+    def test_keep_going_reports_failure(self, repo, run_mango):
+        result = run_mango(repo, "-j", "2", "fail", "a")
+
+        assert result.returncode == 4
+        assert "[a] slow" in result.stdout
+        assert "[fail] failing" in result.stderr
+
+    def test_fail_fast_stops_other_jobs(self, repo, run_mango):
+        start = time.time()
+        result = run_mango(repo, "-j", "2", "--fail-fast", "long", "fail")
+
+        assert result.returncode == 4
+        assert "finished" not in result.stdout
+        assert time.time() - start < 4
+
+    def test_unknown_command_runs_nothing(self, repo, run_mango):
+        result = run_mango(repo, "-j", "2", "a", "missing")
+
+        assert result.returncode == 1
+        assert "Command 'missing' not found" in result.stderr
+        assert result.stdout == ""
@@ -0,0 +1,111 @@
+"""Tests for streaming resolution with mango --resolve."""
+
+import json
+
+import pytest
+
+from mango_cli import resolve
+
+
+class TestResolve:
+    """Tests for mango --resolve queries and their replies."""
+
+    @pytest.fixture
+    def tree(self, tmp_path, make_mango_repo):
+        """Create a host repo with a nested repo that exports and rebinds a submodule."""
+        host = tmp_path / "host"
+        make_mango_repo(host, "up.sh: up\n", ["up.sh"])
+        repo = host / "repo"
+        make_mango_repo(repo / ".mango" / ".submodules" / "tools", "# tools\nbuild.sh: build\nlint.sh: lint\n", ["build.sh", "lint.sh"])
+        make_mango_repo(repo, "*env.sh: env\n[tools] *\n[tools] lint: check\n", ["env.sh"])
+        return host, repo
+
+    def test_resolve_reports_origin(self, tree):
+        _, repo = tree
+        root = str(repo / ".mango" / ".instructions")
+        tools = str(repo / ".mango" / ".submodules" / "tools" / ".mango" / ".instructions")
+
+        reply = resolve.mangoResolveQuery({"command": "build"}, str(repo))
+        assert reply["found"] and not reply["use_source"]
+        assert reply["path"] == str(repo / ".mango" / ".submodules" / "tools" / ".mango" / "build.sh")
+        assert (reply["virtual"], reply["instructions"], reply["line"]) == ("tools:build", tools, 2)
+
+        reply = resolve.mangoResolveQuery({"command": "check"}, str(repo))
+        assert reply["path"].endswith("lint.sh")
+        assert (reply["virtual"], reply["instructions"], reply["line"]) == ("check", root, 3)
+
+        reply = resolve.mangoResolveQuery({"command": "env"}, str(repo))
+        assert reply["use_source"] and (reply["instructions"], reply["line"]) == (root, 1)
+
+        reply = resolve.mangoResolveQuery({"command": "tools:lint"}, str(repo))
+        assert (reply["virtual"], reply["instructions"], reply["line"]) == ("tools:lint", tools, 3)
+
+    def test_resolve_host_commands(self, tree):
+        host, repo = tree
+
+        assert not resolve.mangoResolveQuery({"command": "up"}, str(repo))["found"]
+        for query in ({"command": "up", "host": True}, {"command": "@up"}):
+            reply = resolve.mangoResolveQuery(query, str(repo))
+            assert reply["found"] and reply["host"]
+            assert reply["repo"] == str(host)
+            assert (reply["virtual"], reply["line"]) == ("up", 1)
+
+    def test_resolve_follows_edits(self, tree):
+        _, repo = tree
+        instructions = repo / ".mango" / ".instructions"
+
+        assert resolve.mangoResolveQuery({"command": "check"}, str(repo))["line"] == 3
+        instructions.write_text("# moved\n" + instructions.read_text())
+        assert resolve.mangoResolveQuery({"command": "check"}, str(repo))["line"] == 4
+
+    def test_resolve_json_stream(self, tmp_path, tree, run_mango):
+        _, repo = tree
+        queries = [
+            {"id": 1, "command": "build"},
+            {"id": 2, "command": "missing", "cwd": "sub"},
+            "not json",
+            {"id": 3, "command": "up", "host": True, "cwd": str(repo)},
+            {"id": 4, "command": "build", "cwd": str(tmp_path)},
+        ]
+        (repo / "sub").mkdir()
+
+        result = run_mango(
+            repo, "--resolve", "--json", env={"HOME": tmp_path},
+            input="".join((query if isinstance(query, str) else json.dumps(query)) + "\n" for query in queries),
+        )
+
+        assert result.returncode == 0, result.stderr
+        replies = [json.loads(line) for line in result.stdout.splitlines()]
+        assert len(replies) == 5
+        assert replies[0]["id"] == 1 and replies[0]["virtual"] == "tools:build"
+        assert replies[1]["id"] == 2 and not replies[1]["found"] and replies[1]["cwd"] == str(repo / "sub")
+        assert "error" in replies[2]
+        assert replies[3]["found"] and replies[3]["path"].endswith("up.sh")
+        assert replies[4] == {"id": 4, "error": "mango repository not found"}
+
+    def test_resolve_json_rejects_mistyped_fields(self, tmp_path, tree, run_mango):
+        _, repo = tree
+        queries = [
+            {"id": 1, "command": "build", "cwd": 5},
+            {"id": 2, "command": "build", "host": "yes"},
+            {"id": [3], "command": "build"},
+            {"id": 4, "command": "build"},
+        ]
+
+        result = run_mango(repo, "--resolve", "--json", env={"HOME": tmp_path}, input="".join(json.dumps(query) + "\n" for query in queries))
+
+        assert result.returncode == 0, result.stderr
+        replies = [json.loads(line) for line in result.stdout.splitlines()]
+        assert replies[0] == {"id": 1, "error": "query cwd must be a string"}
+        assert replies[1] == {"id": 2, "error": "query host must be true or false"}
+        assert replies[2]["error"] == "query id must be a string or a number"
+        assert replies[3]["id"] == 4 and replies[3]["found"]
+
+    def test_resolve_plain_stream(self, tmp_path, tree, run_mango):
+        _, repo = tree
+
+        result = run_mango(repo, "--resolve", env={"HOME": tmp_path}, input="build\nmissing\n@up\n")
+
+        assert result.returncode == 0, result.stderr
+        lines = result.stdout.split("\n")
+        assert lines[0].endswith("build.sh") and lines[1] == "" and lines[2].endswith("up.sh")
@@ -0,0 +1,107 @@
+"""Tests for the result cache of cacheable commands."""
+
+import os
+
+import pytest
+
+from mango_cli import tasks
+
+
+class TestResultCache:
+    """Tests for recording, replaying and evicting command results."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, (
+            "report.sh: report\n"
+            "(report) cache: REGION\n"
+            "(report) inputs: *.txt\n"
+        ), {"report.sh": (
+            "#!/bin/bash\n"
+            "echo run >> \"$MANGO_REPO_PATH/runs\"\n"
+            "echo \"report $* $REGION $(cat \"$MANGO_REPO_PATH/data.txt\")\"\n"
+            "echo 'report warning' >&2\n"
+        )})
+        (repo / "data.txt").write_text("one\n")
+        return repo
+
+    @pytest.fixture
+    def run(self, tmp_path, run_mango):
+        """Provide a function running mango in a repo with the results kept in the test folder."""
+        def run(repo, *argv, **env):
+            return run_mango(repo, *argv, env={"MANGO_RESULT_CACHE": tmp_path / "results", **env})
+        return run
+
+    def _runs(self, repo):
+        return (repo / "runs").read_text().count("run")
+
+    def test_hit_replays_output_without_running(self, repo, run):
+        first = run(repo, "report", "a")
+        second = run(repo, "report", "a")
+
+        assert self._runs(repo) == 1
+        assert second.returncode == 0
+        assert second.stdout == first.stdout == "report a  one\n"
+        assert "report warning" in second.stderr
+
+    def test_args_env_and_inputs_change_the_key(self, repo, run):
+        run(repo, "report", "a")
+
+        run(repo, "report", "b")
+        assert self._runs(repo) == 2
+
+        result = run(repo, "report", "a", REGION="eu")
+        assert self._runs(repo) == 3
+        assert result.stdout == "report a eu one\n"
+
+        (repo / "data.txt").write_text("two\n")
+        result = run(repo, "report", "a")
+        assert self._runs(repo) == 4
+        assert result.stdout == "report a  two\n"
+
+    def test_identical_repositories_do_not_share_results(self, tmp_path, repo, run):
+        run(repo, "report", "a")
+
+        # a copy has the same script and inputs, but its script reads its own MANGO_REPO_PATH
+        copy = tmp_path / "copy"
+        (copy / ".mango").mkdir(parents=True)
+        for name in ("data.txt", ".mango/report.sh", ".mango/.instructions"):
+            (copy / name).write_bytes((repo / name).read_bytes())
+        (copy / ".mango" / "report.sh").chmod(0o755)
+        result = run(copy, "report", "a")
+        assert result.stdout == "report a  one\n"
+        assert self._runs(copy) == 1
+
+    def test_failures_are_not_recorded(self, repo, run):
+        with open(repo / ".mango" / "report.sh", "a") as script:
+            script.write("exit 2\n")
+
+        assert run(repo, "report").returncode == 2
+        assert run(repo, "report").returncode == 2
+        assert self._runs(repo) == 2
+
+    def test_results_need_a_home_mango_or_a_cache_folder(self, tmp_path, repo, run_mango):
+        home = tmp_path / "home"
+        home.mkdir()
+
+        for _ in range(2):
+            result = run_mango(repo, "report", "a", env={"HOME": home, "MANGO_RESULT_CACHE": None})
+            assert result.returncode == 0
+            assert result.stdout == "report a  one\n"
+            assert "is not cached" in result.stderr
+        assert self._runs(repo) == 2
+        # a ~/.mango without .instructions would make the home folder a broken mango repository
+        assert not (home / ".mango").exists()
+
+    def test_eviction_keeps_cache_within_budget(self, tmp_path):
+        cache = tmp_path / "results"
+        cache.mkdir()
+        for i in range(4):
+            entry = cache / f"{i}.result"
+            entry.write_bytes(b"x" * 100)
+            os.utime(entry, ns=(i * 1_000_000_000, i * 1_000_000_000))
+
+        tasks.evictResults(str(cache), 250)
+
+        assert sorted(path.name for path in cache.iterdir()) == ["2.result", "3.result"]
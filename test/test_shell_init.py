@@ -0,0 +1,71 @@
+"""Tests for the shell function installed with mango --shell-init."""
+
+import os
+import subprocess
+
+import pytest
+
+
+class TestShellInit:
+    """Tests for the mango shell function and its completion."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo, mango_script):
+        repo = tmp_path / "repo"
+        mango_dir = make_mango_repo(repo, "*env.sh: pick\nshow.sh: show\n", {"show.sh": '#!/bin/bash\necho "show:$1:$MANGO_SCRIPT_NAME"\n'})
+        (mango_dir / "env.sh").write_text('export PICKED="$1|$2"\nSOURCED_IN=$$\n')
+        (tmp_path / "bin").mkdir()
+        (tmp_path / "bin" / "mango").symlink_to(mango_script)
+        return repo
+
+    def _bash(self, repo, script):
+        """Run a bash script after installing the shell function of the mango found in the bin folder next to the repo."""
+        env = {**os.environ, "PATH": f"{repo.parent / 'bin'}:{os.environ['PATH']}", "HOME": str(repo.parent)}
+        env.pop("MANGO_HISTORY", None)
+        return subprocess.run(
+            ["bash", "-c", f'eval "$(mango --shell-init bash)"\n{script}'],
+            cwd=repo, capture_output=True, text=True, env=env,
+        )
+
+    def test_sourced_commands_run_in_the_current_shell(self, repo):
+        result = self._bash(repo, """
+mango pick 'a b' '$(touch injected)'
+echo "$PICKED"
+[ "$SOURCED_IN" = "$$" ] && echo same-shell
+echo "${MANGO_REPO_PATH-unset}"
+""")
+
+        assert result.stdout.splitlines() == ["a b|$(touch injected)", "same-shell", "unset"], result.stderr
+        assert not (repo / "injected").exists()
+
+    def test_plain_commands_and_options(self, repo):
+        result = self._bash(repo, """
+mango show 'x y'
+mango --version
+mango missing; echo "status $?"
+""")
+
+        assert result.stdout.splitlines() == ["show:x y:show.sh", "Mango 2.0.3", "status 1"]
+
+    def test_shell_plan(self, repo, mango_module):
+        plan = mango_module.mangoShellPlan(["pick", "it's"], str(repo))
+        assert plan.endswith(f"source {repo}/.mango/env.sh 'it'\"'\"'s'")
+        assert f"MANGO_REPO_PATH={repo}" in plan
+        assert mango_module.mangoShellPlan(["-j", "2", "show"], str(repo)) == "command mango -j 2 show"
+
+    def test_shell_init_includes_completion(self, tmp_path, run_mango):
+        result = run_mango(tmp_path, "--shell-init", "bash")
+
+        assert "mango() {" in result.stdout
+        assert "complete -o default -F _mango_complete mango" in result.stdout
+
+    def test_completion_bypasses_the_shell_function(self, repo):
+        script = """
+mango() { echo "function called" >&2; }
+COMP_LINE="mango sh" COMP_POINT=8 _mango_complete
+echo "${COMPREPLY[@]}"
+"""
+        result = self._bash(repo, script)
+
+        assert result.stdout == "show\n"
+        assert result.stderr == ""
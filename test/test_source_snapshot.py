@@ -0,0 +1,149 @@
+"""Tests for environment snapshots of sourced commands declaring a cache."""
+
+import os
+import subprocess
+
+import pytest
+
+
+class TestSourceSnapshot:
+    """Tests for recording, replaying and invalidating environment snapshots."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo, make_script):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, (
+            "*setup.sh: setup\n"
+            "(setup) cache: REGION\n"
+            "(setup) inputs: toolchain.txt\n"
+        ), {"setup.sh": (
+            "echo run >> \"$MANGO_REPO_PATH/runs\"\n"
+            "echo 'setting up'\n"
+            "export TOOLCHAIN=\"$(cat \"$MANGO_REPO_PATH/toolchain.txt\")-$1-$REGION\"\n"
+            "export PATH=\"/opt/toolchain/bin:$PATH\"\n"
+            "unset DROPPED\n"
+            "greet() { echo \"hello $1\"; }\n"
+            "alias tc='echo toolchain'\n"
+            "[ \"$1\" != fail ]\n"
+        )})
+        (repo / "toolchain.txt").write_text("1.0\n")
+        # the shell sourced scripts hand over to reports what it was started with
+        make_script(tmp_path, "shell.sh", "#!/bin/bash\necho \"shell TOOLCHAIN=$TOOLCHAIN DROPPED=${DROPPED-unset} PATH=${PATH%%:*}\"\n")
+        return repo
+
+    @pytest.fixture
+    def run(self, tmp_path, repo, run_mango):
+        """Provide a function running mango in the repo, from a shell with REGION and DROPPED set."""
+        def run(*argv, **env):
+            return run_mango(repo, *argv, env={
+                "MANGO_RESULT_CACHE": tmp_path / "results", "SHELL": tmp_path / "shell.sh", "DROPPED": "here", "REGION": "eu", "MANGO_HISTORY": None, **env,
+            })
+        return run
+
+    def _runs(self, repo):
+        return (repo / "runs").read_text().count("run")
+
+    def test_snapshot_is_replayed_without_sourcing(self, repo, run):
+        expected = "shell TOOLCHAIN=1.0-x-eu DROPPED=unset PATH=/opt/toolchain/bin\n"
+
+        first = run("setup", "x")
+        assert first.returncode == 0, first.stderr
+        assert first.stdout == "setting up\n" + expected
+
+        for argv in (["setup", "x"], ["--no-exec", "setup", "x"]):
+            again = run(*argv)
+            assert again.returncode == 0, again.stderr
+            assert again.stdout == expected
+        assert self._runs(repo) == 1
+
+    def test_snapshot_invalidation(self, repo, run):
+        run("setup", "x")
+
+        assert "1.0-y-eu" in run("setup", "y").stdout
+        assert "1.0-x-us" in run("setup", "x", REGION="us").stdout
+        assert self._runs(repo) == 3
+
+        (repo / "toolchain.txt").write_text("2.0\n")
+        assert "2.0-x-eu" in run("setup", "x").stdout
+        setup = repo / ".mango" / "setup.sh"
+        setup.write_text(setup.read_text() + "# edited\n")
+        run("setup", "x")
+        assert self._runs(repo) == 5
+
+        assert "setting up" in run("--refresh", "setup", "x").stdout
+        assert self._runs(repo) == 6
+
+    def test_failed_setup_is_not_recorded(self, repo, run):
+        assert run("setup", "fail").returncode == 1
+        assert run("setup", "fail").returncode == 1
+        assert self._runs(repo) == 2
+
+    def test_shell_function_replays_into_the_calling_shell(self, tmp_path, repo, mango_script):
+        bin_path = tmp_path / "bin"
+        bin_path.mkdir()
+        (bin_path / "mango").symlink_to(mango_script)
+        env = {**os.environ, "PATH": f"{bin_path}:{os.environ['PATH']}", "MANGO_RESULT_CACHE": str(tmp_path / "results"), "REGION": "eu"}
+        env.pop("MANGO_HISTORY", None)
+        script = """
+shopt -s expand_aliases
+eval "$(mango --shell-init bash)"
+DROPPED=here
+export DROPPED
+# record the snapshot without touching this shell, whose PATH it would change
+(mango setup 'a b')
+mango setup 'a b'
+echo "$TOOLCHAIN ${DROPPED-unset} ${MANGO_REPO_PATH-unset}"
+greet world
+"""
+
+        result = subprocess.run(["bash", "-c", script + "tc\n"], cwd=repo, capture_output=True, text=True, env=env)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout == "1.0-a b-eu unset unset\nhello world\ntoolchain\n"
+        assert result.stderr == "setting up\n"
+        assert self._runs(repo) == 1
+
+    def test_snapshot_needs_the_same_starting_values(self, repo, run):
+        run("setup", "x")
+
+        # the recorded PATH was built on the caller's PATH, so another one sources the script again
+        other_path = run("setup", "x", PATH="/usr/local/bin:" + os.environ["PATH"])
+        assert other_path.returncode == 0, other_path.stderr
+        assert self._runs(repo) == 2
+        run("setup", "x", DROPPED="elsewhere")
+        assert self._runs(repo) == 3
+
+        assert run("setup", "x", DROPPED="elsewhere").stdout == "shell TOOLCHAIN=1.0-x-eu DROPPED=unset PATH=/opt/toolchain/bin\n"
+        assert self._runs(repo) == 3
+
+    def test_snapshot_needs_a_home_mango_or_a_cache_folder(self, tmp_path, repo, run):
+        home = tmp_path / "home"
+        home.mkdir()
+
+        for _ in range(2):
+            result = run("setup", "x", HOME=home, MANGO_RESULT_CACHE=None)
+            assert result.returncode == 0, result.stderr
+            assert "TOOLCHAIN=1.0-x-eu" in result.stdout
+            assert "is not cached" in result.stderr
+        assert self._runs(repo) == 2
+        assert not (home / ".mango").exists()
+
+    def test_snapshot_of_a_script_calling_exit(self, repo, run):
+        setup = repo / ".mango" / "setup.sh"
+        setup.write_text(setup.read_text().replace("[ \"$1\" != fail ]\n", "exit 0\n"))
+
+        for argv in (["setup", "x"], ["--shell-resolve", "setup", "x"]):
+            result = run(*argv)
+            assert result.returncode == 0, result.stderr
+            assert "TOOLCHAIN=" in result.stdout
+        assert self._runs(repo) == 1
+
+    def test_snapshot_of_a_script_replacing_the_exit_trap(self, repo, run):
+        setup = repo / ".mango" / "setup.sh"
+        setup.write_text("trap 'echo bye' EXIT\n" + setup.read_text())
+
+        result = run("setup", "x")
+
+        assert result.returncode == 1
+        assert "exited without leaving an environment to snapshot" in result.stderr
+        assert "Traceback" not in result.stderr
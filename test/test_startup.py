@@ -0,0 +1,87 @@
+"""Tests for startup cost: lazy imports, the argparse-free command path, bytecode caching and the single-file build."""
+
+import os
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+BUILD_SCRIPT = PROJECT_ROOT / "tools" / "build_zipapp.py"
+
+
+class TestStartup:
+    """Tests for what a plain command loads and how long it takes to start."""
+
+    # time a plain command may add on top of starting python itself, measured on the fastest of several runs
+    STARTUP_BUDGET_MS = 15
+    RUNS = 15
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, "hello.sh: hello\n", {"hello.sh": "#!/bin/sh\necho hello\n"})
+        return repo
+
+    def _env(self):
+        # bytecode caching is what is being measured, so allow it even where the test runner disables it
+        env = dict(os.environ)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        env.pop("MANGO_TRACE", None)
+        env.pop("MANGO_HISTORY", None)
+        return env
+
+    def _fastest_ms(self, argv, cwd):
+        timings = []
+        for _ in range(self.RUNS):
+            start = time.perf_counter()
+            result = subprocess.run(argv, cwd=cwd, env=self._env(), capture_output=True)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert result.returncode == 0, result.stderr
+        return min(timings)
+
+    def test_plain_command_skips_heavy_imports(self, repo, mango_script):
+        result = subprocess.run([sys.executable, "-X", "importtime", str(mango_script), "hello"], cwd=repo, env=self._env(), capture_output=True, text=True)
+
+        assert result.stdout == "hello\n"
+        imported = {line.split("|")[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+        assert "mango_cli" in imported
+        assert not imported & {"argparse", "subprocess", "re", "json", "functools"}
+        # the daemon, watch, task and other submodules are only loaded by the options that use them
+        assert not {name for name in imported if name.startswith("mango_cli.")}
+
+    def test_startup_budget(self, repo, mango_script):
+        # warm the bytecode cache and the binding index
+        subprocess.run([sys.executable, str(mango_script), "hello"], cwd=repo, env=self._env(), check=True, capture_output=True)
+
+        python_ms = self._fastest_ms([sys.executable, "-c", "pass"], repo)
+        mango_ms = self._fastest_ms([sys.executable, str(mango_script), "hello"], repo)
+
+        assert mango_ms - python_ms < self.STARTUP_BUDGET_MS, f"mango took {mango_ms:.1f} ms, python alone {python_ms:.1f} ms"
+
+    def test_plain_arguments_match_the_parser(self, mango_module):
+        argv = ["build", "--release", "-j", "2"]
+
+        assert vars(mango_module.plainArguments(argv)) == vars(mango_module.mangoArgumentParser().parse_args(argv))
+
+    def test_single_file_build(self, tmp_path, repo):
+        output = tmp_path / "dist" / "mango"
+
+        subprocess.run([sys.executable, str(BUILD_SCRIPT), "--output", str(output)], check=True, capture_output=True)
+
+        names = set(zipfile.ZipFile(output).namelist())
+        assert {"__main__.py", "mango_cli/__init__.py", "mango_cli/__init__.pyc"} <= names
+        assert {f"mango_cli/{source.name}c" for source in (PROJECT_ROOT / "src" / "mango_cli").glob("*.py")} <= names
+        assert os.access(output, os.X_OK)
+        result = subprocess.run([str(output), "hello"], cwd=repo, capture_output=True, text=True)
+        assert result.stdout == "hello\n"
+        version = subprocess.run([str(output), "--version"], capture_output=True, text=True)
+        assert version.stdout.startswith("Mango ")
+
+    def test_installer_fetches_every_module(self):
+        modules = next(line for line in (PROJECT_ROOT / "install.sh").read_text().splitlines() if line.startswith("MANGO_CLI_MODULES="))
+
+        assert sorted(modules.split("(")[1].rstrip(")").split()) == sorted(source.stem for source in (PROJECT_ROOT / "src" / "mango_cli").glob("*.py"))
@@ -0,0 +1,131 @@
+"""Tests for "did you mean" suggestions and the mango --pick fuzzy finder."""
+
+import os
+import pty
+import select
+import sys
+import time
+
+import pytest
+
+from mango_cli import picker, suggest
+
+
+class TestSuggest:
+    """Tests for suggesting commands after a miss and picking them interactively."""
+
+    @pytest.fixture
+    def tree(self, tmp_path, make_mango_repo):
+        """Create an outer repo with a submodule and a nested project repo."""
+        outer = tmp_path / "outer"
+        tools = make_mango_repo(outer / ".mango" / ".submodules" / "tools", "build.sh: build\n", {"build.sh": "#!/bin/sh\necho built\n"})
+        make_mango_repo(tools / ".submodules" / "lib", "link.sh: link\n")
+        make_mango_repo(outer, "deploy.sh: deploy release-notes\n[tools] build: build-project\n", {"deploy.sh": "#!/bin/sh\necho deployed\n"})
+        project = outer / "project"
+        make_mango_repo(project, "deploy.sh: run-tests\n")
+        return outer, project
+
+    def test_suggestions_for_typos(self, tree):
+        outer, project = tree
+
+        assert suggest.mangoSuggest("deplyo", str(outer)) == ["deploy"]
+        assert suggest.mangoSuggest("build-projetc", str(outer)) == ["build-project"]
+        # bindings only reachable through their virtual path
+        assert suggest.mangoSuggest("link", str(outer)) == ["tools:lib:link"]
+        # host commands come from every repository up the tree
+        assert suggest.mangoSuggest("@deploi", str(project)) == ["@deploy"]
+        assert suggest.mangoSuggest("zzzzzz", str(outer)) == []
+
+    def test_suggestions_use_the_postings_of_the_index(self, tree, mango_module, monkeypatch):
+        outer, _ = tree
+        mango_module.mangoLoadIndex(str(outer / ".mango"))
+        mango_module.loaded_indexes.clear()
+
+        # a miss loads the stored postings instead of building them
+        monkeypatch.setattr(suggest, "ngramIndex", None)
+        assert suggest.mangoSuggest("build-projetc", str(outer)) == ["build-project"]
+        assert suggest.mangoSuggest("link", str(outer)) == ["tools:lib:link"]
+
+    def test_edit_distance(self):
+        assert suggest.editDistance("deploy", "deploy") == 0
+        assert suggest.editDistance("deplyo", "deploy") == 1
+        assert suggest.editDistance("dep", "deploy") == 3
+        assert suggest.editDistance("", "ab") == 2
+
+    def test_miss_prints_suggestions(self, tmp_path, tree, run_mango):
+        outer, _ = tree
+
+        result = run_mango(outer, "deplyo", env={"HOME": tmp_path})
+
+        assert result.returncode == 1
+        assert result.stderr.splitlines() == ["Command 'deplyo' not found in the current repo. Should it exist?", "Did you mean: deploy?"]
+
+    def test_fuzzy_filter_ranking(self):
+        commands = ["build", "tools:build", "rebuild-all", "bundle", "deploy"]
+
+        assert picker.fuzzyFilter("bld", commands) == ["build", "tools:build", "rebuild-all"]
+        assert picker.fuzzyFilter("tb", commands) == ["tools:build"]
+        assert picker.fuzzyFilter("", commands, limit=2) == ["build", "tools:build"]
+
+    def _pick(self, mango_script, cwd, keys, *argv, shell_redirect=None):
+        """run mango --pick on a pseudo terminal, typing keys once the prompt shows"""
+        command = [sys.executable, str(mango_script), "--pick", *argv]
+        if shell_redirect is not None:
+            command = ["/bin/sh", "-c", " ".join(f"'{part}'" for part in command) + f" > '{shell_redirect}'"]
+        pid, fd = pty.fork()
+        if pid == 0:
+            os.chdir(cwd)
+            os.execvpe(command[0], command, {**os.environ, "HOME": str(cwd.parent)})
+        output = b""
+
+        def read_until(marker):
+            nonlocal output
+            deadline = time.monotonic() + 10
+            while marker not in output and time.monotonic() < deadline:
+                if select.select([fd], [], [], 0.1)[0]:
+                    try:
+                        output += os.read(fd, 4096)
+                    except OSError:
+                        break
+
+        read_until(b"> ")
+        for key in keys:
+            os.write(fd, key)
+            time.sleep(0.05)
+        while True:
+            try:
+                if select.select([fd], [], [], 10)[0]:
+                    chunk = os.read(fd, 4096)
+                    if not chunk:
+                        break
+                    output += chunk
+                else:
+                    break
+            except OSError:
+                break
+        _, status = os.waitpid(pid, 0)
+        return os.waitstatus_to_exitcode(status), output.decode(errors="replace")
+
+    def test_pick_runs_the_selection(self, tree, mango_script):
+        outer, _ = tree
+
+        code, output = self._pick(mango_script, outer, [b"b", b"l", b"d", b"\r"])
+
+        assert code == 0
+        assert "built" in output
+
+    def test_pick_prints_when_piped(self, tmp_path, tree, mango_script):
+        outer, _ = tree
+        picked = tmp_path / "picked"
+
+        code, _ = self._pick(mango_script, outer, [b"\x0e", b"\r"], "dep", shell_redirect=picked)
+
+        assert code == 0
+        assert picked.read_text() == "@deploy\n"
+
+    def test_pick_cancel(self, tree, mango_script):
+        outer, _ = tree
+
+        code, _ = self._pick(mango_script, outer, [b"\x03"])
+
+        assert code == 130
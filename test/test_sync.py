@@ -0,0 +1,77 @@
+"""Tests for updating nested submodules with mango --sync, against local bare repositories."""
+
+import os
+import subprocess
+
+import pytest
+
+from mango_cli import sync
+
+
+class TestSync:
+    """Tests for pulling every git submodule of a tree."""
+
+    GIT_IDENTITY = ["-c", "user.name=mango", "-c", "user.email=mango@example.com"]
+
+    def _git(self, *args, cwd=None):
+        subprocess.run(["git", *self.GIT_IDENTITY, *args], cwd=cwd, check=True, capture_output=True)
+
+    def _publish(self, work, instructions, message):
+        """commit a submodule's .instructions in a working clone and push it to its bare origin"""
+        mango = work / ".mango"
+        mango.mkdir(exist_ok=True)
+        (mango / ".instructions").write_text(instructions)
+        for binding in instructions.split():
+            if binding.endswith(".sh:"):
+                (mango / binding[:-1]).write_text("#!/bin/sh\necho synced\n")
+                (mango / binding[:-1]).chmod(0o755)
+        (work / ".gitignore").write_text(".mango/.submodules/\n.mango/.bindings.index\n")
+        self._git("add", "-A", cwd=work)
+        self._git("commit", "-q", "-m", message, cwd=work)
+        self._git("push", "-q", "origin", "HEAD", cwd=work)
+
+    def _make_remote(self, tmp_path, name, instructions):
+        """create a bare repository holding a submodule, and a working clone to publish changes from"""
+        bare = tmp_path / "remotes" / f"{name}.git"
+        self._git("init", "-q", "--bare", "-b", "main", str(bare))
+        work = tmp_path / "work" / name
+        self._git("clone", "-q", str(bare), str(work))
+        self._git("checkout", "-q", "-b", "main", cwd=work)
+        self._publish(work, instructions, "initial")
+        return bare, work
+
+    @pytest.fixture
+    def tree(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        submodules = make_mango_repo(repo, "[tools] *\n") / ".submodules"
+        tools_bare, tools_work = self._make_remote(tmp_path, "tools", "build.sh: build\n")
+        lib_bare, lib_work = self._make_remote(tmp_path, "lib", "link.sh: link\n")
+        self._git("clone", "-q", str(tools_bare), str(submodules / "tools"))
+        self._git("clone", "-q", str(lib_bare), str(submodules / "tools" / ".mango" / ".submodules" / "lib"))
+        make_mango_repo(submodules / "local")
+        return repo, tools_work, lib_work
+
+    def test_sync_pulls_nested_submodules(self, tree, mango_module):
+        repo, tools_work, _ = tree
+        assert mango_module.mangoFindFromRepo(str(repo), "deploy") == (None, False)
+        self._publish(tools_work, "build.sh: build\ndeploy.sh: deploy\n", "add deploy")
+
+        results = sync.mangoSync(str(repo), 4)
+
+        statuses = {virtual_path: status for virtual_path, status, _, _ in results}
+        assert statuses == {"local": "skipped", "tools": "updated", "tools:lib": "up to date"}
+        assert all(seconds >= 0 for _, _, seconds, _ in results)
+        # the rebuilt index sees the new binding
+        script, _ = mango_module.mangoFindFromRepo(str(repo), "deploy")
+        assert os.path.normpath(script) == str(repo / ".mango" / ".submodules" / "tools" / ".mango" / "deploy.sh")
+
+    def test_sync_entrypoint_reports_failures(self, tmp_path, tree, run_mango):
+        repo, _, lib_work = tree
+        self._publish(lib_work, "link.sh: link relink\n", "add relink")
+        (tmp_path / "remotes" / "tools.git").rename(tmp_path / "remotes" / "gone.git")
+
+        result = run_mango(repo, "--sync", "-j", "2", env={"HOME": tmp_path})
+
+        assert result.returncode == 1
+        rows = {line.split()[0]: line.split()[1] for line in result.stdout.splitlines()[1:]}
+        assert rows == {"local": "skipped", "tools": "failed", "tools:lib": "updated"}
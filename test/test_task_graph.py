@@ -0,0 +1,94 @@
+"""Tests for task declarations and incremental task graph runs."""
+
+import os
+
+import pytest
+
+
+class TestTaskGraph:
+    """Tests for parsing task declarations and running their graph."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, make_mango_repo):
+        repo = tmp_path / "repo"
+        make_mango_repo(repo, (
+            "compile.sh: build\n"
+            "test.sh: test\n"
+            "deploy.sh: deploy\n"
+            "(build) inputs: src/**/*.c\n"
+            "(build) outputs: out/app\n"
+            "(deploy) needs: build\n"
+            "(deploy) outputs: deployed\n"
+        ), {
+            "compile.sh": "#!/bin/bash\necho compile >> \"$MANGO_REPO_PATH/log\"\nmkdir -p \"$MANGO_REPO_PATH/out\"\ntouch \"$MANGO_REPO_PATH/out/app\"\n",
+            "test.sh": "#!/bin/bash\necho test >> \"$MANGO_REPO_PATH/log\"\n",
+            "deploy.sh": "#!/bin/bash\necho \"deploy $*\" >> \"$MANGO_REPO_PATH/log\"\ntouch \"$MANGO_REPO_PATH/deployed\"\n",
+        })
+        (repo / "src").mkdir()
+        (repo / "src" / "main.c").write_text("int main() {}\n")
+        return repo
+
+    def _log(self, repo):
+        log = repo / "log"
+        return log.read_text().split("\n")[:-1] if log.exists() else []
+
+    def _touch_later(self, path):
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    def test_parse_task_declaration(self, mango_module):
+        assert mango_module.parseInstruction("(deploy) needs: build test") == ("task", "deploy", "needs", ["build", "test"])
+        with pytest.raises(SyntaxError):
+            mango_module.parseInstruction("(deploy) requires: build")
+
+    def test_dependencies_run_first_with_args_for_target_only(self, repo, run_mango):
+        result = run_mango(repo, "deploy", "prod")
+
+        assert result.returncode == 0, result.stderr
+        assert self._log(repo) == ["compile", "deploy prod"]
+
+    def test_up_to_date_graph_is_skipped(self, repo, run_mango):
+        run_mango(repo, "deploy")
+
+        result = run_mango(repo, "deploy")
+
+        assert result.returncode == 0
+        assert self._log(repo) == ["compile", "deploy "]
+        assert "'deploy' is up to date" in result.stderr
+
+    def test_changed_input_reruns_dependents(self, repo, run_mango):
+        run_mango(repo, "deploy")
+        self._touch_later(repo / "src" / "main.c")
+
+        run_mango(repo, "deploy")
+
+        assert self._log(repo) == ["compile", "deploy ", "compile", "deploy "]
+
+    def test_changed_script_reruns_task(self, repo, run_mango):
+        mango_dir = repo / ".mango"
+        run_mango(repo, "build")
+        self._touch_later(mango_dir / "compile.sh")
+
+        run_mango(repo, "build")
+
+        assert self._log(repo) == ["compile", "compile"]
+
+    def test_dependency_cycle_is_reported(self, repo, run_mango):
+        mango_dir = repo / ".mango"
+        with open(mango_dir / ".instructions", "a") as instructions:
+            instructions.write("(build) needs: deploy\n")
+
+        result = run_mango(repo, "deploy")
+
+        assert result.returncode == 1
+        assert "dependency cycle: deploy -> build -> deploy" in result.stderr
+        assert self._log(repo) == []
+
+    def test_failed_dependency_stops_graph(self, repo, run_mango):
+        mango_dir = repo / ".mango"
+        (mango_dir / "compile.sh").write_text("#!/bin/bash\nexit 3\n")
+
+        result = run_mango(repo, "deploy")
+
+        assert result.returncode == 3
+        assert self._log(repo) == []
@@ -0,0 +1,41 @@
+"""Tests for MANGO_TRACE span tracing."""
+
+import json
+
+
+class TestTracing:
+    """Tests for the Chrome trace file and the stderr summary."""
+
+    def test_chrome_trace_is_written_before_exec(self, tmp_path, mango_repo, run_mango):
+        repo = mango_repo[0]
+        trace_path = tmp_path / "trace.json"
+
+        result = run_mango(repo, "build", env={"MANGO_TRACE": trace_path, "SECRET_TOKEN": "do-not-record"})
+
+        assert result.stdout == "built\n"
+        trace_text = trace_path.read_text()
+        assert "do-not-record" not in trace_text
+        events = json.loads(trace_text)["traceEvents"]
+        names = [event["name"] for event in events]
+        for phase in ["load mango", "parse arguments", "closestMangoRepo", "mangoLoadIndex", "parse .instructions", "mapSubmodulePath", "exec"]:
+            assert phase in names
+        parsed = {event["args"]["path"] for event in events if event["name"] == "parse .instructions"}
+        assert str(repo / ".mango" / ".instructions") in parsed
+        assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+
+    def test_summary_on_stderr(self, mango_repo, run_mango):
+        result = run_mango(mango_repo[0], "--no-exec", "build", env={"MANGO_TRACE": "1"})
+
+        assert result.returncode == 0
+        assert "mango trace:" in result.stderr
+        assert "closestMangoRepo" in result.stderr
+        assert "mangoExecute" in result.stderr
+
+    def test_pid_placeholder(self, tmp_path, mango_repo, run_mango):
+        run_mango(mango_repo[0], "--no-exec", "build", env={"MANGO_TRACE": tmp_path / "trace-{pid}.json"})
+
+        assert len(list(tmp_path.glob("trace-*.json"))) == 1
+
+    def test_no_trace_by_default(self, mango_module):
+        assert mango_module.trace_events is None
+        assert mango_module.traceSpan("anything") is mango_module.null_span
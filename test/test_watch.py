@@ -0,0 +1,149 @@
+"""Tests for re-running commands on file changes with mango --watch."""
+
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mango_cli import watch
+
+
+class TestWatch:
+    """Tests for watching a repo and re-running a command when it changes."""
+
+    @pytest.fixture
+    def make_repo(self, tmp_path, make_mango_repo):
+        """Provide a function creating a repo binding run to a bash script with the given body."""
+        def make(body):
+            repo = tmp_path / "repo"
+            make_mango_repo(repo, "run.sh: run\n", {"run.sh": f"#!/bin/bash\n{body}\n"})
+            (repo / "src").mkdir()
+            (repo / "build").mkdir()
+            return repo
+        return make
+
+    @pytest.fixture
+    def start(self, mango_script):
+        """Provide a function starting mango --watch run in a repo with a short debounce."""
+        def start(repo, *flags):
+            return subprocess.Popen(
+                [sys.executable, str(mango_script), "--watch", "--debounce", "0.1", *flags, "run"],
+                cwd=repo, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            )
+        return start
+
+    def _wait_for(self, predicate, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _lines(self, path):
+        return path.read_text().splitlines() if path.exists() else []
+
+    def _stop(self, process):
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=10)
+
+    @pytest.mark.parametrize("flags", [(), ("--poll",)], ids=["inotify", "poll"])
+    def test_watch_reruns_and_reresolves(self, tmp_path, make_repo, start, make_script, flags):
+        log = tmp_path / "log"
+        repo = make_repo(f"echo one >> {log}")
+        process = start(repo, "--exclude", "build/**", *flags)
+        try:
+            assert self._wait_for(lambda: self._lines(log) == ["one"])
+
+            (repo / "build" / "out.o").write_text("ignored")
+            time.sleep(1.2)
+            assert self._lines(log) == ["one"]
+
+            (repo / "src" / "main.c").write_text("int main;")
+            assert self._wait_for(lambda: self._lines(log) == ["one", "one"])
+
+            make_script(repo / ".mango", "other.sh", f"#!/bin/bash\necho two >> {log}\n")
+            (repo / ".mango" / ".instructions").write_text("other.sh: run\n")
+            assert self._wait_for(lambda: self._lines(log)[-1:] == ["two"])
+        finally:
+            self._stop(process)
+
+    def test_watch_include_globs(self, tmp_path, make_repo, start):
+        log = tmp_path / "log"
+        repo = make_repo(f"echo run >> {log}")
+        process = start(repo, "--include", "*.c")
+        try:
+            assert self._wait_for(lambda: len(self._lines(log)) == 1)
+            (repo / "src" / "notes.txt").write_text("ignored")
+            time.sleep(0.8)
+            assert len(self._lines(log)) == 1
+            (repo / "src" / "main.c").write_text("int main;")
+            assert self._wait_for(lambda: len(self._lines(log)) == 2)
+        finally:
+            self._stop(process)
+
+    def test_watch_kill_policy_stops_previous_run(self, tmp_path, make_repo, start):
+        log = tmp_path / "log"
+        repo = make_repo(f"echo start >> {log}; sleep 30; echo end >> {log}")
+        process = start(repo)
+        try:
+            assert self._wait_for(lambda: self._lines(log) == ["start"])
+            (repo / "src" / "main.c").write_text("int main;")
+            assert self._wait_for(lambda: self._lines(log) == ["start", "start"])
+        finally:
+            self._stop(process)
+        assert "end" not in self._lines(log)
+
+    def test_watch_kill_policy_kills_runs_ignoring_sigterm(self, tmp_path, make_repo, start):
+        log = tmp_path / "log"
+        repo = make_repo(f"trap '' TERM; echo start >> {log}; sleep 30; echo end >> {log}")
+        process = start(repo)
+        try:
+            assert self._wait_for(lambda: self._lines(log) == ["start"])
+            (repo / "src" / "main.c").write_text("int main;")
+            assert self._wait_for(lambda: self._lines(log) == ["start", "start"])
+            (repo / "src" / "main.c").write_text("int main();")
+            assert self._wait_for(lambda: self._lines(log) == ["start", "start", "start"])
+        finally:
+            self._stop(process)
+        assert "end" not in self._lines(log)
+
+    def test_watch_queue_policy_waits_for_previous_run(self, tmp_path, make_repo, start):
+        log = tmp_path / "log"
+        repo = make_repo(f"echo start >> {log}; sleep 1; echo end >> {log}")
+        process = start(repo, "--on-change", "queue")
+        try:
+            assert self._wait_for(lambda: self._lines(log) == ["start"])
+            (repo / "src" / "a.c").write_text("a")
+            time.sleep(0.3)
+            (repo / "src" / "b.c").write_text("b")
+            assert self._wait_for(lambda: self._lines(log) == ["start", "end", "start", "end"])
+            time.sleep(1)
+            assert self._lines(log) == ["start", "end", "start", "end"]
+        finally:
+            self._stop(process)
+
+    def test_watch_runs_do_not_read_mangos_stdin(self, tmp_path, make_repo, mango_script):
+        log = tmp_path / "log"
+        repo = make_repo(f"read line; echo \"read:$line\" >> {log}")
+        # mango's own stdin stays open, as a terminal would
+        process = subprocess.Popen(
+            [sys.executable, str(mango_script), "--watch", "run"],
+            cwd=repo, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        try:
+            assert self._wait_for(lambda: self._lines(log) == ["read:"])
+        finally:
+            self._stop(process)
+            process.stdin.close()
+
+    def test_watch_glob_match(self):
+        match = watch.watchGlobMatch
+        assert match("src/main.c", "*.c")
+        assert match("src/deep/main.c", "src/**/*.c")
+        assert match("src/main.c", "src/**/*.c")
+        assert not match("src/main.c", "src/*.h")
+        assert not match("lib/src/main.c", "src/*.c")
+        assert match(".git/objects/ab", ".git/**")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Build mango as a single executable file.
+
+The file is a zipapp holding the mango_cli package together with its bytecode,
+compiled by the interpreter running this script. Bytecode in a zip is never
+written by python itself, so it is compiled here as unchecked hash-based .pyc
+files (which zipimport trusts without comparing timestamps). Interpreters of
+another version ignore it and compile the sources instead.
+
+Usage:
+    python3 tools/build_zipapp.py [--src src] [--output dist/mango]
+"""
+
+import argparse
+import importlib.util
+import os
+import py_compile
+import tempfile
+import zipfile
+from pathlib import Path
+
+DEFAULT_SRC = Path(__file__).resolve().parents[1] / "src"
+DEFAULT_OUTPUT = Path(__file__).resolve().parents[1] / "dist" / "mango"
+SHEBANG = b"#!/usr/bin/env python3\n"
+
+
+def compileBytecode(source_path: Path, archive_name: str) -> bytes:
+    """compile a source file to an unchecked hash-based .pyc, as stored in the archive"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pyc_path = Path(temp_dir) / "module.pyc"
+        py_compile.compile(
+            str(source_path), cfile=str(pyc_path), dfile=archive_name, doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+        return pyc_path.read_bytes()
+
+
+def buildZipapp(src: Path, output: Path) -> None:
+    """write the single-file build of the mango_cli package found in src"""
+    package = src / "mango_cli"
+    sources = sorted(package.glob("*.py"))
+    if not (package / "__init__.py").exists():
+        raise FileNotFoundError(f"no mango_cli package in {src}")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temp_output = output.with_name(output.name + ".tmp")
+    with open(temp_output, "wb") as output_file:
+        output_file.write(SHEBANG)
+        with zipfile.ZipFile(output_file, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for source in sources:
+                name = f"mango_cli/{source.name}"
+                archive.write(source, name)
+                archive.writestr(name + "c", compileBytecode(source, name))
+            # the archive runs the package's own entrypoint
+            main_source = package / "__main__.py"
+            archive.write(main_source, "__main__.py")
+            archive.writestr("__main__.pyc", compileBytecode(main_source, "__main__.py"))
+    os.chmod(temp_output, 0o755)
+    os.replace(temp_output, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build mango as a single executable file.")
+    parser.add_argument("--src", type=Path, default=DEFAULT_SRC, help="the folder containing the mango_cli package (default: src)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="the file to write (default: dist/mango)")
+    args = parser.parse_args()
+    buildZipapp(args.src, args.output)
+    print(f"Built {args.output} (bytecode for {importlib.util.MAGIC_NUMBER.hex()})")
+
+
+if __name__ == "__main__":
+    main()